@@ -5,15 +5,16 @@ from plotly.subplots import make_subplots
 import time
 from datetime import datetime, timedelta
 import os
-from reportlab.lib.pagesizes import letter, A4
-from reportlab.lib import colors
-from reportlab.lib.units import inch
-from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer, PageBreak, Image
-from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
-from reportlab.lib.enums import TA_CENTER, TA_LEFT, TA_RIGHT
-from reportlab.pdfgen import canvas
-import io
-import base64
+import requests
+from requests.adapters import HTTPAdapter
+from partitions import PartitionedSensorLog
+from storage import DATA_DIR, IncrementalSensorFrame, open_store
+from reports import REPORT_RANGES, calculate_aqi, make_trace
+from report_jobs import ReportJobs
+from events import EventStreamClient
+from risk_engine import bound, safety_status
+from control_rules import AUTO_REASON_PREFIX
+from render_profile import RenderProfiler
 
 st.set_page_config(
     page_title="AirSight Systems | Mission Control",
@@ -186,464 +187,235 @@ CUSTOM_CSS = """
 
 st.markdown(CUSTOM_CSS, unsafe_allow_html=True)
 
-THRESHOLDS = {
-    'dust': {'safe': 500, 'warning': 1000, 'hazard': 1500},      # µg/m³
-    'temp': {'safe': 25, 'warning': 30, 'hazard': 35},           # °C
-    'tvoc': {'safe': 200, 'warning': 500, 'hazard': 1000},       # ppb
-    'eco2': {'safe': 800, 'warning': 1200, 'hazard': 2000}       # ppm
+# Automatic control runs in the backend (control_rules.py); recent actions are displayed
+AUTO_ACTION_WINDOW_SECONDS = 60
+AUTO_ACTION_LABELS = {
+    'filtration_unit': "🔧 Filtration Unit ACTIVATED",
+    'ventilation': "💨 Ventilation ACTIVATED",
+    'exhaust_fan': "🌪️ Exhaust Fan ACTIVATED"
 }
 
+# Thresholds are shared with the backend (risk_engine.SENSOR_THRESHOLDS)
+STATUS_STYLE = {
+    'safe': ('#00FF94', '✓'),
+    'warning': ('#FFD700', '⚠️'),
+    'hazard': ('#FF2B2B', '⚠️')
+}
+
+API_URL = "http://localhost:5000"
+
+# Sidebar zone -> backend zone id (readings are partitioned by the "zone" they report)
+ZONES = {
+    "All Zones": None,
+    "Zone A - Manufacturing": "A",
+    "Zone B - Chemical Processing": "B",
+    "Zone C - Warehouse": "C"
+}
+
+TIME_RANGE_MINUTES = {
+    "Last 5 Minutes": 5,
+    "Last 15 Minutes": 15,
+    "Last Hour": 60,
+    "Last 6 Hours": 360,
+    "Last 24 Hours": 1440
+}
+
+# Auto-refresh is driven by the event stream: a watcher fragment checks this often whether an
+# event arrived since the page was drawn, and redraws it only then
+WATCH_SECONDS = 0.5
+# While the event stream is down the page is redrawn on this interval instead
+STREAM_DOWN_REFRESH_SECONDS = 2
+# Sections drawn within this many seconds of each other share one fetch
+LIVE_DATA_MAX_AGE = 1
+
+# Seconds between status checks of a running report job
+REPORT_POLL_SECONDS = 1
+
+# Render timings are appended here when "Write timings to file" is ticked
+PROFILE_LOG = os.environ.get("AIRSIGHT_PROFILE_LOG", os.path.join(DATA_DIR, "render_timings.jsonl"))
+
+@st.cache_resource
+def get_store():
+    # Same backend as the Flask app (AIRSIGHT_STORAGE)
+    return open_store()
+
+@st.cache_resource
+def get_sensor_log():
+    # Shared by all sessions; each refresh parses only the rows appended since the last one (every zone)
+    return IncrementalSensorFrame(PartitionedSensorLog(get_store(), ring_capacity=1))
+
+@st.cache_resource
+def get_http():
+    # One keep-alive connection pool for every request to the backend
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=4, pool_maxsize=16)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+@st.cache_resource
+def get_snapshot_cache():
+    # Last snapshot and its ETag per (time window, zone), shared by all sessions
+    return {}
+
+@st.cache_resource
+def get_event_stream():
+    # One SSE connection per dashboard process; sessions wait on it instead of polling
+    return EventStreamClient(f"{API_URL}/api/stream")
+
 def load_sensor_data():
-    csv_path = 'data/sensor_log.csv'
-    
-    if not os.path.exists(csv_path):
-        return pd.DataFrame()
-    
     try:
-        df = pd.read_csv(csv_path)
-        if 'timestamp' in df.columns:
-            df['timestamp'] = pd.to_datetime(df['timestamp'])
-        return df
+        return get_sensor_log().refresh()
     except Exception as e:
-        st.error(f"Error reading CSV: {e}")
+        st.error(f"Error reading sensor log: {e}")
         return pd.DataFrame()
 
-def get_safety_status(value, metric):
+def fetch_sensor_range(start, zone=None):
+    # Time range and zone are pushed down to the backend; follow cursors until the range is exhausted
+    params = {"start": start.strftime('%Y-%m-%d %H:%M:%S'), "limit": 5000, "fields": "timestamp,dust,temp,tvoc,eco2,risk"}
+    if zone:
+        params["zone"] = zone
+    rows = []
+    
+    while True:
+        response = get_http().get(f"{API_URL}/api/sensor-data", params=params, timeout=5)
+        response.raise_for_status()
+        page = response.json()
+        rows.extend(page["data"])
+        if not page["next_cursor"]:
+            break
+        params["cursor"] = page["next_cursor"]
+    
+    df = pd.DataFrame(rows)
+    if 'timestamp' in df.columns:
+        df['timestamp'] = pd.to_datetime(df['timestamp'])
+    return df
 
-    thresholds = THRESHOLDS.get(metric, {})
-    
-    if value <= thresholds.get('safe', float('inf')):
-        return 'safe', '#00FF94', '✓'
-    elif value <= thresholds.get('warning', float('inf')):
-        return 'warning', '#FFD700', '⚠️'
-    else:
-        return 'hazard', '#FF2B2B', '⚠️'
+def series_frame(records):
+    df = pd.DataFrame(records)
+    if 'timestamp' in df.columns:
+        df['timestamp'] = pd.to_datetime(df['timestamp'])
+    return df
 
-def calculate_aqi(df):
-    if df.empty:
-        return 0, 'safe'
-    
-    latest = df.iloc[-1]
-    
-    # Normalized scoring (0-100 scale)
-    scores = []
-    
-    for metric in ['dust', 'tvoc', 'eco2']:
-        value = latest.get(metric, 0)
-        max_threshold = THRESHOLDS[metric]['hazard']
-        score = min((value / max_threshold) * 100, 100)
-        scores.append(score)
-    
-    aqi = sum(scores) / len(scores)
-    
-    if aqi < 30:
-        return aqi, 'safe'
-    elif aqi < 60:
-        return aqi, 'warning'
-    else:
-        return aqi, 'hazard'
+def fetch_snapshot(minutes, zone=None):
+    # One conditional round trip per refresh; a 304 reuses the snapshot (and parsed frame) cached for this window
+    cache = get_snapshot_cache()
+    cached = cache.get((minutes, zone))
+    headers = {"If-None-Match": cached[0]} if cached else {}
+    params = {"minutes": minutes, "zone": zone} if zone else {"minutes": minutes}
+    response = get_http().get(f"{API_URL}/api/dashboard/snapshot", params=params, headers=headers, timeout=2)
+    if response.status_code == 304 and cached:
+        return cached[1]
+    response.raise_for_status()
+    snapshot = response.json()
+    snapshot['frame'] = series_frame(snapshot['series'])
+    cache[(minutes, zone)] = (response.headers.get("ETag"), snapshot)
+    return snapshot
 
-def create_pdf_report(df_filtered, time_range_str):
+def load_sensor_range(minutes, zone=None):
+    try:
+        return fetch_sensor_range(datetime.now() - timedelta(minutes=minutes), zone)
+    except requests.RequestException:
+        # Backend unreachable - filter the local log instead
+        df = load_sensor_data()
+        if df.empty:
+            return df
+        mask = df['timestamp'] >= datetime.now() - timedelta(minutes=minutes)
+        if zone:
+            mask &= df['zone'] == zone
+        return df[mask]
 
-    buffer = io.BytesIO()
-    
-    # Create PDF with ReportLab
-    pdf = SimpleDocTemplate(
-        buffer,
-        pagesize=letter,
-        rightMargin=0.75*inch,
-        leftMargin=0.75*inch,
-        topMargin=0.75*inch,
-        bottomMargin=0.75*inch
-    )
-    
-    # Container for PDF elements
-    elements = []
-    
-    # Define styles
-    styles = getSampleStyleSheet()
-    title_style = ParagraphStyle(
-        'CustomTitle',
-        parent=styles['Heading1'],
-        fontSize=24,
-        textColor=colors.HexColor('#1A1F29'),
-        spaceAfter=30,
-        alignment=TA_CENTER,
-        fontName='Helvetica-Bold'
-    )
-    
-    heading_style = ParagraphStyle(
-        'CustomHeading',
-        parent=styles['Heading2'],
-        fontSize=14,
-        textColor=colors.HexColor('#2C3E50'),
-        spaceAfter=12,
-        spaceBefore=12,
-        fontName='Helvetica-Bold'
-    )
-    
-    body_style = ParagraphStyle(
-        'CustomBody',
-        parent=styles['BodyText'],
-        fontSize=10,
-        textColor=colors.HexColor('#34495E'),
-        spaceAfter=6,
-        fontName='Helvetica'
-    )
-    
-    # Title
-    elements.append(Paragraph("AIRSIGHT SYSTEMS", title_style))
-    elements.append(Paragraph("Industrial Air Quality Monitoring Report", styles['Heading2']))
-    elements.append(Spacer(1, 0.3*inch))
-    
-    # Report metadata
-    metadata = [
-        ['Report Generated:', datetime.now().strftime('%Y-%m-%d %H:%M:%S')],
-        ['Monitoring Period:', time_range_str],
-        ['Total Data Points:', str(len(df_filtered))],
-        ['System Status:', 'Operational']
-    ]
-    
-    metadata_table = Table(metadata, colWidths=[2*inch, 4*inch])
-    metadata_table.setStyle(TableStyle([
-        ('BACKGROUND', (0, 0), (0, -1), colors.HexColor('#E8E8E8')),
-        ('TEXTCOLOR', (0, 0), (-1, -1), colors.black),
-        ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
-        ('FONTNAME', (0, 0), (0, -1), 'Helvetica-Bold'),
-        ('FONTNAME', (1, 0), (1, -1), 'Helvetica'),
-        ('FONTSIZE', (0, 0), (-1, -1), 10),
-        ('BOTTOMPADDING', (0, 0), (-1, -1), 8),
-        ('GRID', (0, 0), (-1, -1), 0.5, colors.grey)
-    ]))
-    
-    elements.append(metadata_table)
-    elements.append(Spacer(1, 0.3*inch))
-    
-    # Export charts as images
-    if not df_filtered.empty:
-        # Chart 1: Emissions Trend
-        fig1 = go.Figure()
-        fig1.add_trace(go.Scatter(
-            x=df_filtered['timestamp'],
-            y=df_filtered['dust'],
-            name='PM2.5 Dust',
-            line=dict(color='#FF6B6B', width=2)
-        ))
-        fig1.add_trace(go.Scatter(
-            x=df_filtered['timestamp'],
-            y=df_filtered['tvoc'],
-            name='TVOC',
-            line=dict(color='#4ECDC4', width=2),
-            yaxis='y2'
-        ))
-        fig1.update_layout(
-            title='Emissions Trend Over Time',
-            xaxis_title='Time',
-            yaxis_title='PM2.5 (µg/m³)',
-            yaxis2=dict(title='TVOC (ppb)', overlaying='y', side='right'),
-            height=300,
-            showlegend=True
-        )
-        
-        img1_bytes = fig1.to_image(format="png", width=700, height=300)
-        img1 = Image(io.BytesIO(img1_bytes), width=6.5*inch, height=2.5*inch)
-        elements.append(img1)
-        elements.append(Spacer(1, 0.2*inch))
-        
-        # Chart 2: Temperature
-        fig2 = go.Figure()
-        fig2.add_trace(go.Scatter(
-            x=df_filtered['timestamp'],
-            y=df_filtered['temp'],
-            fill='tozeroy',
-            fillcolor='rgba(255, 107, 107, 0.3)',
-            line=dict(color='#FF6B6B', width=2),
-            name='Temperature'
-        ))
-        fig2.add_hline(y=30, line_dash="dash", line_color="orange", annotation_text="Warning Threshold")
-        fig2.update_layout(
-            title='Thermal Conditions',
-            xaxis_title='Time',
-            yaxis_title='Temperature (°C)',
-            height=250,
-            showlegend=False
-        )
-        
-        img2_bytes = fig2.to_image(format="png", width=700, height=250)
-        img2 = Image(io.BytesIO(img2_bytes), width=6.5*inch, height=2*inch)
-        elements.append(img2)
-        elements.append(Spacer(1, 0.2*inch))
-    
-    # Statistical Summary Table
-    elements.append(Paragraph("Statistical Summary", heading_style))
-    
-    if not df_filtered.empty:
-        stats_data = [['Parameter', 'Average', 'Maximum', 'Minimum', 'Status']]
-        
-        params = {
-            'PM2.5 Dust (µg/m³)': 'dust',
-            'Temperature (°C)': 'temp',
-            'TVOC (ppb)': 'tvoc',
-            'eCO2 (ppm)': 'eco2'
-        }
-        
-        for param_name, col in params.items():
-            if col in df_filtered.columns:
-                avg = df_filtered[col].mean()
-                max_val = df_filtered[col].max()
-                min_val = df_filtered[col].min()
-                status, _, _ = get_safety_status(max_val, col)
-                status_text = status.upper()
-                
-                stats_data.append([
-                    param_name,
-                    f"{avg:.2f}",
-                    f"{max_val:.2f}",
-                    f"{min_val:.2f}",
-                    status_text
-                ])
-        
-        stats_table = Table(stats_data, colWidths=[2*inch, 1*inch, 1*inch, 1*inch, 1*inch])
-        stats_table.setStyle(TableStyle([
-            ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#2C3E50')),
-            ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
-            ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
-            ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-            ('FONTSIZE', (0, 0), (-1, 0), 11),
-            ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
-            ('BACKGROUND', (0, 1), (-1, -1), colors.beige),
-            ('GRID', (0, 0), (-1, -1), 1, colors.black),
-            ('FONTSIZE', (0, 1), (-1, -1), 9),
-            ('TOPPADDING', (0, 1), (-1, -1), 8),
-            ('BOTTOMPADDING', (0, 1), (-1, -1), 8),
-        ]))
-        
-        elements.append(stats_table)
-        elements.append(Spacer(1, 0.3*inch))
-    
-    # Add page break before recommendations
-    elements.append(PageBreak())
-    
-    # AI Recommendations
-    elements.append(Paragraph("AI-Generated Analysis & Recommendations", heading_style))
-    
-    comprehensive_report = generate_comprehensive_report(df_filtered, time_range_str)
-    
-    # Convert report to paragraphs
-    for line in comprehensive_report.split('\n'):
-        if line.strip():
-            if '=' * 10 in line:
-                elements.append(Spacer(1, 0.1*inch))
-            elif line.strip().startswith(('EXECUTIVE', 'STATISTICAL', 'AI-GENERATED', 'OVERALL', 'GENERAL')):
-                elements.append(Spacer(1, 0.15*inch))
-                elements.append(Paragraph(f"<b>{line.strip()}</b>", heading_style))
-            elif line.strip().startswith(('🔴', '🟡', '🟠', '🟢', '⚠️', '⚡', 'ℹ️', '✅')):
-                elements.append(Paragraph(f"<b>{line.strip()}</b>", body_style))
-            else:
-                elements.append(Paragraph(line.strip(), body_style))
-    
-    # Build PDF
-    pdf.build(elements)
-    buffer.seek(0)
-    
-    return buffer
-
-def generate_comprehensive_report(df_filtered, time_range):
-
-    if df_filtered.empty:
-        return "No data available for the selected time range."
-    
-    report = []
-    
-    # Executive Summary
-    report.append("EXECUTIVE SUMMARY")
-    report.append("=" * 80)
-    report.append(f"Monitoring Period: {time_range}")
-    report.append(f"Total Readings Analyzed: {len(df_filtered)}")
-    report.append(f"Data Collection Interval: Continuous (5-second intervals)")
-    report.append("")
-    
-    # Statistical Overview
-    report.append("STATISTICAL OVERVIEW")
-    report.append("=" * 80)
-    
-    params = {
-        'PM2.5 Dust': ('dust', 'µg/m³', 500, 1000, 1500),
-        'Temperature': ('temp', '°C', 25, 30, 35),
-        'TVOC': ('tvoc', 'ppb', 200, 500, 1000),
-        'eCO2': ('eco2', 'ppm', 800, 1200, 2000)
-    }
-    
-    for param_name, (col, unit, low_thresh, med_thresh, high_thresh) in params.items():
-        if col in df_filtered.columns:
-            values = df_filtered[col]
-            avg = values.mean()
-            max_val = values.max()
-            min_val = values.min()
-            
-            # Determine status
-            if max_val >= high_thresh:
-                status = "CRITICAL"
-                emoji = "🔴"
-            elif max_val >= med_thresh:
-                status = "WARNING"
-                emoji = "🟡"
-            elif max_val >= low_thresh:
-                status = "MODERATE"
-                emoji = "🟠"
-            else:
-                status = "NORMAL"
-                emoji = "🟢"
-            
-            report.append(f"{emoji} {param_name}:")
-            report.append(f"   Average: {avg:.2f} {unit}")
-            report.append(f"   Maximum: {max_val:.2f} {unit}")
-            report.append(f"   Minimum: {min_val:.2f} {unit}")
-            report.append(f"   Status: {status}")
-            report.append("")
-    
-    # AI-Generated Recommendations
-    report.append("AI-GENERATED RECOMMENDATIONS")
-    report.append("=" * 80)
-    
-    latest = df_filtered.iloc[-1]
-    dust_avg = df_filtered['dust'].mean() if 'dust' in df_filtered.columns else 0
-    tvoc_avg = df_filtered['tvoc'].mean() if 'tvoc' in df_filtered.columns else 0
-    eco2_avg = df_filtered['eco2'].mean() if 'eco2' in df_filtered.columns else 0
-    temp_avg = df_filtered['temp'].mean() if 'temp' in df_filtered.columns else 0
-    
-    # Dust Analysis
-    if dust_avg >= 1500:
-        report.append("🔴 CRITICAL - PARTICULATE MATTER (PM2.5)")
-        report.append("   • IMMEDIATE ACTION: Activate emergency air filtration systems")
-        report.append("   • Evacuate non-essential personnel from affected areas")
-        report.append("   • Contact environmental compliance officer")
-        report.append("   • Investigate source: Check industrial processes, HVAC systems")
-        report.append("   • Long-term: Install HEPA filtration units, seal dust sources")
-    elif dust_avg >= 1000:
-        report.append("🟡 WARNING - PARTICULATE MATTER (PM2.5)")
-        report.append("   • Increase ventilation rates by 30-50%")
-        report.append("   • Schedule deep cleaning of air ducts")
-        report.append("   • Monitor outdoor air quality - may be external source")
-        report.append("   • Consider upgrading air filters to MERV 13+")
-    elif dust_avg >= 500:
-        report.append("🟠 MODERATE - PARTICULATE MATTER (PM2.5)")
-        report.append("   • Maintain current filtration protocols")
-        report.append("   • Regular filter replacement schedule recommended")
-        report.append("   • Monitor trends for any upward patterns")
-    else:
-        report.append("🟢 NORMAL - PARTICULATE MATTER (PM2.5)")
-        report.append("   • Air quality is within safe parameters")
-        report.append("   • Continue standard maintenance procedures")
-    report.append("")
-    
-    # Temperature Analysis
-    if temp_avg >= 35:
-        report.append("🔴 CRITICAL - THERMAL CONDITIONS")
-        report.append("   • IMMEDIATE: Reduce heat-generating processes")
-        report.append("   • Check HVAC system capacity and functionality")
-        report.append("   • Implement worker rotation schedules")
-        report.append("   • Provide cooling stations and hydration")
-    elif temp_avg >= 30:
-        report.append("🟡 WARNING - THERMAL CONDITIONS")
-        report.append("   • Optimize HVAC settings for better cooling")
-        report.append("   • Ensure adequate air circulation")
-        report.append("   • Monitor equipment for heat generation")
-    elif temp_avg >= 25:
-        report.append("🟠 MODERATE - THERMAL CONDITIONS")
-        report.append("   • Temperature approaching upper comfort limits")
-        report.append("   • Preventive: Service HVAC before peak periods")
-    else:
-        report.append("🟢 NORMAL - THERMAL CONDITIONS")
-        report.append("   • Temperature within optimal comfort zone")
-        report.append("   • Energy efficiency is likely optimal")
-    report.append("")
-    
-    # TVOC Analysis
-    if tvoc_avg >= 1000:
-        report.append("🔴 CRITICAL - TOTAL VOLATILE ORGANIC COMPOUNDS (TVOC)")
-        report.append("   • IMMEDIATE: Identify VOC source (paints, solvents, chemicals)")
-        report.append("   • Maximize fresh air intake, open windows if safe")
-        report.append("   • Use activated carbon filtration")
-        report.append("   • Review chemical storage and handling procedures")
-    elif tvoc_avg >= 500:
-        report.append("🟡 WARNING - TOTAL VOLATILE ORGANIC COMPOUNDS (TVOC)")
-        report.append("   • Increase outdoor air ventilation rates")
-        report.append("   • Audit recent activities: painting, cleaning, manufacturing")
-        report.append("   • Consider VOC-absorbing materials (plants, air purifiers)")
-    elif tvoc_avg >= 200:
-        report.append("🟠 MODERATE - TOTAL VOLATILE ORGANIC COMPOUNDS (TVOC)")
-        report.append("   • Acceptable levels, but monitor trends")
-        report.append("   • Use low-VOC products when possible")
-    else:
-        report.append("🟢 NORMAL - TOTAL VOLATILE ORGANIC COMPOUNDS (TVOC)")
-        report.append("   • VOC levels are minimal and safe")
-        report.append("   • Current ventilation strategy is effective")
-    report.append("")
-    
-    # eCO2 Analysis
-    if eco2_avg >= 2000:
-        report.append("🔴 CRITICAL - EQUIVALENT CO2 (eCO2)")
-        report.append("   • IMMEDIATE: Increase outdoor air exchange rate")
-        report.append("   • High occupancy detected - reduce density or stagger shifts")
-        report.append("   • Check HVAC for recirculation vs. fresh air ratio")
-        report.append("   • Symptoms: Drowsiness, headaches may occur")
-    elif eco2_avg >= 1200:
-        report.append("🟡 WARNING - EQUIVALENT CO2 (eCO2)")
-        report.append("   • Moderate ventilation improvement needed")
-        report.append("   • Optimize HVAC for better air turnover")
-        report.append("   • Consider occupancy-based ventilation controls")
-    elif eco2_avg >= 800:
-        report.append("🟠 MODERATE - EQUIVALENT CO2 (eCO2)")
-        report.append("   • Slightly elevated, typical of occupied spaces")
-        report.append("   • Ensure HVAC is functioning per design specifications")
-    else:
-        report.append("🟢 NORMAL - EQUIVALENT CO2 (eCO2)")
-        report.append("   • Excellent ventilation, fresh air circulation optimal")
-        report.append("   • Indoor air quality is superior")
-    report.append("")
-    
-    # Overall System Health
-    report.append("OVERALL SYSTEM HEALTH ASSESSMENT")
-    report.append("=" * 80)
-    
-    critical_count = 0
-    if dust_avg >= 1500: critical_count += 1
-    if temp_avg >= 35: critical_count += 1
-    if tvoc_avg >= 1000: critical_count += 1
-    if eco2_avg >= 2000: critical_count += 1
-    
-    if critical_count > 0:
-        report.append(f"⚠️ SYSTEM STATUS: CRITICAL ({critical_count} parameter(s) in danger zone)")
-        report.append("PRIORITY: IMMEDIATE INTERVENTION REQUIRED")
-    elif dust_avg >= 1000 or temp_avg >= 30 or tvoc_avg >= 500 or eco2_avg >= 1200:
-        report.append("⚡ SYSTEM STATUS: WARNING (Proactive measures recommended)")
-        report.append("PRIORITY: SCHEDULE CORRECTIVE ACTIONS WITHIN 24 HOURS")
-    elif dust_avg >= 500 or temp_avg >= 25 or tvoc_avg >= 200 or eco2_avg >= 800:
-        report.append("ℹ️ SYSTEM STATUS: MODERATE (Monitoring advised)")
-        report.append("PRIORITY: ROUTINE MAINTENANCE AND OBSERVATION")
+def get_live_data(minutes, zone=None):
+    # Snapshot and frame shared by this session's fragments. Refetched only when the backend has pushed
+    # something since the last fetch (always while the event stream is down - a 304 keeps that cheap)
+    event_stream = get_event_stream()
+    version = event_stream.version
+    cached = st.session_state.get('live_data')
+    if cached and cached['key'] == (minutes, zone) and (
+        (event_stream.connected and cached['version'] == version)
+        or time.monotonic() - cached['fetched_at'] < LIVE_DATA_MAX_AGE
+    ):
+        return cached['snapshot'], cached['frame']
+    
+    # Data for the selected time range (local log if the backend is unreachable)
+    with profiler.section("data load"):
+        try:
+            snapshot = fetch_snapshot(minutes, zone)
+        except requests.RequestException:
+            snapshot = None
+    if snapshot is not None:
+        df = snapshot['frame']
     else:
-        report.append("✅ SYSTEM STATUS: OPTIMAL (All parameters within safe limits)")
-        report.append("PRIORITY: MAINTAIN CURRENT PROTOCOLS")
-    
-    report.append("")
-    report.append("GENERAL RECOMMENDATIONS FOR AIR QUALITY IMPROVEMENT")
-    report.append("=" * 80)
-    report.append("1. Regular HVAC Maintenance: Clean filters monthly, service systems quarterly")
-    report.append("2. Source Control: Minimize pollutant generation at the source")
-    report.append("3. Ventilation Strategy: Ensure adequate fresh air intake (ASHRAE standards)")
-    report.append("4. Air Purification: Consider HEPA + activated carbon filtration")
-    report.append("5. Monitoring: Continue real-time tracking and trend analysis")
-    report.append("6. Occupant Education: Train staff on air quality impact and best practices")
-    report.append("7. Green Solutions: Introduce air-purifying plants, eco-friendly materials")
-    report.append("8. Building Envelope: Seal leaks, improve insulation to prevent infiltration")
-    report.append("")
-    report.append("=" * 80)
-    report.append(f"Report Generated: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
-    report.append("AirSight Systems - Industrial Emissions Monitoring Platform")
-    report.append("=" * 80)
-    
-    return "\n".join(report)
+        with profiler.section("data load (local)"):
+            df = load_sensor_range(minutes, zone)
+    # Content hash of the frame: sections reuse what they built until the readings change
+    frame_key = int(pd.util.hash_pandas_object(df, index=False).sum()) if not df.empty else None
+    st.session_state['live_data'] = {
+        'key': (minutes, zone), 'version': version, 'fetched_at': time.monotonic(),
+        'snapshot': snapshot, 'frame': df, 'frame_key': (minutes, zone, frame_key)
+    }
+    return snapshot, df
+
+def cached_render(section, build):
+    # A section's figure or text, rebuilt only when the live frame changed (not for control events)
+    frame_key = st.session_state['live_data']['frame_key']
+    rendered = st.session_state.setdefault('rendered', {})
+    if section not in rendered or rendered[section][0] != frame_key:
+        rendered[section] = (frame_key, build())
+    return rendered[section][1]
+
+def set_device(device, state, reason):
+    # Compare-and-set against the device's current version, read just before the write,
+    # so a stale page doesn't cause conflicts but concurrent sessions still can't overwrite each other
+    current = get_http().get(f"{API_URL}/api/control/state", timeout=1)
+    current.raise_for_status()
+    control_state = current.json()
+    if control_state.get(device) == state:
+        return current
+    payload = {"device": device, "state": state, "reason": reason}
+    version = control_state.get("versions", {}).get(device)
+    if version is not None:
+        payload["expected_version"] = version
+    response = get_http().post(f"{API_URL}/api/control/set", json=payload, timeout=1)
+    if response.status_code == 409:
+        st.toast(f"⚠️ {device.replace('_', ' ').title()} was changed by someone else - showing the latest state")
+    return response
+
+@st.cache_resource
+def get_report_jobs():
+    # Builds reports from the local log when the backend is unreachable; shared by all sessions
+    # Statistics are computed from the frame when each report is built
+    return ReportJobs(lambda minutes, zone: (load_sensor_range(minutes, zone), None), lambda zone: len(load_sensor_data()))
+
+def submit_report(time_range, zone=None):
+    # Report job in the backend's job service (locally if the backend is unreachable)
+    try:
+        response = get_http().post(f"{API_URL}/api/reports", json={"time_range": time_range, "zone": zone}, timeout=2)
+        response.raise_for_status()
+        return {**response.json(), "local": False}
+    except requests.RequestException:
+        return {**get_report_jobs().submit(time_range, zone), "local": True}
+
+def report_status(job):
+    if job['local']:
+        return get_report_jobs().status(job['id'])
+    response = get_http().get(f"{API_URL}/api/reports/{job['id']}", timeout=2)
+    if response.status_code == 404:
+        return None
+    response.raise_for_status()
+    return response.json()
+
+def report_pdf(job):
+    if job['local']:
+        return get_report_jobs().result(job['id'])
+    response = get_http().get(f"{API_URL}/api/reports/{job['id']}/pdf", timeout=10)
+    response.raise_for_status()
+    return response.content
+
+def get_safety_status(value, metric):
+    status = safety_status(value, metric)
+    color, icon = STATUS_STYLE[status]
+    return status, color, icon
 
 def generate_ai_diagnostic(df):
 
@@ -686,6 +458,14 @@ def generate_ai_diagnostic(df):
     return "\n".join(alerts)
 
 
+# Per-session section timings (enabled with ?profile=1 or the sidebar toggle)
+if 'profiler' not in st.session_state:
+    st.session_state['profiler'] = RenderProfiler()
+profiler = st.session_state['profiler']
+run_started = time.perf_counter()
+# Anything pushed after this point triggers the next redraw
+rendered_version = get_event_stream().version
+
 # SIDEBAR
 
 
@@ -708,9 +488,10 @@ with st.sidebar:
     st.markdown("#### 🏭 Industrial Zone")
     zone = st.selectbox(
         "Select Zone",
-        ["Zone A - Manufacturing", "Zone B - Chemical Processing", "Zone C - Warehouse"],
+        list(ZONES),
         label_visibility="collapsed"
     )
+    zone_id = ZONES[zone]
     
     st.markdown("#### ⏱️ Time Range")
     time_range = st.selectbox(
@@ -726,7 +507,7 @@ with st.sidebar:
     
     report_time_range = st.selectbox(
         "Report Period",
-        ["Last 30 Minutes", "Last 1 Hour", "Last 6 Hours", "Last 12 Hours", "Last 24 Hours"],
+        list(REPORT_RANGES),
         label_visibility="collapsed"
     )
     
@@ -736,18 +517,26 @@ with st.sidebar:
     
     # Auto-refresh toggle
     st.markdown("---")
-    auto_refresh = st.checkbox("Auto-Refresh (2s)", value=True)
+    auto_refresh = st.checkbox("Auto-Refresh (live)", value=True)
+    profiler.enabled = st.checkbox("⏱️ Render Timings", value=st.query_params.get("profile") == "1")
+    if profiler.enabled:
+        log_timings = st.checkbox("Write timings to file", help=PROFILE_LOG)
+        profiler.log_path = PROFILE_LOG if log_timings else None
+    
+    # Everything the dashboard displays, in a single request (shared with the live sections)
+    live_minutes = TIME_RANGE_MINUTES.get(time_range, 5)
+    snapshot, _ = get_live_data(live_minutes, zone_id)
     
     # CONTROL PANEL
     st.markdown("---")
     st.markdown("#### 🎛️ EMISSION CONTROL")
     
-    # Get control state from backend
-    try:
-        import requests
-        control_response = requests.get("http://localhost:5000/api/control/state", timeout=1)
-        control_state = control_response.json()
-    except:
+    # Control state comes with the dashboard snapshot
+    if snapshot is not None:
+        control_state = snapshot["control"]
+        control_online = True
+    else:
+        control_online = False
         control_state = {
             "exhaust_fan": False,
             "filtration_unit": False,
@@ -756,70 +545,61 @@ with st.sidebar:
             "auto_mode": True
         }
     
-    # Auto mode toggle
-    auto_mode = st.checkbox("🤖 Automatic Mode", value=control_state.get("auto_mode", True))
-    if auto_mode != control_state.get("auto_mode"):
-        try:
-            requests.post("http://localhost:5000/api/control/set", 
-                         json={"device": "auto_mode", "state": auto_mode, "reason": "User toggle"}, 
-                         timeout=1)
-        except:
-            pass
+    with profiler.section("control calls"):
+        # Auto mode toggle
+        auto_mode = st.checkbox("🤖 Automatic Mode", value=control_state.get("auto_mode", True))
+        if auto_mode != control_state.get("auto_mode"):
+            try:
+                set_device("auto_mode", auto_mode, "User toggle")
+            except:
+                pass
     
-    st.markdown("<small style='color: #888;'>Manual Controls:</small>", unsafe_allow_html=True)
+        st.markdown("<small style='color: #888;'>Manual Controls:</small>", unsafe_allow_html=True)
     
-    # Control buttons
-    col_c1, col_c2 = st.columns(2)
+        # Control buttons
+        col_c1, col_c2 = st.columns(2)
     
-    with col_c1:
-        fan_state = control_state.get("exhaust_fan", False)
-        fan_label = "🌪️ FAN ON" if fan_state else "🌪️ FAN OFF"
-        fan_type = "primary" if fan_state else "secondary"
-        if st.button(fan_label, use_container_width=True, type=fan_type, disabled=auto_mode):
+        with col_c1:
+            fan_state = control_state.get("exhaust_fan", False)
+            fan_label = "🌪️ FAN ON" if fan_state else "🌪️ FAN OFF"
+            fan_type = "primary" if fan_state else "secondary"
+            if st.button(fan_label, use_container_width=True, type=fan_type, disabled=auto_mode):
+                try:
+                    set_device("exhaust_fan", not fan_state, "Manual control")
+                    st.rerun()
+                except:
+                    pass
+    
+        with col_c2:
+            filter_state = control_state.get("filtration_unit", False)
+            filter_label = "🔧 FILTER ON" if filter_state else "🔧 FILTER OFF"
+            filter_type = "primary" if filter_state else "secondary"
+            if st.button(filter_label, use_container_width=True, type=filter_type, disabled=auto_mode):
+                try:
+                    set_device("filtration_unit", not filter_state, "Manual control")
+                    st.rerun()
+                except:
+                    pass
+    
+        vent_state = control_state.get("ventilation", False)
+        vent_label = "💨 VENTILATION ON" if vent_state else "💨 VENTILATION OFF"
+        vent_type = "primary" if vent_state else "secondary"
+        if st.button(vent_label, use_container_width=True, type=vent_type, disabled=auto_mode):
             try:
-                requests.post("http://localhost:5000/api/control/set",
-                            json={"device": "exhaust_fan", "state": not fan_state, "reason": "Manual control"},
-                            timeout=1)
+                set_device("ventilation", not vent_state, "Manual control")
                 st.rerun()
             except:
                 pass
     
-    with col_c2:
-        filter_state = control_state.get("filtration_unit", False)
-        filter_label = "🔧 FILTER ON" if filter_state else "🔧 FILTER OFF"
-        filter_type = "primary" if filter_state else "secondary"
-        if st.button(filter_label, use_container_width=True, type=filter_type, disabled=auto_mode):
+        # Emergency shutdown
+        st.markdown("<br>", unsafe_allow_html=True)
+        if st.button("🚨 EMERGENCY SHUTDOWN", use_container_width=True, type="secondary"):
             try:
-                requests.post("http://localhost:5000/api/control/set",
-                            json={"device": "filtration_unit", "state": not filter_state, "reason": "Manual control"},
-                            timeout=1)
+                set_device("emergency_shutdown", True, "Emergency shutdown activated")
                 st.rerun()
             except:
                 pass
     
-    vent_state = control_state.get("ventilation", False)
-    vent_label = "💨 VENTILATION ON" if vent_state else "💨 VENTILATION OFF"
-    vent_type = "primary" if vent_state else "secondary"
-    if st.button(vent_label, use_container_width=True, type=vent_type, disabled=auto_mode):
-        try:
-            requests.post("http://localhost:5000/api/control/set",
-                        json={"device": "ventilation", "state": not vent_state, "reason": "Manual control"},
-                        timeout=1)
-            st.rerun()
-        except:
-            pass
-    
-    # Emergency shutdown
-    st.markdown("<br>", unsafe_allow_html=True)
-    if st.button("🚨 EMERGENCY SHUTDOWN", use_container_width=True, type="secondary"):
-        try:
-            requests.post("http://localhost:5000/api/control/set",
-                        json={"device": "emergency_shutdown", "state": True, "reason": "Emergency shutdown activated"},
-                        timeout=1)
-            st.rerun()
-        except:
-            pass
-    
     st.markdown("---")
     st.markdown(
         """
@@ -850,7 +630,7 @@ with col_report:
     st.markdown("<br>", unsafe_allow_html=True)
     report_time_range = st.selectbox(
         "📊 Report Period",
-        ["Last 30 Minutes", "Last 1 Hour", "Last 6 Hours", "Last 12 Hours", "Last 24 Hours"],
+        list(REPORT_RANGES),
         key="report_dropdown"
     )
     
@@ -858,14 +638,13 @@ with col_report:
         st.session_state['generate_report'] = True
         st.session_state['report_time_range'] = report_time_range
 
-# Create placeholder for auto-refresh
-placeholder = st.empty()
+# LIVE SECTIONS
+# Fragments drawn on each run of the page. Charts, gauge and diagnostic are cached per frame
+# (cached_render), so a run for a control change or a widget redraws them without rebuilding.
 
-# Main rendering loop
-with placeholder.container():
-    # Load data
-    df = load_sensor_data()
-    
+@st.fragment
+def kpi_row(minutes, zone):
+    _, df = get_live_data(minutes, zone)
     if df.empty:
         st.markdown(
             """
@@ -878,13 +657,11 @@ with placeholder.container():
             """,
             unsafe_allow_html=True
         )
-    else:
-        latest = df.iloc[-1]
-        
-        
-        # TOP KPI ROW (Heads-Up Display)
-        
-        
+        return
+    latest = df.iloc[-1]
+    
+    # TOP KPI ROW (Heads-Up Display)
+    with profiler.section("kpi cards"):
         st.markdown("### 📊 LIVE TELEMETRY")
         
         col1, col2, col3, col4 = st.columns(4)
@@ -917,7 +694,7 @@ with placeholder.container():
                 """,
                 unsafe_allow_html=True
             )
-
+        
         with col2:
             st.markdown(
                 f"""
@@ -930,7 +707,7 @@ with placeholder.container():
                 """,
                 unsafe_allow_html=True
             )
-
+        
         with col3:
             st.markdown(
                 f"""
@@ -943,7 +720,7 @@ with placeholder.container():
                 """,
                 unsafe_allow_html=True
             )
-
+        
         with col4:
             st.markdown(
                 f"""
@@ -958,62 +735,48 @@ with placeholder.container():
             )
         
         st.markdown("<br>", unsafe_allow_html=True)
-        
-        
-        # AUTOMATED CONTROL LOGIC
+
+@st.fragment
+def control_status(minutes, zone):
+    snapshot, df = get_live_data(minutes, zone)
+    if df.empty:
+        return
+    control_online = snapshot is not None
+    control_state = snapshot["control"] if control_online else {}
+    
+    with profiler.section("control status"):
+        # AUTOMATED CONTROL ACTIONS (decided by the backend on ingest; shown here only)
         try:
-            import requests
-            control_response = requests.get("http://localhost:5000/api/control/state", timeout=1)
-            control_state = control_response.json()
+            history = snapshot["control_history"]
+            cutoff = (datetime.now() - timedelta(seconds=AUTO_ACTION_WINDOW_SECONDS)).strftime('%Y-%m-%d %H:%M:%S')
+            actions_taken = [
+                AUTO_ACTION_LABELS.get(action["device"], action["device"])
+                for action in history
+                if str(action.get("reason", "")).startswith(AUTO_REASON_PREFIX)
+                and action.get("state") == "ON" and action.get("timestamp", "") >= cutoff
+            ]
             
-            if control_state.get("auto_mode", True):
-                # Automatic threshold-based control
-                actions_taken = []
-                
-                # High dust -> activate filtration
-                if dust_val > 1000 and not control_state.get("filtration_unit"):
-                    requests.post("http://localhost:5000/api/control/set",
-                                json={"device": "filtration_unit", "state": True, 
-                                     "reason": f"Auto: Dust level {dust_val:.1f} > 1000 µg/m³"},
-                                timeout=1)
-                    actions_taken.append("🔧 Filtration Unit ACTIVATED")
-                
-                # High TVOC -> activate ventilation
-                if tvoc_val > 500 and not control_state.get("ventilation"):
-                    requests.post("http://localhost:5000/api/control/set",
-                                json={"device": "ventilation", "state": True,
-                                     "reason": f"Auto: TVOC {tvoc_val} > 500 ppb"},
-                                timeout=1)
-                    actions_taken.append("💨 Ventilation ACTIVATED")
-                
-                # High eCO2 -> activate exhaust fan
-                if eco2_val > 1200 and not control_state.get("exhaust_fan"):
-                    requests.post("http://localhost:5000/api/control/set",
-                                json={"device": "exhaust_fan", "state": True,
-                                     "reason": f"Auto: eCO₂ {eco2_val} > 1200 ppm"},
-                                timeout=1)
-                    actions_taken.append("🌪️ Exhaust Fan ACTIVATED")
-                
-                # Show control actions if any
-                if actions_taken:
-                    st.markdown("### 🤖 AUTOMATED CONTROL ACTIONS")
-                    for action in actions_taken:
-                        st.success(action)
-                    st.markdown("<br>", unsafe_allow_html=True)
+            # Show control actions if any
+            if actions_taken:
+                st.markdown("### 🤖 AUTOMATED CONTROL ACTIONS")
+                for action in actions_taken:
+                    st.success(action)
+                st.markdown("<br>", unsafe_allow_html=True)
         except:
             pass
         
-        
+
         # VISUALIZATION LAYER
         
-        
+
         # CONTROL SYSTEM STATUS DISPLAY
         st.markdown("### 🎛️ EMISSION CONTROL STATUS")
         
         try:
-            import requests
-            control_response = requests.get("http://localhost:5000/api/control/state", timeout=1)
-            ctrl = control_response.json()
+            # State comes with the live snapshot
+            if not control_online:
+                raise ConnectionError("Control state unavailable")
+            ctrl = control_state
             
             ctrl_col1, ctrl_col2, ctrl_col3, ctrl_col4 = st.columns(4)
             
@@ -1066,162 +829,181 @@ with placeholder.container():
                 """, unsafe_allow_html=True)
         except:
             st.info("🔌 Control system initializing...")
-        
-        st.markdown("<br>", unsafe_allow_html=True)
-        
-        
-        st.markdown("### 📈 EMISSION TRENDS")
-        
-        chart_col1, chart_col2 = st.columns(2)
-        
-        with chart_col1:
-            # Live Emission Trend (Dust & TVOC)
-            fig_emissions = go.Figure()
-            
-            fig_emissions.add_trace(go.Scatter(
-                x=df['timestamp'],
-                y=df['dust'],
-                mode='lines+markers',
-                name='PM2.5 Dust',
-                line=dict(color='#00FF94', width=2),
-                marker=dict(size=6, symbol='circle'),
-                hovertemplate='<b>Dust</b>: %{y:.2f} µg/m³<br>%{x}<extra></extra>'
-            ))
-            
-            fig_emissions.add_trace(go.Scatter(
-                x=df['timestamp'],
-                y=df['tvoc'],
-                mode='lines+markers',
-                name='TVOC',
-                line=dict(color='#FFD700', width=2),
-                marker=dict(size=6, symbol='diamond'),
-                hovertemplate='<b>TVOC</b>: %{y} ppb<br>%{x}<extra></extra>',
-                yaxis='y2'
-            ))
-            
-            fig_emissions.update_layout(
-                title=dict(
-                    text='Live Emission Trend',
-                    font=dict(size=16, color='#E8E8E8')
-                ),
-                template='plotly_dark',
-                paper_bgcolor='rgba(22, 27, 34, 0.7)',
-                plot_bgcolor='rgba(14, 17, 23, 0.9)',
-                hovermode='x unified',
-                legend=dict(
-                    orientation='h',
-                    yanchor='bottom',
-                    y=1.02,
-                    xanchor='right',
-                    x=1
-                ),
-                xaxis=dict(title='Time', showgrid=True, gridcolor='rgba(255,255,255,0.1)'),
-                yaxis=dict(title='PM2.5 (µg/m³)', showgrid=True, gridcolor='rgba(255,255,255,0.1)'),
-                yaxis2=dict(
-                    title='TVOC (ppb)',
-                    overlaying='y',
-                    side='right',
-                    showgrid=False
-                ),
-                height=350
-            )
-            
-            st.plotly_chart(fig_emissions, use_container_width=True)
-        
-        with chart_col2:
-            # Thermal Conditions (Area Chart)
-            fig_temp = go.Figure()
-            
-            fig_temp.add_trace(go.Scatter(
-                x=df['timestamp'],
-                y=df['temp'],
-                mode='lines',
-                name='Temperature',
-                line=dict(color='#FF2B2B', width=0),
-                fill='tozeroy',
-                fillcolor='rgba(255, 43, 43, 0.3)',
-                hovertemplate='<b>Temperature</b>: %{y:.1f}°C<br>%{x}<extra></extra>'
-            ))
-            
-            # Add threshold line
-            fig_temp.add_hline(
-                y=THRESHOLDS['temp']['warning'],
-                line_dash='dash',
-                line_color='#FFD700',
-                annotation_text='Warning Threshold',
-                annotation_position='right'
-            )
-            
-            fig_temp.update_layout(
-                title=dict(
-                    text='Thermal Conditions',
-                    font=dict(size=16, color='#E8E8E8')
-                ),
-                template='plotly_dark',
-                paper_bgcolor='rgba(22, 27, 34, 0.7)',
-                plot_bgcolor='rgba(14, 17, 23, 0.9)',
-                hovermode='x',
-                xaxis=dict(title='Time', showgrid=True, gridcolor='rgba(255,255,255,0.1)'),
-                yaxis=dict(title='Temperature (°C)', showgrid=True, gridcolor='rgba(255,255,255,0.1)'),
-                height=350
-            )
-            
-            st.plotly_chart(fig_temp, use_container_width=True)
-        
-        st.markdown("<br>", unsafe_allow_html=True)
-        
-        
-        # REGULATORY COMPLIANCE GAUGE
-        
-        
-        st.markdown("### 🎯 REGULATORY COMPLIANCE")
-        
-        aqi, aqi_status = calculate_aqi(df)
-        
-        gauge_color = '#00FF94' if aqi_status == 'safe' else ('#FFD700' if aqi_status == 'warning' else '#FF2B2B')
-        
-        fig_gauge = go.Figure(go.Indicator(
-            mode='gauge+number+delta',
-            value=aqi,
-            title={'text': 'Air Quality Index (AQI)', 'font': {'size': 20, 'color': '#E8E8E8'}},
-            delta={'reference': 30, 'increasing': {'color': '#FF2B2B'}, 'decreasing': {'color': '#00FF94'}},
-            gauge={
-                'axis': {'range': [0, 100], 'tickcolor': gauge_color},
-                'bar': {'color': gauge_color},
-                'bgcolor': 'rgba(14, 17, 23, 0.9)',
-                'borderwidth': 2,
-                'bordercolor': gauge_color,
-                'steps': [
-                    {'range': [0, 30], 'color': 'rgba(0, 255, 148, 0.2)'},
-                    {'range': [30, 60], 'color': 'rgba(255, 215, 0, 0.2)'},
-                    {'range': [60, 100], 'color': 'rgba(255, 43, 43, 0.2)'}
-                ],
-                'threshold': {
-                    'line': {'color': '#00E5FF', 'width': 4},
-                    'thickness': 0.75,
-                    'value': aqi
-                }
+    
+    st.markdown("<br>", unsafe_allow_html=True)
+
+def emissions_figure(df):
+    # Live Emission Trend (Dust & TVOC)
+    fig_emissions = go.Figure()
+    
+    fig_emissions.add_trace(make_trace(
+        df['timestamp'],
+        df['dust'],
+        mode='lines+markers',
+        name='PM2.5 Dust',
+        line=dict(color='#00FF94', width=2),
+        marker=dict(size=6, symbol='circle'),
+        hovertemplate='<b>Dust</b>: %{y:.2f} µg/m³<br>%{x}<extra></extra>'
+    ))
+    
+    fig_emissions.add_trace(make_trace(
+        df['timestamp'],
+        df['tvoc'],
+        mode='lines+markers',
+        name='TVOC',
+        line=dict(color='#FFD700', width=2),
+        marker=dict(size=6, symbol='diamond'),
+        hovertemplate='<b>TVOC</b>: %{y} ppb<br>%{x}<extra></extra>',
+        yaxis='y2'
+    ))
+    
+    fig_emissions.update_layout(
+        title=dict(
+            text='Live Emission Trend',
+            font=dict(size=16, color='#E8E8E8')
+        ),
+        template='plotly_dark',
+        paper_bgcolor='rgba(22, 27, 34, 0.7)',
+        plot_bgcolor='rgba(14, 17, 23, 0.9)',
+        hovermode='x unified',
+        legend=dict(
+            orientation='h',
+            yanchor='bottom',
+            y=1.02,
+            xanchor='right',
+            x=1
+        ),
+        xaxis=dict(title='Time', showgrid=True, gridcolor='rgba(255,255,255,0.1)'),
+        yaxis=dict(title='PM2.5 (µg/m³)', showgrid=True, gridcolor='rgba(255,255,255,0.1)'),
+        yaxis2=dict(
+            title='TVOC (ppb)',
+            overlaying='y',
+            side='right',
+            showgrid=False
+        ),
+        height=350
+    )
+    return fig_emissions
+
+def thermal_figure(df):
+    # Thermal Conditions (Area Chart)
+    fig_temp = go.Figure()
+    
+    fig_temp.add_trace(make_trace(
+        df['timestamp'],
+        df['temp'],
+        mode='lines',
+        name='Temperature',
+        line=dict(color='#FF2B2B', width=0),
+        fill='tozeroy',
+        fillcolor='rgba(255, 43, 43, 0.3)',
+        hovertemplate='<b>Temperature</b>: %{y:.1f}°C<br>%{x}<extra></extra>'
+    ))
+    
+    # Add threshold line
+    fig_temp.add_hline(
+        y=bound('temp', 'moderate'),
+        line_dash='dash',
+        line_color='#FFD700',
+        annotation_text='Warning Threshold',
+        annotation_position='right'
+    )
+    
+    fig_temp.update_layout(
+        title=dict(
+            text='Thermal Conditions',
+            font=dict(size=16, color='#E8E8E8')
+        ),
+        template='plotly_dark',
+        paper_bgcolor='rgba(22, 27, 34, 0.7)',
+        plot_bgcolor='rgba(14, 17, 23, 0.9)',
+        hovermode='x',
+        xaxis=dict(title='Time', showgrid=True, gridcolor='rgba(255,255,255,0.1)'),
+        yaxis=dict(title='Temperature (°C)', showgrid=True, gridcolor='rgba(255,255,255,0.1)'),
+        height=350
+    )
+    return fig_temp
+
+@st.fragment
+def trend_charts(minutes, zone):
+    _, df = get_live_data(minutes, zone)
+    if df.empty:
+        return
+    
+    st.markdown("### 📈 EMISSION TRENDS")
+    
+    chart_col1, chart_col2 = st.columns(2)
+    
+    with chart_col1, profiler.section("chart: emissions"):
+        st.plotly_chart(cached_render("emissions", lambda: emissions_figure(df)), use_container_width=True)
+    
+    with chart_col2, profiler.section("chart: thermal"):
+        st.plotly_chart(cached_render("thermal", lambda: thermal_figure(df)), use_container_width=True)
+    
+    st.markdown("<br>", unsafe_allow_html=True)
+
+def gauge_figure(df):
+    aqi, aqi_status = calculate_aqi(df)
+    
+    gauge_color = '#00FF94' if aqi_status == 'safe' else ('#FFD700' if aqi_status == 'warning' else '#FF2B2B')
+    
+    fig_gauge = go.Figure(go.Indicator(
+        mode='gauge+number+delta',
+        value=aqi,
+        title={'text': 'Air Quality Index (AQI)', 'font': {'size': 20, 'color': '#E8E8E8'}},
+        delta={'reference': 30, 'increasing': {'color': '#FF2B2B'}, 'decreasing': {'color': '#00FF94'}},
+        gauge={
+            'axis': {'range': [0, 100], 'tickcolor': gauge_color},
+            'bar': {'color': gauge_color},
+            'bgcolor': 'rgba(14, 17, 23, 0.9)',
+            'borderwidth': 2,
+            'bordercolor': gauge_color,
+            'steps': [
+                {'range': [0, 30], 'color': 'rgba(0, 255, 148, 0.2)'},
+                {'range': [30, 60], 'color': 'rgba(255, 215, 0, 0.2)'},
+                {'range': [60, 100], 'color': 'rgba(255, 43, 43, 0.2)'}
+            ],
+            'threshold': {
+                'line': {'color': '#00E5FF', 'width': 4},
+                'thickness': 0.75,
+                'value': aqi
             }
-        ))
-        
-        fig_gauge.update_layout(
-            template='plotly_dark',
-            paper_bgcolor='rgba(22, 27, 34, 0.7)',
-            height=300,
-            font={'color': '#E8E8E8'}
-        )
-        
-        st.plotly_chart(fig_gauge, use_container_width=True)
-        
-        st.markdown("<br>", unsafe_allow_html=True)
-        
-        
-        # AI DIAGNOSTIC LOG
-        
-        
-        st.markdown("### 🤖 AI SUPERVISOR")
-        
-        diagnostic = generate_ai_diagnostic(df)
+        }
+    ))
+    
+    fig_gauge.update_layout(
+        template='plotly_dark',
+        paper_bgcolor='rgba(22, 27, 34, 0.7)',
+        height=300,
+        font={'color': '#E8E8E8'}
+    )
+    return fig_gauge
+
+@st.fragment
+def compliance_gauge(minutes, zone):
+    _, df = get_live_data(minutes, zone)
+    if df.empty:
+        return
+    
+    # REGULATORY COMPLIANCE GAUGE
+    st.markdown("### 🎯 REGULATORY COMPLIANCE")
+    
+    with profiler.section("gauge"):
+        st.plotly_chart(cached_render("gauge", lambda: gauge_figure(df)), use_container_width=True)
+    
+    st.markdown("<br>", unsafe_allow_html=True)
+
+@st.fragment
+def ai_supervisor(minutes, zone):
+    _, df = get_live_data(minutes, zone)
+    if df.empty:
+        return
+    
+    # AI DIAGNOSTIC LOG
+    st.markdown("### 🤖 AI SUPERVISOR")
+    
+    with profiler.section("diagnostic"):
+        diagnostic = cached_render("diagnostic", lambda: generate_ai_diagnostic(df))
         
         st.markdown(
             f"""
@@ -1232,65 +1014,98 @@ with placeholder.container():
             """,
             unsafe_allow_html=True
         )
-        
-        
-        # PDF REPORT GENERATION (Inside container to prevent refresh clearing)
-        
-        
-        if 'generate_report' in st.session_state and st.session_state['generate_report']:
-            report_time_range = st.session_state.get('report_time_range', 'Last 1 Hour')
-            
-            # Parse time range for report
-            time_mapping = {
-                "Last 30 Minutes": 30,
-                "Last 1 Hour": 60,
-                "Last 6 Hours": 360,
-                "Last 12 Hours": 720,
-                "Last 24 Hours": 1440
-            }
-            
-            minutes = time_mapping.get(report_time_range, 60)
-            cutoff = datetime.now() - timedelta(minutes=minutes)
-            
-            # Filter data for report
-            df_report = df[df['timestamp'] >= cutoff].copy()
-            
-            if not df_report.empty:
-                try:
-                    with st.spinner('🔄 Generating comprehensive PDF report with AI analysis...'):
-                        pdf_buffer = create_pdf_report(df_report, report_time_range)
-                    
-                    # Create download button
-                    filename = f"AirSight_Report_{datetime.now().strftime('%Y%m%d_%H%M%S')}.pdf"
-                    
-                    st.success("✅ Report generated successfully!")
-                    st.download_button(
-                        label="📥 Click Here to Download Your PDF Report",
-                        data=pdf_buffer,
-                        file_name=filename,
-                        mime="application/pdf",
-                        use_container_width=True,
-                        type="primary"
-                    )
-                    
-                    # Don't reset flag yet - keep button visible
-                    if st.button("🔄 Generate New Report", use_container_width=True):
-                        st.session_state['generate_report'] = False
-                        st.rerun()
-                    
-                    # Pause auto-refresh while showing download
-                    auto_refresh = False
-                    
-                except Exception as e:
-                    st.error(f"❌ Error generating report: {str(e)}")
-                    import traceback
-                    st.code(traceback.format_exc())
-                    st.session_state['generate_report'] = False
-            else:
-                st.warning(f"⚠️ No data available for {report_time_range}. Please select a different time range.")
-                st.session_state['generate_report'] = False
-
-# Auto-refresh logic
-if auto_refresh:
-    time.sleep(2)
-    st.rerun()
+
+kpi_row(live_minutes, zone_id)
+control_status(live_minutes, zone_id)
+trend_charts(live_minutes, zone_id)
+compliance_gauge(live_minutes, zone_id)
+ai_supervisor(live_minutes, zone_id)
+
+
+# PDF REPORT GENERATION
+# Built by a background job (report_jobs.py); while it runs, a fragment polls its progress.
+# Identical requests with no new readings in between are answered from the job service's cache
+
+
+def report_panel():
+    job = st.session_state['report_job']
+    if 'pdf' not in job:
+        try:
+            status = report_status(job)
+        except requests.RequestException as e:
+            st.error(f"❌ Report service unavailable: {str(e)}")
+            return
+        if status is None or status['status'] == 'failed':
+            st.error(f"❌ Error generating report: {status['error'] if status else 'job not found'}")
+            del st.session_state['report_job']
+            return
+        if status['status'] != 'done':
+            st.progress(status['progress'], text=f"🔄 Generating {job['time_range']} report: {status['stage']}...")
+            return
+        if not status['rows']:
+            st.warning(f"⚠️ No data available for {job['time_range']}. Please select a different time range.")
+            del st.session_state['report_job']
+            return
+        job.update(pdf=report_pdf(job), finished_at=status['finished_at'], cached=status['cached'])
+        # Redraw without polling
+        st.rerun()
+    
+    filename = f"AirSight_Report_{datetime.fromtimestamp(job['finished_at']).strftime('%Y%m%d_%H%M%S')}.pdf"
+    st.success("✅ Report generated successfully!" + (" (unchanged data - served from cache)" if job['cached'] else ""))
+    st.download_button(
+        label="📥 Click Here to Download Your PDF Report",
+        data=job['pdf'],
+        file_name=filename,
+        mime="application/pdf",
+        use_container_width=True,
+        type="primary"
+    )
+    
+    if st.button("🔄 Generate New Report", use_container_width=True):
+        del st.session_state['report_job']
+        st.rerun()
+
+with profiler.section("report"):
+    if st.session_state.get('generate_report'):
+        st.session_state['generate_report'] = False
+        try:
+            st.session_state['report_job'] = submit_report(st.session_state.get('report_time_range', 'Last 1 Hour'), zone_id)
+        except Exception as e:
+            st.error(f"❌ Error generating report: {str(e)}")
+    
+    if 'report_job' in st.session_state:
+        polling = REPORT_POLL_SECONDS if 'pdf' not in st.session_state['report_job'] else None
+        st.fragment(report_panel, run_every=polling)()
+
+# Full runs only; the live sections are timed each time their fragment reruns
+if profiler.enabled:
+    profiler.record("full run", (time.perf_counter() - run_started) * 1000)
+
+@st.fragment
+def render_timings():
+    with st.expander("⏱️ Render Timings", expanded=False):
+        st.dataframe(pd.DataFrame(profiler.summary()), hide_index=True, use_container_width=True)
+        st.caption(f"Last {profiler.window} runs per section, in ms")
+
+if profiler.enabled:
+    render_timings()
+
+# AUTO-REFRESH
+# The only thing that runs while nothing happens: a cheap check of the event stream's counter.
+# Readings and control changes are pushed by the backend; the page is redrawn within
+# WATCH_SECONDS of one (and every STREAM_DOWN_REFRESH_SECONDS while the stream is down).
+
+@st.fragment(run_every=WATCH_SECONDS if auto_refresh else None)
+def live_watcher(rendered_version, drawn_at):
+    # Not while the page is being drawn: at most one redraw per WATCH_SECONDS, however busy the stream
+    if time.monotonic() - drawn_at < WATCH_SECONDS:
+        return
+    event_stream = get_event_stream()
+    if event_stream.connected:
+        changed = event_stream.version != rendered_version
+    else:
+        changed = time.monotonic() - drawn_at >= STREAM_DOWN_REFRESH_SECONDS
+    if changed:
+        st.rerun()
+
+live_watcher(rendered_version, time.monotonic())
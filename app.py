@@ -1,13 +1,185 @@
-import pandas as pd
 import os
-from flask import Flask, jsonify, request
-import requests
-from datetime import datetime
+import json
+import math
+import time
+import queue
+import atexit
+import threading
+from flask import Flask, Response, g, jsonify, request, stream_with_context
+import pandas as pd
+from datetime import datetime, timedelta
+from collections import deque
+from storage import DATA_DIR, open_store
+from write_behind import WriteBehindLogger
+from partitions import DEFAULT_ZONE, PartitionedSensorLog, check_zone
+from rollups import METRICS, RESOLUTIONS, bucket_start, to_buckets
+from events import EventBroker, RelayedEventBroker
+from ingest_queue import IngestQueue
+from openmeteo import DEFAULT_URL, CachePrefetcher, OpenMeteoClient, UpstreamUnavailable
+from locations import DEFAULT_LOCATION, load_locations
+from risk_engine import classify_entries
+from control_rules import evaluate as evaluate_control_rules
+from control_store import ControlStore, VersionConflict
+from metrics import REGISTRY, MetricsHub, render
+from report_jobs import ReportJobs
+from reports import REPORT_RANGES
+from report_stats import aggregate, aggregate_rollups
 
 app = Flask(__name__)
 
 # Ensure data directory exists
-os.makedirs("data", exist_ok=True)
+os.makedirs(DATA_DIR, exist_ok=True)
+
+# Sensor, control and outdoor logs (SQLite by default, see storage.py)
+store = open_store()
+
+# Worker under serve.py: writes, the sensor log, control state and events
+# live in the storage process (storage_server.py); the store is only read here
+STORAGE_SERVER = os.environ.get("AIRSIGHT_STORAGE_SERVER")
+if STORAGE_SERVER:
+    from storage_server import connect
+    storage_process = connect(STORAGE_SERVER, os.environ.get("AIRSIGHT_STORAGE_AUTHKEY", "").encode())
+else:
+    storage_process = None
+
+# Live push of new readings and control changes to /api/stream subscribers
+STREAM_BUFFER = int(os.environ.get("AIRSIGHT_STREAM_BUFFER", "256"))
+events = RelayedEventBroker(storage_process.events(), STREAM_BUFFER) if storage_process else EventBroker(STREAM_BUFFER)
+STREAM_HEARTBEAT = float(os.environ.get("AIRSIGHT_STREAM_HEARTBEAT", "15"))
+
+
+def announce_written(kind, records):
+    """Publish sensor readings once they are persisted and queryable."""
+    if kind == "sensor":
+        ingest_queue.persisted(records)
+        events.publish("readings", records)
+
+# Background group-commit writer (AIRSIGHT_WRITE_BEHIND=0 writes inline instead;
+# workers always hand records to the storage process)
+WRITE_BEHIND = os.environ.get("AIRSIGHT_WRITE_BEHIND", "1") == "1" or storage_process is not None
+DURABILITY = os.environ.get("AIRSIGHT_DURABILITY", "fsync")
+WRITER_OPTIONS = {
+    "max_queue": int(os.environ.get("AIRSIGHT_WRITE_QUEUE", "10000")),
+    "batch_size": int(os.environ.get("AIRSIGHT_FLUSH_BATCH", "500")),
+    "flush_interval": float(os.environ.get("AIRSIGHT_FLUSH_INTERVAL", "0.25")),
+    "durability": DURABILITY,
+    "on_write": announce_written,
+}
+if storage_process:
+    writer = storage_process.writer()
+else:
+    writer = WriteBehindLogger(store, **WRITER_OPTIONS)
+    if WRITE_BEHIND:
+        writer.start()
+        atexit.register(writer.stop)
+
+
+def make_writer(target):
+    """Started writer for a zone store, so zones flush independently."""
+    return WriteBehindLogger(target, **WRITER_OPTIONS).start()
+
+
+# Sensor readings partitioned by zone (see partitions.py). Each zone keeps
+# its recent readings in memory for /api/latest-sensor and /api/sensor-data,
+# warmed from the tail of its log, plus per-bucket count/sum/min/max/last
+# at 1m/1h/1d maintained on ingest
+RING_CAPACITY = int(os.environ.get("AIRSIGHT_RING_CAPACITY", "5000"))
+if storage_process:
+    sensor_log = storage_process.sensor_log()
+else:
+    sensor_log = PartitionedSensorLog(
+        store,
+        default_writer=writer if WRITE_BEHIND else None,
+        backend=store.name,
+        writer_factory=make_writer if WRITE_BEHIND else None,
+        ring_capacity=RING_CAPACITY,
+        fsync=DURABILITY == "fsync",
+        on_write=announce_written
+    )
+    # Persists still-open rollup buckets; registered last so it runs before the writer stops
+    atexit.register(sensor_log.close)
+
+# Prometheus metrics at /metrics (see metrics.py). Workers under serve.py
+# push their snapshots to the storage process, which serves the sum
+REQUEST_SECONDS = REGISTRY.histogram(
+    "airsight_http_request_duration_seconds", "Time to produce a response", ("method", "route"))
+REQUESTS = REGISTRY.counter("airsight_http_requests_total", "Responses sent", ("method", "route", "status"))
+STAGE_SECONDS = REGISTRY.histogram("airsight_ingest_stage_seconds", "Time spent in each ingest stage", ("stage",))
+READINGS_INGESTED = REGISTRY.counter("airsight_readings_ingested_total", "Readings stored, by risk level", ("risk",))
+METRICS_PUSH_INTERVAL = float(os.environ.get("AIRSIGHT_METRICS_PUSH", "5"))
+if storage_process:
+    metrics_hub = storage_process.metrics()
+else:
+    metrics_hub = MetricsHub(REGISTRY)
+    REGISTRY.gauge(
+        "airsight_write_queue_depth", "Records waiting for the write-behind writers", ("zone",),
+        callback=lambda: {zone: p.get("writer", {}).get("queue_depth", 0) for zone, p in sensor_log.metrics().items()}
+    )
+
+
+def push_metrics():
+    """Worker under serve.py: keep this worker's metrics in the storage process current."""
+    while True:
+        time.sleep(METRICS_PUSH_INTERVAL)
+        try:
+            metrics_hub.publish(os.getpid(), REGISTRY.snapshot())
+        except Exception:
+            # Storage process shutting down; the next push retries
+            pass
+
+
+if storage_process and REGISTRY.enabled:
+    threading.Thread(target=push_metrics, name="metrics-push", daemon=True).start()
+
+# Outdoor air quality from Open-Meteo: pooled, cached per location and hour,
+# behind a circuit breaker so a slow upstream cannot tie up worker threads.
+# Workers under serve.py share the storage process's client and cache
+LOCATIONS = load_locations()
+OUTDOOR_DEFAULT = DEFAULT_LOCATION if DEFAULT_LOCATION in LOCATIONS else next(iter(LOCATIONS))
+if storage_process:
+    open_meteo = storage_process.outdoor()
+else:
+    open_meteo = OpenMeteoClient(
+        url=os.environ.get("AIRSIGHT_OPENMETEO_URL", DEFAULT_URL),
+        ttl=float(os.environ.get("AIRSIGHT_OPENMETEO_TTL", "600")),
+        max_stale=float(os.environ.get("AIRSIGHT_OPENMETEO_MAX_STALE", "10800")),
+        read_timeout=float(os.environ.get("AIRSIGHT_OPENMETEO_TIMEOUT", "5")),
+        max_concurrency=int(os.environ.get("AIRSIGHT_OPENMETEO_CONCURRENCY", "4"))
+    )
+    REGISTRY.gauge(
+        "airsight_openmeteo_circuit_open", "1 while the Open-Meteo circuit breaker is open",
+        callback=lambda: int(open_meteo.breaker.state == "open")
+    )
+
+# All registered locations are refreshed together in the background, by one
+# process only: started by ``python app.py`` or the storage process, not on import
+OUTDOOR_REFRESH = float(os.environ.get("AIRSIGHT_OUTDOOR_REFRESH", "300"))
+outdoor_prefetcher = None if storage_process else CachePrefetcher(
+    open_meteo,
+    [(loc["latitude"], loc["longitude"]) for loc in LOCATIONS.values()],
+    interval=OUTDOOR_REFRESH
+)
+
+
+def start_outdoor_prefetch():
+    """Start refreshing every location's outdoor data (unless AIRSIGHT_OUTDOOR_REFRESH is 0)."""
+    if outdoor_prefetcher is not None and OUTDOOR_REFRESH > 0:
+        outdoor_prefetcher.start()
+
+# Upper bound on readings accepted by a single /api/data/batch request
+MAX_BATCH_SIZE = 1000
+
+# Page sizes for time-range queries on /api/sensor-data
+DEFAULT_PAGE_SIZE = 1000
+MAX_PAGE_SIZE = 100000
+
+SENSOR_FIELDS = ["dust", "temp", "tvoc", "eco2"]
+
+# /api/dashboard/snapshot: windows longer than this (minutes) are served from 1m rollups
+SNAPSHOT_ROLLUP_MINUTES = 60
+MAX_SNAPSHOT_MINUTES = 7 * 24 * 60
+SNAPSHOT_FIELDS = ["timestamp", "dust", "temp", "tvoc", "eco2", "risk"]
+SNAPSHOT_HISTORY = 10
 
 
 @app.route("/")
@@ -15,68 +187,15 @@ def index():
     return "Server is running"
 
 
-def fetch_live_data():
-    """Fetch live air quality data for Mumbai from Open-Meteo API."""
-    url = "https://air-quality-api.open-meteo.com/v1/air-quality"
-    params = {
-        "latitude": 19.0760,          # Mumbai coordinates
-        "longitude": 72.8777,
-        "hourly": "pm2_5,pm10",
-        "timezone": "auto"
-    }
-
-    response = requests.get(url, params=params)
-    data = response.json()
-
-    # Take the latest available hour (last element in list)
-   
-
-def fetch_live_data():
-    url = "https://air-quality-api.open-meteo.com/v1/air-quality"
-    params = {
-        "latitude": 19.0760,
-        "longitude": 72.8777,
-        "hourly": "pm2_5,pm10",
-        "timezone": "auto"
-    }
-
-    response = requests.get(url, params=params)
-    data = response.json()
-
-    # list of timestamps from API
-    times = data["hourly"]["time"]
-    now = datetime.now().strftime("%Y-%m-%dT%H:00")
-
-    # find index of current hour
-    if now in times:
-        i = times.index(now)
-    else:
-        i = -1  # fallback
-
-    entry = {
-        "timestamp": times[i],
-        "pm2_5": data["hourly"]["pm2_5"][i],
-        "pm10": data["hourly"]["pm10"][i]
-    }
-
-    return entry
-
-
-    entry = {
-        "timestamp": data["hourly"]["time"][i],
-        "pm2_5": data["hourly"]["pm2_5"][i],
-        "pm10": data["hourly"]["pm10"][i],
-    }
+def fetch_live_data(location=OUTDOOR_DEFAULT):
+    """Current-hour outdoor air quality for a registered location (cached, see openmeteo.py)."""
+    site = LOCATIONS[location]
+    entry = open_meteo.current(site["latitude"], site["longitude"])
+    entry["location"] = location
     return entry
 
 
 def classify_risk(entry):
-    def log_to_csv(entry):
-     df = pd.DataFrame([entry])
-     file_path = os.path.join("data", "realtime_log.csv")
-     header = not os.path.exists(file_path)  # write header only first time
-     df.to_csv(file_path, mode="a", header=header, index=False)
-
     pm2_5 = entry["pm2_5"]
 
     if pm2_5 <= 30:
@@ -95,21 +214,24 @@ def classify_risk(entry):
     return risk, alert
 
 def log_to_csv(entry):
-    """Save each reading into a CSV file."""
-    df = pd.DataFrame([entry])
-    file_path = os.path.join("data", "realtime_log.csv")
-
-    # Write header only the first time
-    header = not os.path.exists(file_path)
-
-    df.to_csv(file_path, mode="a", header=header, index=False)
+    """Save each outdoor reading to the configured store."""
+    if WRITE_BEHIND:
+        writer.submit_outdoor([entry])
+    else:
+        store.append_outdoor([entry], fsync=DURABILITY == "fsync")
 
 
 
 @app.route("/data")
 def get_data():
     # 1) Get live readings
-    entry = fetch_live_data()
+    location = request.args.get("location", OUTDOOR_DEFAULT).lower()
+    if location not in LOCATIONS:
+        return jsonify({"error": f"Unknown location: {location}"}), 404
+    try:
+        entry = fetch_live_data(location)
+    except UpstreamUnavailable as e:
+        return jsonify({"error": str(e)}), 503
 
     # 2) Add risk + alert
     risk, alert = classify_risk(entry)
@@ -127,216 +249,730 @@ def get_data():
 def receive_esp32_data():
     """Receive sensor data from ESP32 and store it."""
     try:
-        data = request.get_json()
+        with STAGE_SECONDS.time(stage="decode"):
+            data = request.get_json()
         
         # Validate incoming data
-        required_fields = ["dust", "temp", "tvoc", "eco2"]
-        if not all(field in data for field in required_fields):
-            return jsonify({"error": "Missing required fields"}), 400
+        with STAGE_SECONDS.time(stage="validate"):
+            if not all(field in data for field in SENSOR_FIELDS):
+                return jsonify({"error": "Missing required fields"}), 400
+            entry = parse_sensor_reading(data)
         
-        # Add timestamp
-        entry = {
-            "timestamp": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
-            "dust": float(data["dust"]),
-            "temp": float(data["temp"]),
-            "tvoc": int(data["tvoc"]),
-            "eco2": int(data["eco2"])
-        }
+        if prefers_async():
+            # Classified and persisted by the ingest threads
+            with STAGE_SECONDS.time(stage="enqueue"):
+                enqueue_readings([entry])
+            return accepted_response({"status": "accepted", "message": "Data queued"})
         
         # Classify risk based on sensor readings
-        risk, alert = classify_sensor_risk(entry)
+        with STAGE_SECONDS.time(stage="classify"):
+            risk, alert = classify_sensor_risk(entry)
         entry["risk"] = risk
         entry["alert"] = alert
         
-        # Log to sensor CSV
+        # Persist reading
         log_sensor_data(entry)
         
+        # Automatic control reacts to every reading, whether or not a dashboard is open
+        apply_control_rules([entry])
+        
         return jsonify({"status": "success", "message": "Data received", "risk": risk}), 200
         
+    except queue.Full:
+        return busy_response()
+    except (TypeError, ValueError) as e:
+        return jsonify({"error": str(e)}), 400
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
 
-def classify_sensor_risk(entry):
-    """Classify risk based on all sensor readings."""
-    dust = entry["dust"]
-    temp = entry["temp"]
-    tvoc = entry["tvoc"]
-    eco2 = entry["eco2"]
-    
-    risk_score = 0
-    alerts = []
-    
-    # Dust analysis
-    if dust > 1000:
-        risk_score += 3
-        alerts.append("⚠️ CRITICAL: Very high dust concentration!")
-    elif dust > 500:
-        risk_score += 2
-        alerts.append("🟠 High dust levels detected")
-    elif dust > 200:
-        risk_score += 1
-        alerts.append("🟡 Moderate dust levels")
+@app.route("/api/data/batch", methods=["POST"])
+def receive_esp32_batch():
+    """Receive many sensor readings in one request and store them together."""
+    try:
+        with STAGE_SECONDS.time(stage="decode"):
+            data = request.get_json(silent=True)
+        
+        # Accept either a bare array or {"readings": [...]}
+        readings = data.get("readings") if isinstance(data, dict) else data
+        if not isinstance(readings, list):
+            return jsonify({"error": "Expected an array of readings"}), 400
+        if len(readings) > MAX_BATCH_SIZE:
+            return jsonify({"error": f"Batch too large (max {MAX_BATCH_SIZE} readings)"}), 413
+        
+        started = time.perf_counter()
+        results = []
+        entries = []
+        for index, item in enumerate(readings):
+            try:
+                entry = parse_sensor_reading(item)
+            except (TypeError, ValueError, KeyError) as e:
+                results.append({"index": index, "status": "error", "error": str(e)})
+                continue
+            
+            entries.append(entry)
+            result = {"index": index, "status": "success"}
+            if isinstance(item, dict) and "device_id" in item:
+                result["device_id"] = item["device_id"]
+            results.append(result)
+        STAGE_SECONDS.observe(time.perf_counter() - started, stage="validate")
+        
+        if prefers_async():
+            with STAGE_SECONDS.time(stage="enqueue"):
+                enqueue_readings(entries)
+            return accepted_response({
+                "status": "accepted",
+                "accepted": len(entries),
+                "rejected": len(readings) - len(entries),
+                "results": results
+            })
+        
+        # Classify the whole batch in one vectorized pass
+        accepted = [result for result in results if result["status"] == "success"]
+        for entry, result, (risk, alert) in zip(entries, accepted, classify_batch(entries)):
+            entry["risk"] = risk
+            entry["alert"] = alert
+            result["risk"] = risk
+        
+        # One append for the whole batch
+        log_sensor_batch(entries)
+        apply_control_rules(entries)
+        
+        return jsonify({
+            "status": "success",
+            "accepted": len(entries),
+            "rejected": len(readings) - len(entries),
+            "results": results
+        }), 200
+        
+    except queue.Full:
+        return busy_response()
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+
+def prefers_async():
+    """Async ingest for this request (AIRSIGHT_ASYNC_INGEST=1 or "Prefer: respond-async")."""
+    return ASYNC_INGEST or "respond-async" in request.headers.get("Prefer", "")
+
+
+def enqueue_readings(entries):
+    """Queue validated readings for the ingest threads, started on first use."""
+    if not ingest_queue.running:
+        ingest_queue.start()
+    ingest_queue.put(entries)
+
+
+def accepted_response(body):
+    response = jsonify(body)
+    response.status_code = 202
+    if "respond-async" in request.headers.get("Prefer", ""):
+        response.headers["Preference-Applied"] = "respond-async"
+    return response
+
+
+def busy_response():
+    """503 with Retry-After when ingest can't keep up (async queue or write-behind queue full)."""
+    response = jsonify({"error": "Ingest queue full, retry later"})
+    response.status_code = 503
+    response.headers["Retry-After"] = str(INGEST_RETRY_AFTER)
+    return response
+
+
+def parse_sensor_reading(data):
+    """Validate one raw reading and convert it into a log entry.
     
-    # Temperature analysis
-    if temp > 40:
-        risk_score += 3
-        alerts.append("⚠️ CRITICAL: Temperature too high!")
-    elif temp > 35:
-        risk_score += 2
-        alerts.append("🟠 High temperature detected")
-    elif temp > 30:
-        risk_score += 1
-        alerts.append("🟡 Elevated temperature")
+    Raises ValueError (or TypeError/KeyError) when the reading is unusable.
+    An optional device-side "timestamp" is kept, otherwise the receive time is used.
+    Readings without a "zone" belong to the default zone.
+    """
+    if not isinstance(data, dict):
+        raise ValueError("Reading must be a JSON object")
     
-    # TVOC analysis
-    if tvoc > 500:
-        risk_score += 3
-        alerts.append("⚠️ CRITICAL: Very high TVOC levels!")
-    elif tvoc > 250:
-        risk_score += 2
-        alerts.append("🟠 High TVOC detected")
-    elif tvoc > 100:
-        risk_score += 1
-        alerts.append("🟡 Moderate TVOC levels")
+    missing = [field for field in SENSOR_FIELDS if field not in data]
+    if missing:
+        raise ValueError(f"Missing required fields: {', '.join(missing)}")
     
-    # eCO2 analysis
-    if eco2 > 1000:
-        risk_score += 3
-        alerts.append("⚠️ CRITICAL: Very high CO2 levels!")
-    elif eco2 > 800:
-        risk_score += 2
-        alerts.append("🟠 High CO2 detected")
-    elif eco2 > 600:
-        risk_score += 1
-        alerts.append("🟡 Moderate CO2 levels")
+    return {
+        "timestamp": parse_timestamp(data.get("timestamp")),
+        "device_id": data.get("device_id"),
+        "zone": check_zone(data["zone"]) if data.get("zone") is not None else DEFAULT_ZONE,
+        "dust": parse_measurement(data, "dust"),
+        "temp": parse_measurement(data, "temp"),
+        "tvoc": int(parse_measurement(data, "tvoc")),
+        "eco2": int(parse_measurement(data, "eco2"))
+    }
+
+
+def parse_measurement(data, field):
+    """A sensor value as a finite float (NaN and infinities can't be stored or served as JSON)."""
+    value = float(data[field])
+    if not math.isfinite(value):
+        raise ValueError(f"{field} must be a finite number")
+    return value
+
+
+def parse_timestamp(value):
+    """Normalise a device timestamp (epoch seconds or ISO string) to the log format."""
+    if value is None or value == "":
+        return datetime.now().strftime("%Y-%m-%d %H:%M:%S")
     
-    # Determine overall risk
-    if risk_score >= 8:
-        risk = "Critical"
-        alert_msg = " | ".join(alerts) if alerts else "⚠️ CRITICAL: Multiple hazardous conditions detected!"
-    elif risk_score >= 5:
-        risk = "High"
-        alert_msg = " | ".join(alerts) if alerts else "🟠 High risk environment"
-    elif risk_score >= 2:
-        risk = "Moderate"
-        alert_msg = " | ".join(alerts) if alerts else "🟡 Moderate air quality concerns"
-    else:
-        risk = "Low"
-        alert_msg = "✅ Air quality is good"
+    try:
+        if isinstance(value, (int, float)) and not isinstance(value, bool):
+            ts = datetime.fromtimestamp(value)
+        else:
+            ts = datetime.fromisoformat(str(value).replace("Z", "+00:00"))
+            if ts.tzinfo is not None:
+                # Store in server local time like the rest of the log
+                ts = ts.astimezone().replace(tzinfo=None)
+    except (OverflowError, OSError, ValueError):
+        # Unparseable, NaN/infinity, or beyond the platform's time range
+        raise ValueError(f"Invalid timestamp: {value}")
     
-    return risk, alert_msg
+    return ts.strftime("%Y-%m-%d %H:%M:%S")
+
+
+def classify_sensor_risk(entry):
+    """Classify risk based on all sensor readings (thresholds in risk_engine.py)."""
+    return classify_entries([entry])[0]
 
 
 def log_sensor_data(entry):
-    """Save sensor readings to CSV file."""
-    df = pd.DataFrame([entry])
-    file_path = os.path.join("data", "sensor_log.csv")
-    
-    # Write header only the first time
-    header = not os.path.exists(file_path)
-    df.to_csv(file_path, mode="a", header=header, index=False)
+    """Save a sensor reading to the configured store."""
+    log_sensor_batch([entry])
+
+
+def log_sensor_batch(entries, block=False):
+    """Append several sensor readings, one transaction per zone."""
+    with STAGE_SECONDS.time(stage="persist"):
+        sensor_log.append(entries, block=block)
+    if REGISTRY.enabled:
+        by_risk = {}
+        for entry in entries:
+            by_risk[entry.get("risk")] = by_risk.get(entry.get("risk"), 0) + 1
+        for risk, count in by_risk.items():
+            READINGS_INGESTED.inc(count, risk=risk)
+
+
+def classify_batch(entries):
+    """Vectorized risk classification of several readings (risk_engine.py)."""
+    with STAGE_SECONDS.time(stage="classify"):
+        return classify_entries(entries)
+
+
+def process_readings(entries):
+    """Persist classified readings and apply the control rules (async ingest threads)."""
+    # Already acknowledged with 202: wait for a full write queue rather than drop them
+    log_sensor_batch(entries, block=True)
+    apply_control_rules(entries)
+
+
+# Async ingest: handlers validate and enqueue, these threads classify and
+# persist. Latency runs until the store write, or in a worker under serve.py
+# until the storage process has the readings
+ASYNC_INGEST = os.environ.get("AIRSIGHT_ASYNC_INGEST", "0") == "1"
+INGEST_RETRY_AFTER = int(os.environ.get("AIRSIGHT_INGEST_RETRY_AFTER", "2"))
+ingest_queue = IngestQueue(
+    process_readings,
+    classify=classify_batch,
+    max_pending=int(os.environ.get("AIRSIGHT_INGEST_QUEUE", "10000")),
+    batch_size=MAX_BATCH_SIZE,
+    workers=int(os.environ.get("AIRSIGHT_INGEST_WORKERS", "2")),
+    track_persist=storage_process is None
+)
+# Without AIRSIGHT_ASYNC_INGEST the threads start with the first "Prefer: respond-async" request
+if ASYNC_INGEST:
+    ingest_queue.start()
+# Registered after the writers, so queued readings are processed before they stop
+atexit.register(ingest_queue.stop)
+REGISTRY.gauge("airsight_ingest_queue_depth", "Readings waiting for async ingest", callback=lambda: ingest_queue.depth)
 
 
 @app.route("/api/sensor-data")
 def get_sensor_data():
-    """Get all sensor data for dashboard."""
+    """Get sensor data for dashboard.
+    
+    Without parameters returns the last 100 readings. With start/end/limit/
+    cursor/fields returns one page of a time range as
+    {"data": [...], "count": n, "next_cursor": ...}, streamed row by row.
+    ?zone= restricts either form to one zone.
+    """
     try:
-        file_path = os.path.join("data", "sensor_log.csv")
-        if os.path.exists(file_path):
-            df = pd.read_csv(file_path)
+        args = request.args
+        zone = args.get("zone")
+        if not any(key in args for key in ("start", "end", "limit", "cursor", "fields")):
             # Get last 100 readings
-            df_recent = df.tail(100)
-            return jsonify(df_recent.to_dict(orient="records"))
+            return jsonify(sensor_log.last(100, zone))
+        
+        start = parse_query_time(args.get("start"))
+        end = parse_query_time(args.get("end"))
+        limit = int(args.get("limit", DEFAULT_PAGE_SIZE))
+        if not 1 <= limit <= MAX_PAGE_SIZE:
+            return jsonify({"error": f"limit must be between 1 and {MAX_PAGE_SIZE}"}), 400
+        fields = args.get("fields").split(",") if args.get("fields") else None
+        
+        # Fetch one extra row to know whether another page follows; pulling
+        # the first row here surfaces bad parameters before streaming starts
+        rows = sensor_log.iter_sensor(start, end, args.get("cursor"), fields, limit + 1, zone)
+        first = next(rows, None)
+        
+        return Response(stream_with_context(stream_page(first, rows, limit)), mimetype="application/json")
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+
+def stream_page(first, rows, limit):
+    """Serialise a page of (record, cursor) pairs as a JSON object."""
+    yield '{"data": ['
+    count = 0
+    last_cursor = None
+    has_more = False
+    item = first
+    while item is not None:
+        if count == limit:
+            has_more = True
+            break
+        record, cursor = item
+        yield ("," if count else "") + json.dumps(record)
+        count += 1
+        last_cursor = cursor
+        item = next(rows, None)
+    next_cursor = last_cursor if has_more else None
+    yield f'], "count": {count}, "next_cursor": {json.dumps(next_cursor)}}}'
+
+
+def parse_query_time(value):
+    """Parse a start/end query parameter (epoch seconds or ISO string)."""
+    if value is None or value == "":
+        return None
+    try:
+        return parse_timestamp(float(value))
+    except ValueError:
+        return parse_timestamp(value)
+
+
+@app.route("/api/rollups")
+def get_rollups():
+    """Get per-bucket aggregates (count, mean, min, max, last) of sensor metrics.
+    
+    Query parameters: resolution (1m, 1h, 1d), start, end, metrics, zone.
+    """
+    try:
+        resolution = request.args.get("resolution", "1m")
+        if resolution not in RESOLUTIONS:
+            return jsonify({"error": f"resolution must be one of {', '.join(RESOLUTIONS)}"}), 400
+        
+        metrics = request.args.get("metrics").split(",") if request.args.get("metrics") else METRICS
+        unknown = [m for m in metrics if m not in METRICS]
+        if unknown:
+            return jsonify({"error": f"Unknown metrics: {', '.join(unknown)}"}), 400
+        
+        start = parse_query_time(request.args.get("start"))
+        end = parse_query_time(request.args.get("end"))
+        # Include the bucket that contains start
+        start = bucket_start(start, resolution) if start else None
+        
+        zone = request.args.get("zone")
+        buckets = query_rollup_buckets(resolution, start, end, metrics, zone)
+        return jsonify({"resolution": resolution, "buckets": buckets})
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+
+def query_rollup_buckets(resolution, start=None, end=None, metrics=None, zone=None):
+    """Stored rollups merged with the still-open buckets (of one zone or all), one record per bucket."""
+    return to_buckets(sensor_log.query_rollups(resolution, start, end, zone), metrics)
+
+
+@app.route("/api/dashboard/snapshot")
+def get_dashboard_snapshot():
+    """Everything one dashboard refresh needs, in one conditional GET.
+    
+    Query parameters: minutes (chart window, default 5) and zone (default
+    all zones). Returns the latest reading, the chart series, control state and recent control actions.
+    The ETag is derived from data and control versions, so an unchanged
+    dashboard costs a 304 without building the body.
+    """
+    try:
+        minutes = request.args.get("minutes", 5, type=int)
+        if not 0 < minutes <= MAX_SNAPSHOT_MINUTES:
+            raise ValueError(f"minutes must be between 1 and {MAX_SNAPSHOT_MINUTES}")
+        zone = request.args.get("zone")
+        
+        # Versions are read before the data, so a tag never outlives what it describes
+        now = datetime.now()
+        rollup = minutes > SNAPSHOT_ROLLUP_MINUTES
+        control_state = control.state()
+        parts = [sensor_log.total(zone), control_state["seq"], minutes, now.strftime("%Y%m%d%H%M")]
+        if zone is not None:
+            parts.append(zone)
+        if rollup:
+            parts.append(sensor_log.written(zone))
+        etag = "-".join(str(part) for part in parts)
+        
+        if request.if_none_match.contains(etag):
+            response = Response(status=304)
+            response.set_etag(etag)
+            return response
+        
+        start = (now - timedelta(minutes=minutes)).strftime("%Y-%m-%d %H:%M:%S")
+        if rollup:
+            # Closed 1-minute buckets (means) followed by the raw readings of the current minute
+            minute_start = now.strftime("%Y-%m-%d %H:%M:00")
+            end = (now.replace(second=0, microsecond=0) - timedelta(seconds=1)).strftime("%Y-%m-%d %H:%M:%S")
+            series = [
+                {"timestamp": bucket["bucket"], **{m: bucket.get(f"{m}_mean") for m in SENSOR_FIELDS}}
+                for bucket in query_rollup_buckets("1m", bucket_start(start, "1m"), end, SENSOR_FIELDS, zone)
+            ]
+            series += sensor_log.series_since(minute_start, SNAPSHOT_FIELDS, zone, MAX_PAGE_SIZE)
         else:
-            return jsonify([])
+            series = sensor_log.series_since(start, SNAPSHOT_FIELDS, zone, MAX_PAGE_SIZE)
+        
+        response = jsonify({
+            "zone": zone,
+            "latest": sensor_log.latest(zone),
+            "series": series,
+            "series_resolution": "1m" if rollup else "raw",
+            "control": control_state,
+            "control_history": list(recent_actions)[-SNAPSHOT_HISTORY:]
+        })
+        response.set_etag(etag)
+        return response
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
 
 @app.route("/api/latest-sensor")
 def get_latest_sensor():
-    """Get latest sensor reading."""
+    """Get latest sensor reading (optionally of one ?zone= and/or ?device_id=)."""
     try:
-        file_path = os.path.join("data", "sensor_log.csv")
-        if os.path.exists(file_path):
-            df = pd.read_csv(file_path)
-            latest = df.iloc[-1].to_dict()
+        latest = sensor_log.latest(request.args.get("zone"), request.args.get("device_id"))
+        if latest is not None:
             return jsonify(latest)
         else:
             return jsonify({"error": "No data available"}), 404
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
 
 # CONTROL SYSTEM ENDPOINTS
 
-control_state = {
-    "exhaust_fan": False,
-    "filtration_unit": False,
-    "ventilation": False,
-    "emergency_shutdown": False,
-    "auto_mode": True,
-    "last_updated": None
-}
+# Latest control actions kept in memory for /api/dashboard/snapshot
+recent_actions = storage_process.recent_actions() if storage_process else deque(store.recent_control(50), maxlen=50)
+
+# Durable, versioned control state (snapshot + append-only log, see control_store.py)
+if storage_process:
+    control = storage_process.control()
+else:
+    control = ControlStore(fsync=DURABILITY == "fsync")
+    atexit.register(control.close)
+
+if storage_process is None and control.state()["seq"] == 0:
+    # First start with the control store: carry over the last logged state of each device
+    last_logged = {}
+    for action in store.recent_control(1000):
+        last_logged[action["device"]] = action["state"] == "ON"
+    for device, state in last_logged.items():
+        if device in control.devices():
+            control.set(device, state, "Recovered from control log")
 
 @app.route("/api/control/state", methods=["GET"])
 def get_control_state():
-    """Get current control system state."""
-    return jsonify(control_state)
+    """Get current control system state (with per-device versions)."""
+    return jsonify(control.state())
 
 
 @app.route("/api/control/set", methods=["POST"])
 def set_control():
-    """Set control system state."""
+    """Set control system state.
+    
+    With "expected_version" the change only applies if the device is still
+    at that version (compare-and-set); otherwise 409 with the current state.
+    """
     try:
         data = request.get_json()
         device = data.get("device")
         state = data.get("state")
         
-        if device in control_state:
-            control_state[device] = state
-            control_state["last_updated"] = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-            
-            # Log control action
-            log_control_action(device, state, data.get("reason", "Manual override"))
-            
-            return jsonify({"success": True, "control_state": control_state})
-        else:
+        if device not in control.devices():
             return jsonify({"error": "Invalid device"}), 400
+        
+        try:
+            control.set(device, state, data.get("reason", "Manual override"), data.get("expected_version"))
+        except VersionConflict as e:
+            return jsonify({"error": str(e), "control_state": control.state()}), 409
+        
+        # Log control action
+        log_control_action(device, state, data.get("reason", "Manual override"))
+        control_state = control.state()
+        events.publish("control", control_state)
+        
+        return jsonify({"success": True, "control_state": control_state})
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
 
+def apply_control_rules(entries):
+    """Switch devices on for readings that break a control rule (control_rules.py)."""
+    with STAGE_SECONDS.time(stage="control"):
+        return _apply_control_rules(entries)
+
+
+def _apply_control_rules(entries):
+    actions = []
+    current = control.state()
+    for entry in entries:
+        for device, reason in evaluate_control_rules(entry, current):
+            try:
+                control.set(device, True, reason, expected_version=current["versions"][device])
+            except VersionConflict:
+                # Changed concurrently (another reading or an operator); theirs wins
+                current = control.state()
+                continue
+            log_control_action(device, True, reason)
+            actions.append(device)
+            current = control.state()
+    if actions:
+        events.publish("control", control.state())
+    return actions
+
+
 def log_control_action(device, state, reason):
-    """Log all control actions to CSV."""
+    """Log all control actions to the configured store."""
     action = {
         "timestamp": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
         "device": device,
         "state": "ON" if state else "OFF",
         "reason": reason
     }
+    recent_actions.append(action)
     
-    df = pd.DataFrame([action])
-    file_path = os.path.join("data", "control_log.csv")
-    header = not os.path.exists(file_path)
-    df.to_csv(file_path, mode="a", header=header, index=False)
+    if WRITE_BEHIND:
+        writer.submit_control([action])
+    else:
+        store.append_control([action], fsync=DURABILITY == "fsync")
 
 
 @app.route("/api/control/history", methods=["GET"])
 def get_control_history():
-    """Get control action history."""
+    """Get control action history (?limit=, default 50)."""
+    try:
+        limit = min(max(request.args.get("limit", 50, type=int), 1), 1000)
+        return jsonify(store.recent_control(limit))
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+
+# REPORT JOBS
+
+# PDF reports are built in background processes (report_jobs.py); finished
+# ones are cached per time range, zone and number of readings stored
+REPORT_FIELDS = ["timestamp", "device_id", "dust", "temp", "tvoc", "eco2", "risk"]
+MAX_REPORT_ROWS = 1000000
+# Periods with more readings than this are reported from 1-minute rollups
+REPORT_ROLLUP_ROWS = int(os.environ.get("AIRSIGHT_REPORT_ROLLUP_ROWS", "200000"))
+
+
+def report_source(minutes, zone=None):
+    """Raw readings of the last ``minutes`` as a frame, or their 1-minute rollup buckets when there are too many.
+    
+    Returns ``(frame, buckets)``; ``buckets`` is None for raw readings.
+    """
+    start = (datetime.now() - timedelta(minutes=minutes)).strftime("%Y-%m-%d %H:%M:%S")
+    # Hourly rollups count the readings cheaply (the first hour is counted whole)
+    rows = sum(bucket["count"] for bucket in query_rollup_buckets("1h", bucket_start(start, "1h"), None, None, zone))
+    if rows > REPORT_ROLLUP_ROWS:
+        buckets = query_rollup_buckets("1m", bucket_start(start, "1m"), None, METRICS, zone)
+        df = pd.DataFrame([
+            {"timestamp": bucket["bucket"], **{m: bucket.get(f"{m}_mean") for m in METRICS}} for bucket in buckets
+        ])
+    else:
+        buckets = None
+        df = pd.DataFrame(sensor_log.series_since(start, REPORT_FIELDS, zone, MAX_REPORT_ROWS))
+    if "timestamp" in df.columns:
+        df["timestamp"] = pd.to_datetime(df["timestamp"])
+    return df, buckets
+
+
+def load_report_frame(minutes, zone=None):
+    """A report's chart frame and statistics (None: computed from the frame when the report is built)."""
+    df, buckets = report_source(minutes, zone)
+    return df, (aggregate_rollups(buckets)["all"] if buckets is not None else None)
+
+
+if storage_process:
+    report_jobs = storage_process.reports()
+else:
+    report_jobs = ReportJobs(
+        load_report_frame,
+        sensor_log.total,
+        workers=int(os.environ.get("AIRSIGHT_REPORT_WORKERS", "1")),
+        cache_size=int(os.environ.get("AIRSIGHT_REPORT_CACHE", "8")),
+        cache_ttl=float(os.environ.get("AIRSIGHT_REPORT_CACHE_TTL", "600"))
+    )
+    atexit.register(report_jobs.close)
+
+
+@app.route("/api/reports", methods=["POST"])
+def submit_report():
+    """Start a PDF report job: {"time_range": "Last 1 Hour", "zone": optional}.
+    
+    Returns the job (202, or 200 when answered from the cache) with its URL
+    in Location. Poll /api/reports/<id> and fetch /api/reports/<id>/pdf.
+    """
+    try:
+        data = request.get_json(silent=True) or {}
+        zone = check_zone(data["zone"]) if data.get("zone") is not None else None
+        job = report_jobs.submit(data.get("time_range", "Last 1 Hour"), zone)
+        response = jsonify(job)
+        response.status_code = 200 if job["status"] == "done" else 202
+        response.headers["Location"] = f"/api/reports/{job['id']}"
+        return response
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+
+@app.route("/api/reports/metrics", methods=["GET"])
+def get_report_metrics():
+    """Report jobs by status, cache hits and cached PDF size."""
+    return jsonify(report_jobs.metrics())
+
+
+@app.route("/api/reports/summary", methods=["GET"])
+def get_report_summary():
+    """Report statistics of every report period (?zone= optional), from one scan of the longest.
+    
+    Per period and metric: count, mean, std, min, max, p50/p95/p99 and the
+    readings and seconds in each threshold band. ``approximate`` is true
+    when the data was too large and 1-minute rollups were used.
+    """
     try:
-        file_path = os.path.join("data", "control_log.csv")
-        if os.path.exists(file_path):
-            df = pd.read_csv(file_path)
-            return jsonify(df.tail(50).to_dict(orient="records"))
+        zone = request.args.get("zone")
+        zone = check_zone(zone) if zone is not None else None
+        now = datetime.now()
+        df, buckets = report_source(max(REPORT_RANGES.values()), zone)
+        if buckets is not None:
+            summary = aggregate_rollups(buckets, REPORT_RANGES, now)
         else:
-            return jsonify([])
+            summary = aggregate(df, REPORT_RANGES, now)
+        return jsonify({"zone": zone, "generated_at": now.strftime("%Y-%m-%d %H:%M:%S"), "ranges": summary})
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
 
+@app.route("/api/reports/<job_id>", methods=["GET"])
+def get_report_job(job_id):
+    """Status, stage and progress (0-1) of a report job."""
+    job = report_jobs.status(job_id)
+    if job is None:
+        return jsonify({"error": "Unknown report job"}), 404
+    return jsonify(job)
+
+
+@app.route("/api/reports/<job_id>/pdf", methods=["GET"])
+def get_report_pdf(job_id):
+    """The finished report; 409 with the job's status while it is not done."""
+    job = report_jobs.status(job_id)
+    if job is None:
+        return jsonify({"error": "Unknown report job"}), 404
+    pdf = report_jobs.result(job_id) if job["status"] == "done" else None
+    if pdf is None:
+        return jsonify({"error": "Report is not ready", **job}), 409
+    filename = f"AirSight_Report_{datetime.fromtimestamp(job['finished_at']).strftime('%Y%m%d_%H%M%S')}.pdf"
+    return Response(pdf, mimetype="application/pdf",
+                    headers={"Content-Disposition": f'attachment; filename="{filename}"'})
+
+
+@app.route("/api/stream")
+def stream_events():
+    """Server-Sent Events stream of new readings and control changes.
+    
+    Events: "readings" (list of newly stored readings) and "control" (full
+    control state). Reconnecting clients resume from Last-Event-ID.
+    """
+    last_event_id = request.headers.get("Last-Event-ID", type=int)
+    subscriber = events.subscribe(last_event_id)
+    return Response(
+        stream_with_context(events.stream(subscriber, heartbeat=STREAM_HEARTBEAT)),
+        mimetype="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
+@app.route("/api/locations", methods=["GET"])
+def get_locations():
+    """Registered outdoor locations (ids accepted by /data?location=)."""
+    return jsonify(LOCATIONS)
+
+
+@app.route("/api/outdoor/metrics", methods=["GET"])
+def get_outdoor_metrics():
+    """Open-Meteo cache hit rate, circuit state and upstream latency."""
+    return jsonify(open_meteo.metrics())
+
+
+@app.route("/api/ingest/metrics", methods=["GET"])
+def get_ingest_metrics():
+    """Async ingest queue depth, rejections and enqueue-to-persist latency."""
+    return jsonify({"async_default": ASYNC_INGEST, **ingest_queue.metrics()})
+
+
+@app.route("/api/zones", methods=["GET"])
+def get_zones():
+    """Zones with their devices and each device's latest reading."""
+    return jsonify(sensor_log.devices())
+
+
+@app.route("/api/storage/metrics", methods=["GET"])
+def get_storage_metrics():
+    """Write-behind queue depth and flush latency, plus per-zone partitions."""
+    return jsonify({
+        "backend": store.name,
+        "write_behind": WRITE_BEHIND,
+        **writer.metrics(),
+        "partitions": sensor_log.metrics()
+    })
+
+
+@app.route("/metrics")
+def get_metrics():
+    """Prometheus text exposition of request, ingest, storage and upstream metrics."""
+    if storage_process:
+        # Include this worker's latest numbers, then serve every process's sum
+        metrics_hub.publish(os.getpid(), REGISTRY.snapshot())
+    return Response(render(metrics_hub.collect()), content_type="text/plain; version=0.0.4; charset=utf-8")
+
+
+def start_request_timer():
+    g.request_started = time.perf_counter()
+
+
+def record_request_metrics(response):
+    """Latency and status per route (the URL rule, so labels stay bounded)."""
+    route = request.url_rule.rule if request.url_rule is not None else "unmatched"
+    REQUEST_SECONDS.observe(time.perf_counter() - g.request_started, method=request.method, route=route)
+    REQUESTS.inc(method=request.method, route=route, status=response.status_code)
+    return response
+
+
+if REGISTRY.enabled:
+    app.before_request(start_request_timer)
+    app.after_request(record_request_metrics)
+
 
 if __name__ == "__main__":
-    app.run(host='0.0.0.0', port=5000, debug=True)
+    start_outdoor_prefetch()
+    # The Werkzeug debugger runs code sent from the browser: only when asked for
+    app.run(host='0.0.0.0', port=5000, debug=os.environ.get("AIRSIGHT_DEBUG", "0") == "1")
@@ -0,0 +1,112 @@
+"""Device-facing ingest latency on a slow disk: sync vs async (202) ingest.
+
+Every sensor write to the store is delayed by ``disk_ms`` to simulate a
+slow or busy disk. Client threads post readings to /api/data through the
+Flask test client in three modes:
+
+* inline       - classify and write before answering 200
+* write-behind - classify, hand to the group-commit writer, answer 200
+* async        - validate, enqueue, answer 202 (classify + persist in background)
+
+Reported: request latency percentiles, and for async mode the
+enqueue-to-persist latency from /api/ingest/metrics.
+
+Usage:
+    python benchmarks/bench_async_ingest.py [requests] [threads] [disk_ms]
+"""
+import atexit
+import os
+import random
+import shutil
+import sys
+import tempfile
+import threading
+import time
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_ROOT)
+
+
+def generate_reading():
+    return {
+        "dust": round(random.uniform(50, 1600), 2),
+        "temp": round(random.uniform(20, 42), 2),
+        "tvoc": random.randint(20, 1100),
+        "eco2": random.randint(400, 2100)
+    }
+
+
+def percentile(values, p):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(p / 100 * len(values)))]
+
+
+def run(app, total, threads, expected_status):
+    latencies = []
+    lock = threading.Lock()
+
+    def worker(count):
+        client = app.test_client()
+        local = []
+        for _ in range(count):
+            start = time.perf_counter()
+            response = client.post("/api/data", json=generate_reading())
+            local.append((time.perf_counter() - start) * 1000)
+            assert response.status_code == expected_status, response.status_code
+        with lock:
+            latencies.extend(local)
+
+    workers = [threading.Thread(target=worker, args=(total // threads,)) for _ in range(threads)]
+    start = time.perf_counter()
+    for t in workers:
+        t.start()
+    for t in workers:
+        t.join()
+    return time.perf_counter() - start, latencies
+
+
+def main():
+    total = int(sys.argv[1]) if len(sys.argv) > 1 else 1000
+    threads = int(sys.argv[2]) if len(sys.argv) > 2 else 8
+    disk_ms = float(sys.argv[3]) if len(sys.argv) > 3 else 20
+
+    os.environ["AIRSIGHT_OUTDOOR_REFRESH"] = "0"
+    # app.py keeps its stores in a scratch folder, removed after its own exit handlers close them
+    data_dir = tempfile.mkdtemp(prefix="airsight-bench-")
+    atexit.register(shutil.rmtree, data_dir, ignore_errors=True)
+    os.environ["AIRSIGHT_DATA_DIR"] = data_dir
+    import app as backend
+
+    append_sensor = backend.store.append_sensor
+
+    def slow_append_sensor(entries, fsync=False):
+        time.sleep(disk_ms / 1000)
+        append_sensor(entries, fsync=fsync)
+
+    backend.store.append_sensor = slow_append_sensor
+    default_zone = backend.sensor_log.partition("default")
+
+    print(f"{total} requests, {threads} threads, {disk_ms:.0f}ms per sensor write\n")
+    for label, write_behind, async_ingest in (("inline", False, False),
+                                              ("write-behind", True, False),
+                                              ("async", True, True)):
+        backend.WRITE_BEHIND = write_behind
+        default_zone.writer = backend.writer if write_behind else None
+        backend.ASYNC_INGEST = async_ingest
+        elapsed, latencies = run(backend.app, total, threads, 202 if async_ingest else 200)
+        print(f"{label:<13} {len(latencies) / elapsed:>8,.0f} req/s  "
+              f"p50={percentile(latencies, 50):.2f}ms  p99={percentile(latencies, 99):.2f}ms")
+
+    # Let the async backlog reach the store
+    deadline = time.monotonic() + 60
+    while backend.ingest_queue.metrics()["persisted"] < total and time.monotonic() < deadline:
+        time.sleep(0.05)
+    metrics = backend.ingest_queue.metrics()
+
+    print(f"\nasync enqueue-to-persist: p50={metrics['persist_ms_p50']}ms  "
+          f"p99={metrics['persist_ms_p99']}ms  max={metrics['persist_ms_max']}ms  "
+          f"rejected={metrics['rejected']}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,74 @@
+"""Compare single-reading ingest against /api/data/batch.
+
+Runs the Flask app in-process (test client) on a temporary data folder
+(AIRSIGHT_DATA_DIR) so the real data/ folder is never touched.
+
+Usage:
+    python benchmarks/bench_batch_ingest.py [readings] [batch_size]
+"""
+import atexit
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_ROOT)
+
+
+def generate_reading(device_id):
+    """Generate one realistic ESP32 payload."""
+    return {
+        "device_id": device_id,
+        "dust": round(random.uniform(50, 1600), 2),
+        "temp": round(random.uniform(20, 42), 2),
+        "tvoc": random.randint(20, 1100),
+        "eco2": random.randint(400, 2100),
+        "timestamp": time.time()
+    }
+
+
+def run_single(client, readings):
+    start = time.perf_counter()
+    for reading in readings:
+        response = client.post("/api/data", json=reading)
+        assert response.status_code == 200, response.get_json()
+    return time.perf_counter() - start
+
+
+def run_batch(client, readings, batch_size):
+    start = time.perf_counter()
+    for i in range(0, len(readings), batch_size):
+        response = client.post("/api/data/batch", json={"readings": readings[i:i + batch_size]})
+        assert response.status_code == 200, response.get_json()
+        assert response.get_json()["rejected"] == 0
+    return time.perf_counter() - start
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    batch_size = int(sys.argv[2]) if len(sys.argv) > 2 else 100
+
+    readings = [generate_reading(f"esp32-{i % 16:02d}") for i in range(count)]
+
+    # app.py keeps its stores in a scratch folder, removed after its own exit handlers close them
+    data_dir = tempfile.mkdtemp(prefix="airsight-bench-")
+    atexit.register(shutil.rmtree, data_dir, ignore_errors=True)
+    os.environ["AIRSIGHT_DATA_DIR"] = data_dir
+    from app import app
+    client = app.test_client()
+
+    single_time = run_single(client, readings)
+    batch_time = run_batch(client, readings, batch_size)
+
+    print(f"Readings:        {count}")
+    print(f"Batch size:      {batch_size}")
+    print(f"Single endpoint: {single_time:.3f}s  ({count / single_time:,.0f} readings/s)")
+    print(f"Batch endpoint:  {batch_time:.3f}s  ({count / batch_time:,.0f} readings/s)")
+    print(f"Speedup:         {single_time / batch_time:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
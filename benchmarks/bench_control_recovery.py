@@ -0,0 +1,59 @@
+"""Control-state recovery time vs length of history.
+
+Writes N control events with ControlStore, then times a restart:
+
+* snapshot - default store (snapshot every 1000 events, replay the tail)
+* log only - snapshots disabled, so the whole log is replayed
+
+Usage:
+    python benchmarks/bench_control_recovery.py [events ...]
+"""
+import os
+import random
+import sys
+import tempfile
+import time
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_ROOT)
+
+from control_store import DEFAULT_DEVICES, ControlStore  # noqa: E402
+
+
+def write_history(data_dir, events, snapshot_every):
+    store = ControlStore(data_dir, snapshot_every=snapshot_every, fsync=False)
+    devices = list(DEFAULT_DEVICES)
+    for _ in range(events):
+        store.set(random.choice(devices), random.random() < 0.5, "bench")
+    expected = store.state()
+    # Simulate a crash: no final snapshot on close
+    store._wal.close()
+    return expected
+
+
+def recover(data_dir, snapshot_every):
+    start = time.perf_counter()
+    store = ControlStore(data_dir, snapshot_every=snapshot_every, fsync=False)
+    elapsed = time.perf_counter() - start
+    return elapsed, store
+
+
+def main():
+    sizes = [int(arg) for arg in sys.argv[1:]] or [1500, 10500, 100500, 500500]
+    print(f"{'events':>8} {'snapshot':>10} {'replayed':>9} {'log only':>10} {'replayed':>9}")
+
+    for events in sizes:
+        row = []
+        for snapshot_every in (1000, sys.maxsize):
+            with tempfile.TemporaryDirectory() as data_dir:
+                expected = write_history(data_dir, events, snapshot_every)
+                elapsed, store = recover(data_dir, snapshot_every)
+                assert store.state() == expected
+                row.append((elapsed * 1000, store.replayed))
+                store._wal.close()
+        (snap_ms, snap_replayed), (log_ms, log_replayed) = row
+        print(f"{events:>8} {snap_ms:>8.2f}ms {snap_replayed:>9} {log_ms:>8.1f}ms {log_replayed:>9}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,339 @@
+"""Data-path micro-benchmarks: time and peak memory vs dataset size.
+
+Runs the functions every reading or report goes through against generated
+datasets of increasing size:
+
+* classify_sensor_risk  - app.py, once per reading
+* log_sensor_data       - app.py, once per reading (write-behind unless
+                          AIRSIGHT_WRITE_BEHIND=0, then the store write is included)
+* load_sensor_data      - the dashboard's cold load of the whole log
+* calculate_aqi         - reports.py
+* generate_comprehensive_report - reports.py
+* aggregate_report_ranges - report_stats.py, statistics of all five report
+                          periods (ending at the last reading) in one scan
+* create_pdf_report     - reports.py (needs kaleido for the chart images)
+
+Per-reading functions are called once per row and capped at 100k rows
+unless --no-caps is given. Time is the best of --repeat runs; peak memory
+is the Python heap peak of a separate run under tracemalloc (NumPy and
+pandas buffers included, SQLite's own allocations not).
+
+Results can be saved as a baseline (--save-baseline); the first run on a
+machine, when there is no baseline file yet, saves one. Later runs are
+compared with it, and any case slower or larger than the baseline by more
+than --threshold (and by more than a small noise floor) is flagged; the
+exit code is then 1. Baselines are only comparable on the same machine.
+
+Usage:
+    python benchmarks/bench_data_path.py [--sizes 1k,10k,100k,1m,10m] [--only case,...]
+        [--backend sqlite|csv] [--repeat N] [--data-dir DIR] [--baseline FILE]
+        [--save-baseline] [--threshold 0.25] [--output FILE] [--no-caps]
+"""
+import argparse
+import atexit
+import gc
+import json
+import os
+import platform
+import shutil
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_ROOT)
+
+# app.py (imported by the per-reading cases) keeps its stores in AIRSIGHT_DATA_DIR,
+# read when storage.py is imported: set it to a scratch folder first. The folder is
+# removed after app.py's own exit handlers have closed the stores in it
+APP_DATA_DIR = tempfile.mkdtemp(prefix="airsight-bench-")
+atexit.register(shutil.rmtree, APP_DATA_DIR, ignore_errors=True)
+os.environ["AIRSIGHT_DATA_DIR"] = APP_DATA_DIR
+
+from partitions import PartitionedSensorLog  # noqa: E402
+from report_stats import aggregate  # noqa: E402
+from reports import REPORT_RANGES, calculate_aqi, create_pdf_report, generate_comprehensive_report  # noqa: E402
+from risk_engine import classify_arrays  # noqa: E402
+from storage import SENSOR_COLUMNS, IncrementalSensorFrame, open_store  # noqa: E402
+
+DEFAULT_BASELINE = os.path.join(REPO_ROOT, "benchmarks", "data_path_baseline.json")
+PER_READING_CAP = 100_000
+SLOW_RUN_SECONDS = 10       # don't repeat runs that take longer than this
+TIME_NOISE_FLOOR = 0.001    # seconds
+MEMORY_NOISE_FLOOR = 1.0    # MB
+
+
+class Skipped(Exception):
+    """A case that cannot run here (missing optional dependency)."""
+
+
+def parse_size(value):
+    value = value.strip().lower()
+    for suffix, factor in (("k", 1_000), ("m", 1_000_000)):
+        if value.endswith(suffix):
+            return int(float(value[:-1]) * factor)
+    return int(value)
+
+
+class Dataset:
+    """Generated readings of one size, built lazily in the forms the cases need."""
+
+    def __init__(self, rows, data_dir, backend):
+        self.rows = rows
+        self.data_dir = data_dir
+        self.backend = backend
+        self._frame = None
+        self._records = None
+
+    @property
+    def frame(self):
+        """Readings as the dashboard holds them (parsed timestamps), 5 s apart."""
+        if self._frame is None:
+            rng = np.random.default_rng(self.rows)
+            dust = np.clip(300 + np.cumsum(rng.normal(0, 5, self.rows)), 10, 1600).round(2)
+            temp = (25 + rng.normal(0, 2, self.rows)).round(2)
+            tvoc = rng.integers(20, 1100, self.rows)
+            eco2 = rng.integers(400, 2100, self.rows)
+            risk, alert, _ = classify_arrays(dust, temp, tvoc, eco2)
+            self._frame = pd.DataFrame({
+                "timestamp": pd.date_range("2025-01-01", periods=self.rows, freq="5s"),
+                "device_id": "esp32-01",
+                "dust": dust,
+                "temp": temp,
+                "tvoc": tvoc,
+                "eco2": eco2,
+                "risk": risk,
+                "alert": alert,
+            })
+        return self._frame
+
+    @property
+    def records(self):
+        """Readings as devices send them (one dict each)."""
+        if self._records is None:
+            self._records = self.frame[["device_id", "dust", "temp", "tvoc", "eco2"]].to_dict("records")
+        return self._records
+
+    def store_dir(self):
+        """A data folder holding this dataset in the configured backend (reused if present)."""
+        path = os.path.join(self.data_dir, f"{self.backend}-{self.rows}")
+        csv_path = os.path.join(path, "sensor_log.csv")
+        if not os.path.exists(csv_path):
+            os.makedirs(path, exist_ok=True)
+            frame = self.frame.copy()
+            frame["timestamp"] = frame["timestamp"].dt.strftime("%Y-%m-%d %H:%M:%S")
+            frame.reindex(columns=SENSOR_COLUMNS).to_csv(csv_path + ".tmp", index=False)
+            os.replace(csv_path + ".tmp", csv_path)
+        # The SQLite backend imports the CSV log the first time it is opened
+        open_store(self.backend, path).close()
+        return path
+
+
+def backend_module():
+    """app.py, imported on first use (its stores in APP_DATA_DIR)."""
+    import app
+    return app
+
+
+# Cases: setup(dataset) -> zero-argument function to measure
+
+def setup_classify_sensor_risk(dataset):
+    classify = backend_module().classify_sensor_risk
+    records = dataset.records
+    return lambda: [classify(record) for record in records]
+
+
+def setup_log_sensor_data(dataset):
+    backend = backend_module()
+    entries = [
+        {"timestamp": "2025-01-01 00:00:00", "zone": "default", **record, "risk": "Low", "alert": ""}
+        for record in dataset.records
+    ]
+
+    def run():
+        for entry in entries:
+            backend.log_sensor_data(entry)
+    return run
+
+
+def setup_load_sensor_data(dataset):
+    store_dir = dataset.store_dir()
+    store = open_store(dataset.backend, store_dir)
+    sensor_log = PartitionedSensorLog(store, data_dir=store_dir, backend=dataset.backend, ring_capacity=1)
+    # A fresh cache each time: the first dashboard load after a restart
+    return lambda: IncrementalSensorFrame(sensor_log).refresh()
+
+
+def setup_calculate_aqi(dataset):
+    frame = dataset.frame
+    return lambda: calculate_aqi(frame)
+
+
+def setup_generate_comprehensive_report(dataset):
+    frame = dataset.frame
+    return lambda: generate_comprehensive_report(frame, "Benchmark")
+
+
+def setup_aggregate_report_ranges(dataset):
+    frame = dataset.frame
+    now = frame["timestamp"].iloc[-1].to_pydatetime()
+    return lambda: aggregate(frame, REPORT_RANGES, now)
+
+
+def setup_create_pdf_report(dataset):
+    try:
+        import kaleido  # noqa: F401
+    except ImportError:
+        raise Skipped("kaleido not installed")
+    frame = dataset.frame
+    return lambda: create_pdf_report(frame, "Benchmark")
+
+
+# name -> (setup, max rows by default)
+CASES = {
+    "classify_sensor_risk": (setup_classify_sensor_risk, PER_READING_CAP),
+    "log_sensor_data": (setup_log_sensor_data, PER_READING_CAP),
+    "load_sensor_data": (setup_load_sensor_data, None),
+    "calculate_aqi": (setup_calculate_aqi, None),
+    "generate_comprehensive_report": (setup_generate_comprehensive_report, None),
+    "aggregate_report_ranges": (setup_aggregate_report_ranges, None),
+    "create_pdf_report": (setup_create_pdf_report, None),
+}
+
+
+def measure(func, repeat):
+    """(best time in seconds, peak traced memory in MB)."""
+    # The traced run doubles as the warm-up
+    gc.collect()
+    tracemalloc.start()
+    try:
+        func()
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+    times = []
+    for _ in range(repeat):
+        gc.collect()
+        start = time.perf_counter()
+        func()
+        times.append(time.perf_counter() - start)
+        if times[-1] > SLOW_RUN_SECONDS:
+            break
+    return min(times), peak / 1e6
+
+
+def compare(result, baseline, threshold):
+    """Flags for a result that regressed against its baseline entry."""
+    flags = []
+    if baseline is None:
+        return flags
+    for key, floor in (("time_s", TIME_NOISE_FLOOR), ("peak_mb", MEMORY_NOISE_FLOOR)):
+        old, new = baseline.get(key), result[key]
+        if old and new > old * (1 + threshold) and new - old > floor:
+            flags.append(f"{key.split('_')[0]} +{(new / old - 1) * 100:.0f}%")
+    return flags
+
+
+def load_baseline(path):
+    if not os.path.exists(path):
+        return {}
+    with open(path) as f:
+        return json.load(f).get("results", {})
+
+
+def save_baseline(path, results, options):
+    merged = load_baseline(path)
+    merged.update({f"{r['case']}@{r['rows']}": {"time_s": r["time_s"], "peak_mb": r["peak_mb"]}
+                   for r in results if r["status"] == "ok"})
+    with open(path, "w") as f:
+        json.dump({
+            "saved_at": datetime.now().isoformat(timespec="seconds"),
+            "machine": platform.platform(),
+            "python": platform.python_version(),
+            "backend": options.backend,
+            "results": merged,
+        }, f, indent=2, sort_keys=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Time and peak memory of the data-path functions")
+    parser.add_argument("--sizes", default="1k,10k,100k,1m", help="dataset sizes, e.g. 1k,10k,100k,1m,10m")
+    parser.add_argument("--only", help="comma-separated case names")
+    parser.add_argument("--backend", default=os.environ.get("AIRSIGHT_STORAGE", "sqlite"), choices=("sqlite", "csv"))
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--data-dir", help="keep generated stores here and reuse them across runs")
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE)
+    parser.add_argument("--save-baseline", action="store_true", help="store these results as the baseline")
+    parser.add_argument("--threshold", type=float, default=0.25, help="allowed slowdown / growth (0.25 = 25%%)")
+    parser.add_argument("--output", help="write the results as JSON")
+    parser.add_argument("--no-caps", action="store_true", help="run per-reading cases at every size")
+    options = parser.parse_args()
+
+    sizes = sorted(parse_size(size) for size in options.sizes.split(","))
+    names = options.only.split(",") if options.only else list(CASES)
+    unknown = set(names) - set(CASES)
+    if unknown:
+        parser.error(f"unknown cases: {', '.join(sorted(unknown))}")
+    baseline = load_baseline(options.baseline)
+    # Baselines are per machine: the first run here records one
+    save = options.save_baseline or not os.path.exists(options.baseline)
+
+    os.environ.setdefault("AIRSIGHT_OUTDOOR_REFRESH", "0")
+    workdir = tempfile.TemporaryDirectory()
+    data_dir = options.data_dir or os.path.join(workdir.name, "datasets")
+
+    print(f"{'case':<30} {'rows':>10} {'time':>11} {'peak MB':>9} {'vs baseline':>12}")
+    results = []
+    regressions = []
+    for rows in sizes:
+        dataset = Dataset(rows, data_dir, options.backend)
+        for name in names:
+            setup, cap = CASES[name]
+            result = {"case": name, "rows": rows}
+            if cap is not None and rows > cap and not options.no_caps:
+                result.update(status="skipped", reason=f"capped at {cap:,} rows (--no-caps)")
+            else:
+                try:
+                    elapsed, peak = measure(setup(dataset), options.repeat)
+                    result.update(status="ok", time_s=round(elapsed, 6), peak_mb=round(peak, 3))
+                except Skipped as e:
+                    result.update(status="skipped", reason=str(e))
+            results.append(result)
+
+            if result["status"] != "ok":
+                print(f"{name:<30} {rows:>10,} {'skipped: ' + result['reason']:>34}")
+                continue
+            old = baseline.get(f"{name}@{rows}")
+            flags = compare(result, old, options.threshold)
+            result["regressions"] = flags
+            if flags:
+                regressions.append(result)
+            if old and old.get("time_s"):
+                change = f"{(result['time_s'] / old['time_s'] - 1) * 100:+.0f}%"
+            else:
+                change = "-"
+            print(f"{name:<30} {rows:>10,} {result['time_s'] * 1000:>9.2f}ms {result['peak_mb']:>9.2f} "
+                  f"{change:>12}{'  REGRESSION: ' + ', '.join(flags) if flags else ''}")
+        # Free the previous size's frames before generating the next
+        del dataset
+        gc.collect()
+
+    if options.output:
+        with open(options.output, "w") as f:
+            json.dump({"backend": options.backend, "threshold": options.threshold, "results": results}, f, indent=2)
+    if save:
+        save_baseline(options.baseline, results, options)
+        print(f"\nBaseline saved to {options.baseline}")
+    if regressions:
+        print(f"\n{len(regressions)} regression(s) beyond {options.threshold * 100:.0f}%")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,94 @@
+"""Chart payload size and build/serialise time before and after downsampling.
+
+Builds the dashboard's emission chart for a day of 5-second readings with
+the raw series (Scatter, lines+markers) and with the downsampled series
+(Scattergl, lines), and reports the figure JSON size and time spent. When
+kaleido is installed the static render time is reported as well.
+
+Usage:
+    python benchmarks/bench_downsample.py [points] [mode]
+"""
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+import plotly.graph_objects as go
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_ROOT)
+
+from downsample import downsample
+
+MAX_POINTS = 1000
+
+
+def generate_day(points):
+    rng = np.random.default_rng(0)
+    timestamps = pd.date_range("2026-01-01", periods=points, freq="5s")
+    dust = 300 + np.cumsum(rng.normal(0, 5, points))
+    tvoc = 150 + np.cumsum(rng.normal(0, 2, points))
+    # A few short spikes that must stay visible
+    for i in rng.integers(0, points, 10):
+        dust[i] += 1500
+    return timestamps.values, dust, tvoc
+
+
+def raw_figure(x, dust, tvoc):
+    fig = go.Figure()
+    fig.add_trace(go.Scatter(x=x, y=dust, mode="lines+markers", marker=dict(size=6)))
+    fig.add_trace(go.Scatter(x=x, y=tvoc, mode="lines+markers", marker=dict(size=6), yaxis="y2"))
+    fig.update_layout(yaxis2=dict(overlaying="y", side="right"))
+    return fig
+
+
+def downsampled_figure(x, dust, tvoc, mode):
+    fig = go.Figure()
+    dx, dy = downsample(x, dust, MAX_POINTS, mode)
+    fig.add_trace(go.Scattergl(x=dx, y=dy, mode="lines"))
+    tx, ty = downsample(x, tvoc, MAX_POINTS, mode)
+    fig.add_trace(go.Scattergl(x=tx, y=ty, mode="lines", yaxis="y2"))
+    fig.update_layout(yaxis2=dict(overlaying="y", side="right"))
+    return fig, dy
+
+
+def measure(build):
+    start = time.perf_counter()
+    fig = build()
+    payload = fig.to_json()
+    elapsed = time.perf_counter() - start
+
+    render = None
+    try:
+        start = time.perf_counter()
+        fig.to_image(format="png", width=700, height=350)
+        render = time.perf_counter() - start
+    except Exception:
+        pass
+    return len(payload), elapsed, render
+
+
+def main():
+    points = int(sys.argv[1]) if len(sys.argv) > 1 else 17280
+    mode = sys.argv[2] if len(sys.argv) > 2 else "lttb"
+    x, dust, tvoc = generate_day(points)
+
+    raw_size, raw_time, raw_render = measure(lambda: raw_figure(x, dust, tvoc))
+    ds_size, ds_time, ds_render = measure(lambda: downsampled_figure(x, dust, tvoc, mode)[0])
+
+    _, kept = downsampled_figure(x, dust, tvoc, mode)
+    spikes_kept = np.isclose(kept.max(), dust.max())
+
+    print(f"points per trace: {points:,} -> {MAX_POINTS:,} ({mode})")
+    print(f"payload:          {raw_size / 1024:,.0f} KiB -> {ds_size / 1024:,.0f} KiB")
+    print(f"build+serialise:  {raw_time * 1000:,.1f} ms -> {ds_time * 1000:,.1f} ms")
+    if raw_render is not None and ds_render is not None:
+        print(f"static render:    {raw_render * 1000:,.1f} ms -> {ds_render * 1000:,.1f} ms")
+    else:
+        print("static render:    skipped (kaleido not installed)")
+    print(f"max spike kept:   {spikes_kept}")
+
+
+if __name__ == "__main__":
+    main()
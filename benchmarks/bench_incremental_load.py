@@ -0,0 +1,80 @@
+"""Dashboard log loading: full re-parse vs incremental refresh.
+
+For growing histories, times a full read_sensor_frame() + to_datetime (the
+old load_sensor_data) against IncrementalSensorFrame.refresh() after a
+typical 2-second tick that appended a handful of rows.
+
+Usage:
+    python benchmarks/bench_incremental_load.py [max_rows] [backend]
+"""
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+import pandas as pd
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_ROOT)
+
+from storage import IncrementalSensorFrame, open_store
+
+START = datetime(2025, 1, 1)
+ROWS_PER_TICK = 4
+
+
+def generate_entries(count, offset):
+    return [{
+        "timestamp": (START + timedelta(seconds=5 * (offset + i))).strftime("%Y-%m-%d %H:%M:%S"),
+        "device_id": "esp32-01",
+        "dust": round(random.uniform(50, 1600), 2),
+        "temp": round(random.uniform(20, 42), 2),
+        "tvoc": random.randint(20, 1100),
+        "eco2": random.randint(400, 2100),
+        "risk": "Low",
+        "alert": "✅ Air quality is good"
+    } for i in range(count)]
+
+
+def full_load(store):
+    df = store.read_sensor_frame()
+    df["timestamp"] = pd.to_datetime(df["timestamp"])
+    return df
+
+
+def main():
+    max_rows = int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000
+    backend = sys.argv[2] if len(sys.argv) > 2 else "csv"
+    sizes = [n for n in (10_000, 100_000, 1_000_000, 10_000_000) if n <= max_rows]
+
+    print(f"{'rows':>12} {'full load (ms)':>15} {'incremental (ms)':>17}")
+    with tempfile.TemporaryDirectory() as data_dir:
+        store = open_store(backend, data_dir)
+        frame = IncrementalSensorFrame(store)
+        written = 0
+        for size in sizes:
+            while written < size:
+                count = min(50_000, size - written)
+                store.append_sensor(generate_entries(count, written))
+                written += count
+            frame.refresh()
+
+            start = time.perf_counter()
+            full_load(store)
+            full_ms = (time.perf_counter() - start) * 1000
+
+            store.append_sensor(generate_entries(ROWS_PER_TICK, written))
+            written += ROWS_PER_TICK
+            start = time.perf_counter()
+            df = frame.refresh()
+            inc_ms = (time.perf_counter() - start) * 1000
+            assert len(df) == written
+
+            print(f"{size:>12,} {full_ms:>15.1f} {inc_ms:>17.2f}")
+        store.close()
+
+
+if __name__ == "__main__":
+    main()
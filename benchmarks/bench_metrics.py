@@ -0,0 +1,87 @@
+"""Overhead of the /metrics instrumentation.
+
+1. Cost of a single histogram observation and counter increment.
+2. /api/data latency through the Flask test client with metrics on and off
+   (AIRSIGHT_METRICS=1/0, each in a fresh process on a temporary data dir).
+
+Usage:
+    python benchmarks/bench_metrics.py [requests]
+"""
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_ROOT)
+
+READING = {"device_id": "esp32-01", "dust": 420.0, "temp": 24.5, "tvoc": 150, "eco2": 650}
+
+
+def micro(n=200_000):
+    from metrics import Registry
+
+    registry = Registry()
+    histogram = registry.histogram("bench_seconds", "bench", ("route",))
+    counter = registry.counter("bench_total", "bench", ("route", "status"))
+
+    start = time.perf_counter()
+    for _ in range(n):
+        histogram.observe(0.0042, route="/api/data")
+    observe_ns = (time.perf_counter() - start) / n * 1e9
+
+    start = time.perf_counter()
+    for _ in range(n):
+        counter.inc(route="/api/data", status=200)
+    inc_ns = (time.perf_counter() - start) / n * 1e9
+
+    start = time.perf_counter()
+    registry.render()
+    render_ms = (time.perf_counter() - start) * 1000
+    return observe_ns, inc_ns, render_ms
+
+
+def serve_requests(total):
+    """Runs in the child process: post ``total`` readings, print the mean latency in µs."""
+    import app as backend
+
+    client = backend.app.test_client()
+    for _ in range(200):
+        client.post("/api/data", json=READING)
+    start = time.perf_counter()
+    for _ in range(total):
+        client.post("/api/data", json=READING)
+    print((time.perf_counter() - start) / total * 1e6)
+
+
+def run_child(total, enabled):
+    with tempfile.TemporaryDirectory() as workdir:
+        env = dict(os.environ, AIRSIGHT_METRICS="1" if enabled else "0", AIRSIGHT_OUTDOOR_REFRESH="0",
+                   AIRSIGHT_DURABILITY="none")
+        output = subprocess.run(
+            [sys.executable, os.path.abspath(__file__), "--child", str(total)],
+            cwd=workdir, env=env, capture_output=True, text=True, check=True
+        ).stdout
+    return float(output.strip().splitlines()[-1])
+
+
+def main():
+    if sys.argv[1:2] == ["--child"]:
+        serve_requests(int(sys.argv[2]))
+        return
+    total = int(sys.argv[1]) if len(sys.argv) > 1 else 5000
+
+    observe_ns, inc_ns, render_ms = micro()
+    print(f"histogram.observe: {observe_ns:,.0f} ns   counter.inc: {inc_ns:,.0f} ns   "
+          f"render (2 metrics): {render_ms:.2f} ms\n")
+
+    off = run_child(total, enabled=False)
+    on = run_child(total, enabled=True)
+    print(f"POST /api/data, {total} requests (test client, write-behind)")
+    print(f"metrics off: {off:8.1f} µs/request")
+    print(f"metrics on:  {on:8.1f} µs/request  ({(on - off):+.1f} µs, {(on / off - 1) * 100:+.1f}%)")
+
+
+if __name__ == "__main__":
+    main()
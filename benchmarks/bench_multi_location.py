@@ -0,0 +1,96 @@
+"""Refreshing many outdoor locations: sequential vs concurrent multi-coordinate.
+
+A fake Open-Meteo server on localhost answers multi-coordinate requests with
+a fixed per-request latency. For a growing number of locations the benchmark
+times:
+
+* sequential - one request per location, one after another
+* batched    - OpenMeteoClient.refresh_many (multi-coordinate requests,
+               fetched concurrently)
+
+Usage:
+    python benchmarks/bench_multi_location.py [upstream_ms] [max_concurrency]
+"""
+import json
+import os
+import random
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_ROOT)
+
+from openmeteo import OpenMeteoClient  # noqa: E402
+
+LOCATION_COUNTS = [1, 10, 50, 100, 200]
+
+
+class FakeUpstream(BaseHTTPRequestHandler):
+    delay = 0.08
+    calls = 0
+
+    def do_GET(self):
+        type(self).calls += 1
+        time.sleep(self.delay)
+        latitudes = parse_qs(urlparse(self.path).query)["latitude"][0].split(",")
+        now = time.strftime("%Y-%m-%dT%H:00")
+        results = [
+            {"latitude": float(lat), "current": {"time": now, "pm2_5": 40.0, "pm10": 60.0}}
+            for lat in latitudes
+        ]
+        body = json.dumps(results[0] if len(results) == 1 else results).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+def random_coordinates(n):
+    return [(round(random.uniform(-60, 60), 4), round(random.uniform(-180, 180), 4)) for _ in range(n)]
+
+
+def main():
+    FakeUpstream.delay = (float(sys.argv[1]) if len(sys.argv) > 1 else 80) / 1000
+    concurrency = int(sys.argv[2]) if len(sys.argv) > 2 else 4
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), FakeUpstream)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    url = f"http://127.0.0.1:{server.server_port}/v1/air-quality"
+
+    print(f"upstream latency {FakeUpstream.delay * 1000:.0f}ms, max_concurrency {concurrency}\n")
+    print(f"{'locations':>9} {'sequential':>12} {'batched':>10} {'requests':>9} {'speedup':>8}")
+
+    for n in LOCATION_COUNTS:
+        coordinates = random_coordinates(n)
+
+        client = OpenMeteoClient(url=url, max_concurrency=concurrency)
+        start = time.perf_counter()
+        for lat, lon in coordinates:
+            client.current(lat, lon)
+        sequential = time.perf_counter() - start
+        client.close()
+
+        client = OpenMeteoClient(url=url, max_concurrency=concurrency)
+        FakeUpstream.calls = 0
+        start = time.perf_counter()
+        refreshed = client.refresh_many(coordinates)
+        batched = time.perf_counter() - start
+        assert refreshed == n, refreshed
+        client.close()
+
+        print(f"{n:>9} {sequential * 1000:>10.0f}ms {batched * 1000:>8.0f}ms "
+              f"{FakeUpstream.calls:>9} {sequential / batched:>7.1f}x")
+
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
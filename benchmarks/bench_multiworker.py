@@ -0,0 +1,118 @@
+"""Ingest throughput of serve.py vs the number of worker processes.
+
+For each worker count a fresh serve.py (gunicorn workers + storage process)
+is started on a temporary data directory. Client processes then post
+batches to /api/data/batch for a fixed time, and the accepted readings per
+second are reported. Throughput can only scale up to the number of cores.
+
+Usage:
+    python benchmarks/bench_multiworker.py [workers ...] [--clients N] [--seconds S] [--batch N]
+"""
+import multiprocessing
+import os
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+
+import requests
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def generate_batch(n):
+    return [
+        {
+            "device_id": f"esp32-{random.randrange(50)}",
+            "zone": random.choice("ABC"),
+            "dust": round(random.uniform(50, 1600), 2),
+            "temp": round(random.uniform(20, 42), 2),
+            "tvoc": random.randint(20, 1100),
+            "eco2": random.randint(400, 2100),
+        }
+        for _ in range(n)
+    ]
+
+
+def client(url, seconds, batch, results):
+    session = requests.Session()
+    payload = generate_batch(batch)
+    accepted = 0
+    deadline = time.monotonic() + seconds
+    while time.monotonic() < deadline:
+        response = session.post(url, json=payload, timeout=30)
+        accepted += response.json()["accepted"]
+    results.put(accepted)
+
+
+def wait_ready(base, process, timeout=30):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError("serve.py exited during startup")
+        try:
+            requests.get(base, timeout=1)
+            return
+        except requests.RequestException:
+            time.sleep(0.2)
+    raise RuntimeError("serve.py did not start")
+
+
+def run(workers, clients, seconds, batch):
+    port = free_port()
+    base = f"http://127.0.0.1:{port}"
+    with tempfile.TemporaryDirectory() as data_dir:
+        env = dict(os.environ, AIRSIGHT_DATA_DIR=data_dir, AIRSIGHT_OUTDOOR_REFRESH="0")
+        server = subprocess.Popen(
+            [sys.executable, os.path.join(REPO_ROOT, "serve.py"),
+             "--bind", f"127.0.0.1:{port}", "--workers", str(workers)],
+            env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+        )
+        try:
+            wait_ready(base, server)
+            results = multiprocessing.Queue()
+            procs = [
+                multiprocessing.Process(target=client, args=(f"{base}/api/data/batch", seconds, batch, results))
+                for _ in range(clients)
+            ]
+            for proc in procs:
+                proc.start()
+            accepted = sum(results.get() for _ in procs)
+            for proc in procs:
+                proc.join()
+        finally:
+            server.terminate()
+            server.wait(timeout=30)
+    return accepted / seconds
+
+
+def main():
+    args = sys.argv[1:]
+    options = {"--clients": 8, "--seconds": 5, "--batch": 20}
+    for name in options:
+        if name in args:
+            i = args.index(name)
+            options[name] = int(args[i + 1])
+            del args[i:i + 2]
+    worker_counts = [int(arg) for arg in args] or [1, 2, 4, 8]
+
+    print(f"{multiprocessing.cpu_count()} cores, {options['--clients']} clients, "
+          f"batches of {options['--batch']}, {options['--seconds']}s per run\n")
+    print(f"{'workers':>7} {'readings/s':>11} {'scaling':>8}")
+    baseline = None
+    for workers in worker_counts:
+        rate = run(workers, options["--clients"], options["--seconds"], options["--batch"])
+        baseline = baseline or rate
+        print(f"{workers:>7} {rate:>11.0f} {rate / baseline:>7.2f}x")
+
+
+if __name__ == "__main__":
+    main()
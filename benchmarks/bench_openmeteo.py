@@ -0,0 +1,122 @@
+"""Open-Meteo client against a local fake upstream.
+
+Starts a fake air-quality API on localhost with configurable latency and
+compares, over many concurrent /data-style lookups:
+
+* naive  - a new requests.get per call (the old fetch_live_data)
+* cached - OpenMeteoClient (pooled session, TTL cache, stale-while-revalidate)
+* outage - OpenMeteoClient while the upstream hangs past the read timeout,
+           once with a warm cache and once cold (circuit breaker fails fast)
+
+Usage:
+    python benchmarks/bench_openmeteo.py [requests] [threads] [upstream_ms]
+"""
+import json
+import os
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import requests
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_ROOT)
+
+from openmeteo import OpenMeteoClient, UpstreamUnavailable  # noqa: E402
+
+
+class FakeUpstream(BaseHTTPRequestHandler):
+    delay = 0.05
+    calls = 0
+
+    def do_GET(self):
+        type(self).calls += 1
+        time.sleep(self.delay)
+        body = json.dumps({
+            "current": {"time": time.strftime("%Y-%m-%dT%H:00"), "interval": 3600, "pm2_5": 42.0, "pm10": 61.5}
+        }).encode()
+        try:
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+        except (BrokenPipeError, ConnectionResetError):
+            pass
+
+    def log_message(self, *args):
+        pass
+
+
+def percentile(values, p):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(p / 100 * len(values)))]
+
+
+def run(fetch, total, threads):
+    def timed(_):
+        start = time.perf_counter()
+        try:
+            fetch()
+            ok = True
+        except (UpstreamUnavailable, requests.RequestException):
+            ok = False
+        return (time.perf_counter() - start) * 1000, ok
+
+    with ThreadPoolExecutor(max_workers=threads) as pool:
+        results = list(pool.map(timed, range(total)))
+    latencies = [ms for ms, _ in results]
+    return latencies, sum(ok for _, ok in results)
+
+
+def report(label, latencies, ok, calls):
+    print(f"{label:<14} ok={ok:>5}/{len(latencies):<5} upstream_calls={calls:>5}  "
+          f"p50={percentile(latencies, 50):8.2f}ms  p99={percentile(latencies, 99):8.2f}ms  "
+          f"max={max(latencies):8.2f}ms")
+
+
+def main():
+    total = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    threads = int(sys.argv[2]) if len(sys.argv) > 2 else 16
+    FakeUpstream.delay = (float(sys.argv[3]) if len(sys.argv) > 3 else 50) / 1000
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), FakeUpstream)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    url = f"http://127.0.0.1:{server.server_port}/v1/air-quality"
+    params = {"latitude": 19.076, "longitude": 72.8777, "current": "pm2_5,pm10"}
+
+    print(f"{total} lookups, {threads} threads, upstream latency {FakeUpstream.delay * 1000:.0f}ms\n")
+
+    FakeUpstream.calls = 0
+    latencies, ok = run(lambda: requests.get(url, params=params).json(), total, threads)
+    report("naive", latencies, ok, FakeUpstream.calls)
+
+    FakeUpstream.calls = 0
+    client = OpenMeteoClient(url=url)
+    latencies, ok = run(lambda: client.current(19.076, 72.8777), total, threads)
+    report("cached", latencies, ok, FakeUpstream.calls)
+    print(f"{'':<14} hit_rate={client.metrics()['hit_rate']}")
+
+    # Upstream hangs: warm cache is served stale, cold cache trips the breaker
+    FakeUpstream.delay = 2.0
+    client.ttl = 0
+    FakeUpstream.calls = 0
+    latencies, ok = run(lambda: client.current(19.076, 72.8777), total, threads)
+    report("outage/warm", latencies, ok, FakeUpstream.calls)
+
+    cold = OpenMeteoClient(url=url, read_timeout=0.5, failure_threshold=5)
+    FakeUpstream.calls = 0
+    latencies, ok = run(lambda: cold.current(19.076, 72.8777), total, threads)
+    report("outage/cold", latencies, ok, FakeUpstream.calls)
+    print(f"{'':<14} circuit={cold.metrics()['circuit']} short_circuited={cold.metrics()['short_circuited']}")
+
+    client.close()
+    cold.close()
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,112 @@
+"""Durable ingest throughput: one shared store vs one partition per zone.
+
+One thread per zone appends small fsync'd batches concurrently:
+
+* shared      - every zone's readings go to the default partition (one store)
+* partitioned - each zone has its own partition and store file
+
+fsync cost depends on the disk; point --dir at real storage (not tmpfs).
+
+Usage:
+    python benchmarks/bench_partitions.py [zones ...] [--batches N] [--backend sqlite|csv] [--dir DIR]
+"""
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_ROOT)
+
+from partitions import PartitionedSensorLog  # noqa: E402
+from storage import open_store  # noqa: E402
+
+BATCH_SIZE = 10
+
+
+def make_batch(zone, device_count=5):
+    now = time.strftime("%Y-%m-%d %H:%M:%S")
+    return [
+        {
+            "timestamp": now,
+            "device_id": f"{zone}-{random.randrange(device_count)}",
+            "zone": zone,
+            "dust": round(random.uniform(50, 1600), 2),
+            "temp": round(random.uniform(20, 42), 2),
+            "tvoc": random.randint(20, 1100),
+            "eco2": random.randint(400, 2100),
+            "risk": "Low",
+            "alert": "",
+        }
+        for _ in range(BATCH_SIZE)
+    ]
+
+
+def run_threads(zones, batches, append):
+    def worker(zone):
+        for _ in range(batches):
+            append(make_batch(zone))
+
+    threads = [threading.Thread(target=worker, args=(zone,)) for zone in zones]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return time.perf_counter() - start
+
+
+def ingest(zones, batches, backend, partition, base_dir):
+    with tempfile.TemporaryDirectory(dir=base_dir) as data_dir:
+        log = PartitionedSensorLog(open_store(backend, data_dir=data_dir), data_dir=data_dir,
+                                   backend=backend, fsync=True)
+        if partition:
+            for zone in zones:
+                log.partition(zone)
+            append = log.append
+        else:
+            # Same code path, but every zone lands in the default partition
+            def append(entries):
+                for entry in entries:
+                    entry["zone"] = "default"
+                log.append(entries)
+        elapsed = run_threads(zones, batches, append)
+        assert log.total() == len(zones) * batches * BATCH_SIZE
+        log.close()
+        log.partition("default").store.close()
+        return elapsed
+
+
+def main():
+    args = sys.argv[1:]
+    batches = 50
+    backend = "sqlite"
+    base_dir = None
+    if "--dir" in args:
+        i = args.index("--dir")
+        base_dir = args[i + 1]
+        del args[i:i + 2]
+    if "--batches" in args:
+        i = args.index("--batches")
+        batches = int(args[i + 1])
+        del args[i:i + 2]
+    if "--backend" in args:
+        i = args.index("--backend")
+        backend = args[i + 1]
+        del args[i:i + 2]
+    zone_counts = [int(arg) for arg in args] or [1, 2, 4, 8, 16]
+
+    print(f"backend {backend}, {batches} fsync'd batches of {BATCH_SIZE} readings per zone\n")
+    print(f"{'zones':>5} {'shared':>12} {'partitioned':>12} {'speedup':>8}")
+    for n in zone_counts:
+        zones = [f"Z{i}" for i in range(n)]
+        readings = n * batches * BATCH_SIZE
+        t_shared = ingest(zones, batches, backend, False, base_dir)
+        t_part = ingest(zones, batches, backend, True, base_dir)
+        print(f"{n:>5} {readings / t_shared:>8.0f} r/s {readings / t_part:>8.0f} r/s {t_shared / t_part:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,74 @@
+"""Time-range seek cost on /api/sensor-data as history grows.
+
+Fills each backend with time-ordered readings (5 s apart) and times fetching
+a 5-minute window near the middle and at the end of the history. With an
+index seek (SQLite) or the block index (CSV) the cost stays flat as the log
+grows.
+
+Usage:
+    python benchmarks/bench_range_query.py [max_rows]
+"""
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_ROOT)
+
+from storage import open_store
+
+START = datetime(2025, 1, 1)
+FIELDS = ["timestamp", "dust", "temp", "tvoc", "eco2"]
+
+
+def generate_entries(count, offset):
+    return [{
+        "timestamp": (START + timedelta(seconds=5 * (offset + i))).strftime("%Y-%m-%d %H:%M:%S"),
+        "device_id": "esp32-01",
+        "dust": round(random.uniform(50, 1600), 2),
+        "temp": round(random.uniform(20, 42), 2),
+        "tvoc": random.randint(20, 1100),
+        "eco2": random.randint(400, 2100),
+        "risk": "Low",
+        "alert": "✅ Air quality is good"
+    } for i in range(count)]
+
+
+def time_window(store, row_offset, repeat=20):
+    start = START + timedelta(seconds=5 * row_offset)
+    end = start + timedelta(minutes=5)
+    fmt = "%Y-%m-%d %H:%M:%S"
+    # The first read brings the CSV block index up to date
+    list(store.iter_sensor(start.strftime(fmt), end.strftime(fmt), fields=FIELDS, limit=1000))
+    t0 = time.perf_counter()
+    for _ in range(repeat):
+        rows = list(store.iter_sensor(start.strftime(fmt), end.strftime(fmt), fields=FIELDS, limit=1000))
+    assert len(rows) == 61, len(rows)
+    return (time.perf_counter() - t0) / repeat * 1000
+
+
+def main():
+    max_rows = int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000
+    sizes = [n for n in (10_000, 100_000, 1_000_000, 10_000_000) if n <= max_rows]
+
+    print(f"{'backend':<8} {'rows':>12} {'middle (ms)':>12} {'end (ms)':>10}")
+    for backend in ("sqlite", "csv"):
+        with tempfile.TemporaryDirectory() as data_dir:
+            store = open_store(backend, data_dir)
+            written = 0
+            for size in sizes:
+                while written < size:
+                    count = min(50_000, size - written)
+                    store.append_sensor(generate_entries(count, written))
+                    written += count
+                middle_ms = time_window(store, size // 2)
+                end_ms = time_window(store, size - 100)
+                print(f"{backend:<8} {size:>12,} {middle_ms:>12.3f} {end_ms:>10.3f}")
+            store.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,131 @@
+"""Risk classification throughput: per-row if/elif chain vs risk_engine.
+
+Classifies the same random readings with the previous per-reading function
+and with the vectorized engine (from a list of dicts, as batch ingest does,
+and from NumPy columns, as log re-scoring does), and checks both agree.
+
+Usage:
+    python benchmarks/bench_risk_engine.py [readings]
+"""
+import os
+import sys
+import time
+
+import numpy as np
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_ROOT)
+
+from risk_engine import classify_arrays, classify_entries  # noqa: E402
+
+
+def classify_per_row(entry):
+    """The previous if/elif classifier, one reading at a time."""
+    dust = entry["dust"]
+    temp = entry["temp"]
+    tvoc = entry["tvoc"]
+    eco2 = entry["eco2"]
+    
+    risk_score = 0
+    alerts = []
+    
+    # Dust analysis
+    if dust > 1000:
+        risk_score += 3
+        alerts.append("⚠️ CRITICAL: Very high dust concentration!")
+    elif dust > 500:
+        risk_score += 2
+        alerts.append("🟠 High dust levels detected")
+    elif dust > 200:
+        risk_score += 1
+        alerts.append("🟡 Moderate dust levels")
+    
+    # Temperature analysis
+    if temp > 40:
+        risk_score += 3
+        alerts.append("⚠️ CRITICAL: Temperature too high!")
+    elif temp > 35:
+        risk_score += 2
+        alerts.append("🟠 High temperature detected")
+    elif temp > 30:
+        risk_score += 1
+        alerts.append("🟡 Elevated temperature")
+    
+    # TVOC analysis
+    if tvoc > 500:
+        risk_score += 3
+        alerts.append("⚠️ CRITICAL: Very high TVOC levels!")
+    elif tvoc > 250:
+        risk_score += 2
+        alerts.append("🟠 High TVOC detected")
+    elif tvoc > 100:
+        risk_score += 1
+        alerts.append("🟡 Moderate TVOC levels")
+    
+    # eCO2 analysis
+    if eco2 > 1000:
+        risk_score += 3
+        alerts.append("⚠️ CRITICAL: Very high CO2 levels!")
+    elif eco2 > 800:
+        risk_score += 2
+        alerts.append("🟠 High CO2 detected")
+    elif eco2 > 600:
+        risk_score += 1
+        alerts.append("🟡 Moderate CO2 levels")
+    
+    # Determine overall risk
+    if risk_score >= 8:
+        risk = "Critical"
+        alert_msg = " | ".join(alerts) if alerts else "⚠️ CRITICAL: Multiple hazardous conditions detected!"
+    elif risk_score >= 5:
+        risk = "High"
+        alert_msg = " | ".join(alerts) if alerts else "🟠 High risk environment"
+    elif risk_score >= 2:
+        risk = "Moderate"
+        alert_msg = " | ".join(alerts) if alerts else "🟡 Moderate air quality concerns"
+    else:
+        risk = "Low"
+        alert_msg = "✅ Air quality is good"
+    
+    return risk, alert_msg
+
+
+def generate(n):
+    rng = np.random.default_rng(0)
+    return {
+        "dust": rng.uniform(50, 1600, n).round(2),
+        "temp": rng.uniform(18, 45, n).round(2),
+        "tvoc": rng.integers(20, 1100, n),
+        "eco2": rng.integers(400, 2100, n),
+    }
+
+
+def timed(fn):
+    start = time.perf_counter()
+    result = fn()
+    return time.perf_counter() - start, result
+
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 200000
+    columns = generate(n)
+    entries = [
+        {"dust": d, "temp": t, "tvoc": v, "eco2": e}
+        for d, t, v, e in zip(*(columns[m].tolist() for m in ("dust", "temp", "tvoc", "eco2")))
+    ]
+
+    per_row, expected = timed(lambda: [classify_per_row(entry) for entry in entries])
+    from_entries, got = timed(lambda: classify_entries(entries))
+    from_columns, (risk, alert, _) = timed(
+        lambda: classify_arrays(columns["dust"], columns["temp"], columns["tvoc"], columns["eco2"]))
+
+    assert got == expected
+    assert list(zip(risk.tolist(), alert.tolist())) == expected
+
+    print(f"{n:,} readings")
+    for label, elapsed in (("per-row", per_row), ("engine/entries", from_entries), ("engine/columns", from_columns)):
+        print(f"{label:<15} {elapsed * 1000:>9.1f}ms  {n / elapsed:>13,.0f} readings/s  {per_row / elapsed:>6.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,69 @@
+"""Latest-reading and last-N query cost as the sensor log grows.
+
+Fills each backend with synthetic readings and times the read paths used by
+/api/latest-sensor and /api/sensor-data at several history sizes.
+
+Usage:
+    python benchmarks/bench_storage.py [max_rows]
+"""
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_ROOT)
+
+from storage import open_store
+
+
+def generate_entries(start, count, offset):
+    entries = []
+    for i in range(count):
+        ts = start + timedelta(seconds=5 * (offset + i))
+        entries.append({
+            "timestamp": ts.strftime("%Y-%m-%d %H:%M:%S"),
+            "device_id": f"esp32-{i % 8:02d}",
+            "dust": round(random.uniform(50, 1600), 2),
+            "temp": round(random.uniform(20, 42), 2),
+            "tvoc": random.randint(20, 1100),
+            "eco2": random.randint(400, 2100),
+            "risk": "Low",
+            "alert": "✅ Air quality is good"
+        })
+    return entries
+
+
+def time_call(fn, repeat=50):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    return (time.perf_counter() - start) / repeat * 1000
+
+
+def main():
+    max_rows = int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000
+    sizes = [n for n in (1_000, 10_000, 100_000, 1_000_000, 10_000_000, 50_000_000) if n <= max_rows]
+    start = datetime(2025, 1, 1)
+
+    print(f"{'backend':<8} {'rows':>12} {'latest (ms)':>12} {'last-100 (ms)':>14}")
+    for backend in ("sqlite", "csv"):
+        with tempfile.TemporaryDirectory() as data_dir:
+            store = open_store(backend, data_dir)
+            written = 0
+            for size in sizes:
+                while written < size:
+                    count = min(50_000, size - written)
+                    store.append_sensor(generate_entries(start, count, written))
+                    written += count
+
+                latest_ms = time_call(store.latest_sensor)
+                recent_ms = time_call(lambda: store.recent_sensor(100))
+                print(f"{backend:<8} {size:>12,} {latest_ms:>12.3f} {recent_ms:>14.3f}")
+            store.close()
+
+
+if __name__ == "__main__":
+    main()
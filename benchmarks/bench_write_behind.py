@@ -0,0 +1,91 @@
+"""Ingest latency with inline writes vs the write-behind logger.
+
+Several client threads post readings to /api/data concurrently through the
+Flask test client; per-request latency percentiles and the writer metrics
+are reported for each mode.
+
+Usage:
+    python benchmarks/bench_write_behind.py [requests] [threads] [durability]
+"""
+import atexit
+import os
+import random
+import shutil
+import sys
+import tempfile
+import threading
+import time
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_ROOT)
+
+
+def generate_reading():
+    return {
+        "dust": round(random.uniform(50, 1600), 2),
+        "temp": round(random.uniform(20, 42), 2),
+        "tvoc": random.randint(20, 1100),
+        "eco2": random.randint(400, 2100)
+    }
+
+
+def percentile(values, p):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(p / 100 * len(values)))]
+
+
+def run(app, total, threads):
+    latencies = []
+    lock = threading.Lock()
+
+    def worker(count):
+        client = app.test_client()
+        local = []
+        for _ in range(count):
+            start = time.perf_counter()
+            response = client.post("/api/data", json=generate_reading())
+            local.append((time.perf_counter() - start) * 1000)
+            assert response.status_code == 200
+        with lock:
+            latencies.extend(local)
+
+    workers = [threading.Thread(target=worker, args=(total // threads,)) for _ in range(threads)]
+    start = time.perf_counter()
+    for t in workers:
+        t.start()
+    for t in workers:
+        t.join()
+    return time.perf_counter() - start, latencies
+
+
+def main():
+    total = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    threads = int(sys.argv[2]) if len(sys.argv) > 2 else 8
+    durability = sys.argv[3] if len(sys.argv) > 3 else "fsync"
+    os.environ["AIRSIGHT_DURABILITY"] = durability
+
+    # app.py keeps its stores in a scratch folder, removed after its own exit handlers close them
+    data_dir = tempfile.mkdtemp(prefix="airsight-bench-")
+    atexit.register(shutil.rmtree, data_dir, ignore_errors=True)
+    os.environ["AIRSIGHT_DATA_DIR"] = data_dir
+    import app as backend
+
+    default_zone = backend.sensor_log.partition("default")
+    for mode in (False, True):
+        backend.WRITE_BEHIND = mode
+        default_zone.writer = backend.writer if mode else None
+        elapsed, latencies = run(backend.app, total, threads)
+        backend.writer.flush()
+        label = "write-behind" if mode else "inline"
+        print(f"{label:<13} {len(latencies) / elapsed:>8,.0f} req/s  "
+              f"p50={percentile(latencies, 50):.2f}ms  p99={percentile(latencies, 99):.2f}ms")
+
+    metrics = backend.writer.metrics()
+
+    print(f"durability={durability}  batches={metrics['batches']}  "
+          f"avg_batch={metrics['avg_batch_records']}  flush p50={metrics['flush_ms_p50']}ms  "
+          f"p99={metrics['flush_ms_p99']}ms")
+
+
+if __name__ == "__main__":
+    main()
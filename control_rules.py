@@ -0,0 +1,30 @@
+"""Automatic emission-control rules, evaluated by the backend on ingest.
+
+Each rule switches a device on when a metric exceeds its limit and the
+device is still off. Evaluation is a fixed number of comparisons per
+reading. Nothing is switched off automatically: operators do that from the
+dashboard.
+"""
+
+CONTROL_RULES = [
+    {"metric": "dust", "above": 1000, "device": "filtration_unit",
+     "reason": "Auto: Dust level {value:.1f} > 1000 µg/m³"},
+    {"metric": "tvoc", "above": 500, "device": "ventilation",
+     "reason": "Auto: TVOC {value} > 500 ppb"},
+    {"metric": "eco2", "above": 1200, "device": "exhaust_fan",
+     "reason": "Auto: eCO₂ {value} > 1200 ppm"},
+]
+
+AUTO_REASON_PREFIX = "Auto:"
+
+
+def evaluate(entry, state, rules=CONTROL_RULES):
+    """``[(device, reason), ...]`` to switch on for one reading, given the current state."""
+    if not state.get("auto_mode", True):
+        return []
+    actions = []
+    for rule in rules:
+        value = entry.get(rule["metric"])
+        if value is not None and value > rule["above"] and not state.get(rule["device"]):
+            actions.append((rule["device"], rule["reason"].format(value=value)))
+    return actions
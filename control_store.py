@@ -0,0 +1,175 @@
+"""Durable, versioned control state (event-sourced).
+
+Every change is an event ``{"seq", "device", "state", "version", "timestamp",
+"reason"}`` appended to ``control_wal.jsonl`` before it is applied. Each
+device carries a version that increases with every change, so writers can
+compare-and-set: an update that names an ``expected_version`` which is no
+longer current is rejected with ``VersionConflict``.
+
+Every ``snapshot_every`` events the full state is written atomically to
+``control_snapshot.json`` and the log is truncated. Recovery loads the
+snapshot and replays only the events after it, so restart time does not
+depend on how much history exists.
+"""
+import json
+import os
+import threading
+from datetime import datetime
+
+from storage import DATA_DIR
+
+DEFAULT_DEVICES = {
+    "exhaust_fan": False,
+    "filtration_unit": False,
+    "ventilation": False,
+    "emergency_shutdown": False,
+    "auto_mode": True,
+}
+
+
+class VersionConflict(Exception):
+    """The device changed since the caller read it."""
+
+    def __init__(self, device, expected, current):
+        super().__init__(f"{device} is at version {current}, not {expected}")
+        self.device = device
+        self.expected = expected
+        self.current = current
+
+    def __reduce__(self):
+        # Rebuilt from its fields when raised across processes (storage_server.py)
+        return type(self), (self.device, self.expected, self.current)
+
+
+class ControlStore:
+    """Thread-safe control state backed by a snapshot plus an append-only log."""
+
+    def __init__(self, data_dir=DATA_DIR, snapshot_every=1000, fsync=True, devices=None):
+        # Absolute, so a later chdir can't redirect the snapshot written at exit
+        data_dir = os.path.abspath(data_dir)
+        self.snapshot_path = os.path.join(data_dir, "control_snapshot.json")
+        self.wal_path = os.path.join(data_dir, "control_wal.jsonl")
+        self.snapshot_every = snapshot_every
+        self.fsync = fsync
+        self._lock = threading.Lock()
+
+        self._devices = {
+            device: {"state": state, "version": 0, "updated": None}
+            for device, state in (devices or DEFAULT_DEVICES).items()
+        }
+        self._seq = 0
+        self._since_snapshot = 0
+        self._last_updated = None
+        self.replayed, torn = self._recover()
+        self._wal = open(self.wal_path, "a", encoding="utf-8")
+        if torn:
+            # Rewrite the log so new events don't follow the torn line
+            self._snapshot()
+
+    # Recovery
+
+    def _recover(self):
+        if os.path.exists(self.snapshot_path):
+            with open(self.snapshot_path, encoding="utf-8") as f:
+                snapshot = json.load(f)
+            self._seq = snapshot["seq"]
+            self._last_updated = snapshot.get("last_updated")
+            for device, record in snapshot["devices"].items():
+                self._devices[device] = record
+
+        replayed = 0
+        torn = False
+        if os.path.exists(self.wal_path):
+            with open(self.wal_path, encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        event = json.loads(line)
+                    except ValueError:
+                        # Torn final line from a crash mid-append
+                        torn = True
+                        break
+                    if event["seq"] <= self._seq:
+                        continue
+                    self._apply(event)
+                    replayed += 1
+        self._since_snapshot = replayed
+        return replayed, torn
+
+    def _apply(self, event):
+        self._devices[event["device"]] = {
+            "state": event["state"],
+            "version": event["version"],
+            "updated": event["timestamp"],
+        }
+        self._seq = event["seq"]
+        self._last_updated = event["timestamp"]
+
+    # Reads
+
+    def devices(self):
+        return list(self._devices)
+
+    def state(self):
+        """Flat ``{device: state, ..., "last_updated", "versions", "seq"}`` view."""
+        with self._lock:
+            view = {device: record["state"] for device, record in self._devices.items()}
+            view["last_updated"] = self._last_updated
+            view["versions"] = {device: record["version"] for device, record in self._devices.items()}
+            view["seq"] = self._seq
+            return view
+
+    # Writes
+
+    def set(self, device, state, reason=None, expected_version=None):
+        """Change a device; returns the new ``(state, version)``.
+
+        Raises KeyError for unknown devices and VersionConflict when
+        ``expected_version`` is given and no longer current.
+        """
+        with self._lock:
+            record = self._devices[device]
+            if expected_version is not None and expected_version != record["version"]:
+                raise VersionConflict(device, expected_version, record["version"])
+
+            event = {
+                "seq": self._seq + 1,
+                "device": device,
+                "state": state,
+                "version": record["version"] + 1,
+                "timestamp": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+                "reason": reason,
+            }
+            self._wal.write(json.dumps(event) + "\n")
+            self._wal.flush()
+            if self.fsync:
+                os.fsync(self._wal.fileno())
+            self._apply(event)
+
+            self._since_snapshot += 1
+            if self._since_snapshot >= self.snapshot_every:
+                self._snapshot()
+            return state, event["version"]
+
+    def snapshot(self):
+        with self._lock:
+            self._snapshot()
+
+    def _snapshot(self):
+        snapshot = {"seq": self._seq, "last_updated": self._last_updated, "devices": self._devices}
+        tmp_path = self.snapshot_path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(snapshot, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.snapshot_path)
+
+        # Events up to seq are in the snapshot; start a fresh log
+        self._wal.close()
+        self._wal = open(self.wal_path, "w", encoding="utf-8")
+        self._since_snapshot = 0
+
+    def close(self):
+        with self._lock:
+            if self._since_snapshot:
+                self._snapshot()
+            self._wal.close()
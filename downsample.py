@@ -0,0 +1,98 @@
+"""Visual-fidelity downsampling for time-series charts.
+
+Two modes, both returning the *indices* of the points to keep so several
+columns of a frame can be reduced consistently:
+
+* ``lttb``   - Largest-Triangle-Three-Buckets: keeps the points that best
+  preserve the visual shape of the line.
+* ``minmax`` - keeps the minimum and maximum of every pixel bucket, so no
+  spike is ever dropped.
+"""
+import numpy as np
+
+MODES = ("lttb", "minmax")
+
+
+def _as_float(values):
+    values = np.asarray(values)
+    if np.issubdtype(values.dtype, np.datetime64):
+        return values.astype("datetime64[ns]").astype(np.int64).astype(np.float64)
+    return values.astype(np.float64)
+
+
+def lttb_indices(x, y, threshold):
+    """Indices selected by Largest-Triangle-Three-Buckets."""
+    n = len(y)
+    if threshold >= n or threshold < 3:
+        return np.arange(n)
+
+    x = _as_float(x)
+    y = _as_float(y)
+    # Treat missing values as 0 for area computation only
+    y = np.nan_to_num(y)
+
+    indices = np.empty(threshold, dtype=np.int64)
+    indices[0] = 0
+    indices[-1] = n - 1
+
+    # Bucket edges for the n-2 interior points
+    edges = np.linspace(1, n - 1, threshold - 1).astype(np.int64)
+    a = 0
+    for i in range(threshold - 2):
+        start, end = edges[i], edges[i + 1]
+
+        # Average of the next bucket (or the last point)
+        next_start, next_end = edges[i + 1], edges[i + 2] if i + 2 < len(edges) else n
+        if next_end <= next_start:
+            next_end = next_start + 1
+        avg_x = x[next_start:next_end].mean()
+        avg_y = y[next_start:next_end].mean()
+
+        # Point in this bucket forming the largest triangle with a and the average
+        areas = np.abs(
+            (x[a] - avg_x) * (y[start:end] - y[a])
+            - (x[a] - x[start:end]) * (avg_y - y[a])
+        )
+        a = start + int(np.argmax(areas)) if end > start else start
+        indices[i + 1] = a
+
+    return indices
+
+
+def minmax_indices(y, n_buckets):
+    """Indices of the min and max of each of ``n_buckets`` equal-width buckets."""
+    n = len(y)
+    if 2 * n_buckets >= n or n_buckets < 1:
+        return np.arange(n)
+
+    y = _as_float(y)
+    y = np.where(np.isnan(y), np.nanmean(y) if not np.isnan(y).all() else 0, y)
+    edges = np.linspace(0, n, n_buckets + 1).astype(np.int64)
+
+    keep = [0, n - 1]
+    for start, end in zip(edges[:-1], edges[1:]):
+        if end <= start:
+            continue
+        segment = y[start:end]
+        keep.append(start + int(np.argmin(segment)))
+        keep.append(start + int(np.argmax(segment)))
+
+    return np.unique(keep)
+
+
+def downsample_indices(x, y, max_points, mode="lttb"):
+    """Indices to keep so at most ``max_points`` points are drawn."""
+    if mode == "lttb":
+        return lttb_indices(x, y, max_points)
+    if mode == "minmax":
+        # Two points (min and max) per pixel bucket, plus both endpoints
+        return minmax_indices(y, max(1, (max_points - 2) // 2))
+    raise ValueError(f"Unknown downsampling mode: {mode}")
+
+
+def downsample(x, y, max_points, mode="lttb"):
+    """Return the downsampled ``(x, y)`` arrays."""
+    x = np.asarray(x)
+    y = np.asarray(y)
+    idx = downsample_indices(x, y, max_points, mode)
+    return x[idx], y[idx]
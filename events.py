@@ -0,0 +1,201 @@
+"""Server-Sent Events for live telemetry.
+
+``EventBroker`` (backend) fans published events out to subscribers, each with
+its own bounded buffer so one slow client never holds up ingest or other
+clients. A short history lets reconnecting clients resume from
+``Last-Event-ID``.
+
+``RelayedEventBroker`` (multi-worker backend) mirrors a broker that lives in
+another process, keeping its event ids so Last-Event-ID works across workers.
+
+``EventStreamClient`` (dashboard) keeps one background connection to the
+stream and lets callers block until something new has arrived.
+"""
+import json
+import threading
+import time
+from collections import deque
+
+import requests
+
+
+class Subscriber:
+    """Per-client event buffer; drops the oldest events when full."""
+
+    def __init__(self, buffer_size):
+        self._events = deque(maxlen=buffer_size)
+        self._cond = threading.Condition()
+        self.dropped = 0
+
+    def put(self, event):
+        with self._cond:
+            if len(self._events) == self._events.maxlen:
+                self.dropped += 1
+            self._events.append(event)
+            self._cond.notify()
+
+    def get(self, timeout=None):
+        """Wait for events and return all buffered ones (empty list on timeout)."""
+        with self._cond:
+            self._cond.wait_for(lambda: self._events, timeout)
+            events = list(self._events)
+            self._events.clear()
+            return events
+
+
+class EventBroker:
+    """Publishes SSE-formatted events to all current subscribers."""
+
+    def __init__(self, buffer_size=256, history_size=256):
+        self.buffer_size = buffer_size
+        self._subscribers = set()
+        self._history = deque(maxlen=history_size)
+        self._lock = threading.Lock()
+        self._published = threading.Condition(self._lock)
+        self._next_id = 1
+
+    def publish(self, event_type, data):
+        with self._lock:
+            event_id = self._next_id
+            message = f"id: {event_id}\nevent: {event_type}\ndata: {json.dumps(data, default=str)}\n\n"
+            subscribers = self._record(event_id, message)
+        for subscriber in subscribers:
+            subscriber.put(message)
+
+    def _deliver(self, event_id, message):
+        """Deliver an event whose id was assigned elsewhere."""
+        with self._lock:
+            subscribers = self._record(event_id, message)
+        for subscriber in subscribers:
+            subscriber.put(message)
+
+    def _record(self, event_id, message):
+        self._next_id = event_id + 1
+        self._history.append((event_id, message))
+        self._published.notify_all()
+        return list(self._subscribers)
+
+    def last_event_id(self):
+        with self._lock:
+            return self._next_id - 1
+
+    def since(self, last_event_id, timeout=None):
+        """``[(event_id, message), ...]`` after ``last_event_id``, waiting up to ``timeout`` for one."""
+        with self._published:
+            self._published.wait_for(lambda: self._next_id - 1 > last_event_id, timeout)
+            return [(event_id, message) for event_id, message in self._history if event_id > last_event_id]
+
+    def subscribe(self, last_event_id=None):
+        subscriber = Subscriber(self.buffer_size)
+        with self._lock:
+            if last_event_id is not None:
+                # Replay what the client missed while reconnecting
+                for event_id, message in self._history:
+                    if event_id > last_event_id:
+                        subscriber.put(message)
+            self._subscribers.add(subscriber)
+        return subscriber
+
+    def unsubscribe(self, subscriber):
+        with self._lock:
+            self._subscribers.discard(subscriber)
+
+    def subscriber_count(self):
+        with self._lock:
+            return len(self._subscribers)
+
+    def stream(self, subscriber, heartbeat=15.0):
+        """Generator of SSE text for a subscriber, with keep-alive comments."""
+        try:
+            yield "retry: 2000\n\n"
+            while True:
+                events = subscriber.get(timeout=heartbeat)
+                if not events:
+                    yield ": keep-alive\n\n"
+                    continue
+                yield "".join(events)
+        finally:
+            self.unsubscribe(subscriber)
+
+
+class RelayedEventBroker(EventBroker):
+    """Local mirror of a broker in another process (``source`` is its proxy).
+
+    ``publish`` goes to the source, which assigns the id; a background thread
+    long-polls ``source.since`` and delivers events, with their ids, to the
+    local subscribers.
+    """
+
+    def __init__(self, source, buffer_size=256, history_size=256, poll_timeout=15.0):
+        super().__init__(buffer_size, history_size)
+        self.source = source
+        self.poll_timeout = poll_timeout
+        self._thread = threading.Thread(target=self._run, name="sse-relay", daemon=True)
+        self._thread.start()
+
+    def publish(self, event_type, data):
+        self.source.publish(event_type, data)
+
+    def _run(self):
+        last_event_id = None
+        while True:
+            try:
+                if last_event_id is None:
+                    last_event_id = self.source.last_event_id()
+                for event_id, message in self.source.since(last_event_id, self.poll_timeout):
+                    self._deliver(event_id, message)
+                    last_event_id = event_id
+            except Exception:
+                # Storage process restarting or gone; retry
+                time.sleep(1.0)
+
+
+class EventStreamClient:
+    """Background SSE listener that counts received events.
+
+    ``version`` increases with every event; readers compare it with the
+    version they last acted on.
+    """
+
+    def __init__(self, url, reconnect_delay=2.0, read_timeout=30.0):
+        self.url = url
+        self.reconnect_delay = reconnect_delay
+        self.read_timeout = read_timeout
+        self.version = 0
+        self.connected = False
+        self.last_event = None
+        self._lock = threading.Lock()
+        self._thread = threading.Thread(target=self._run, name="sse-client", daemon=True)
+        self._thread.start()
+
+    def _set(self, **changes):
+        with self._lock:
+            for key, value in changes.items():
+                setattr(self, key, value)
+
+    def _run(self):
+        last_event_id = None
+        while True:
+            try:
+                headers = {"Accept": "text/event-stream"}
+                if last_event_id:
+                    headers["Last-Event-ID"] = last_event_id
+                with requests.get(self.url, stream=True, headers=headers,
+                                  timeout=(3, self.read_timeout)) as response:
+                    response.raise_for_status()
+                    self._set(connected=True)
+                    event_type = None
+                    for line in response.iter_lines(decode_unicode=True):
+                        if line.startswith("id:"):
+                            last_event_id = line[3:].strip()
+                        elif line.startswith("event:"):
+                            event_type = line[6:].strip()
+                        elif line == "" and event_type:
+                            with self._lock:
+                                self.version += 1
+                                self.last_event = event_type
+                            event_type = None
+            except requests.RequestException:
+                pass
+            self._set(connected=False)
+            time.sleep(self.reconnect_delay)
@@ -0,0 +1,301 @@
+"""Load test: a simulated fleet of ESP32 devices plus dashboard users.
+
+    python fleet_simulator.py --devices 200 --duration 60 --output run.json
+
+Every device runs in its own thread with its own keep-alive connection and
+posts a reading to /api/data every ``--interval`` seconds (+/- ``--jitter``).
+Readings drift like real sensors and spike now and then. With probability
+``--burst`` a device instead uploads a backlog of buffered readings to
+/api/data/batch, as after a WiFi drop. Failed requests (connection errors,
+5xx, 503 with Retry-After) are retried with backoff.
+
+``--readers`` dashboard users poll /api/latest-sensor, /api/sensor-data and
+/api/control/state; ``--operators`` flip control devices through
+/api/control/set with compare-and-set (a 409 is a lost race, not an error).
+
+Throughput, error rate and p50/p95/p99 latency are reported per endpoint and
+written as JSON. ``--baseline old.json`` prints the change against an
+earlier run.
+"""
+import argparse
+import json
+import random
+import threading
+import time
+from collections import defaultdict
+from datetime import datetime
+
+import requests
+
+
+def percentile(values, p):
+    if not values:
+        return None
+    return round(values[min(len(values) - 1, int(p / 100 * len(values)))], 2)
+
+
+class Recorder:
+    """Per-endpoint latencies, status codes, errors and retries."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._latencies = defaultdict(list)
+        self._statuses = defaultdict(lambda: defaultdict(int))
+        self._errors = defaultdict(int)
+        self._retries = defaultdict(int)
+        self.readings_sent = 0
+        self.readings_accepted = 0
+
+    def record(self, endpoint, latency_ms, status, error):
+        with self._lock:
+            self._latencies[endpoint].append(latency_ms)
+            self._statuses[endpoint][str(status)] += 1
+            if error:
+                self._errors[endpoint] += 1
+
+    def retried(self, endpoint):
+        with self._lock:
+            self._retries[endpoint] += 1
+
+    def readings(self, sent, accepted):
+        with self._lock:
+            self.readings_sent += sent
+            self.readings_accepted += accepted
+
+    def summary(self, elapsed):
+        with self._lock:
+            endpoints = {}
+            for endpoint, latencies in sorted(self._latencies.items()):
+                latencies = sorted(latencies)
+                requests_made = len(latencies)
+                endpoints[endpoint] = {
+                    "requests": requests_made,
+                    "errors": self._errors[endpoint],
+                    "error_rate": round(self._errors[endpoint] / requests_made, 4),
+                    "retries": self._retries[endpoint],
+                    "status_codes": dict(self._statuses[endpoint]),
+                    "throughput_rps": round(requests_made / elapsed, 2),
+                    "p50_ms": percentile(latencies, 50),
+                    "p95_ms": percentile(latencies, 95),
+                    "p99_ms": percentile(latencies, 99),
+                    "max_ms": round(latencies[-1], 2),
+                }
+            return {
+                "elapsed_s": round(elapsed, 2),
+                "readings_sent": self.readings_sent,
+                "readings_accepted": self.readings_accepted,
+                "readings_per_s": round(self.readings_accepted / elapsed, 2),
+                "endpoints": endpoints,
+            }
+
+
+class Client:
+    """One keep-alive connection that times and retries requests."""
+
+    def __init__(self, base_url, recorder, options):
+        self.base_url = base_url.rstrip("/")
+        self.recorder = recorder
+        self.options = options
+        self.session = requests.Session()
+        if options.prefer_async:
+            self.session.headers["Prefer"] = "respond-async"
+
+    def request(self, method, path, endpoint=None, ok=(200, 202), **kwargs):
+        """Send with retries; returns the last response or None."""
+        endpoint = endpoint or path
+        delay = 0.2
+        for attempt in range(self.options.retries + 1):
+            if attempt:
+                self.recorder.retried(endpoint)
+            start = time.perf_counter()
+            try:
+                response = self.session.request(method, self.base_url + path,
+                                                timeout=self.options.timeout, **kwargs)
+            except requests.RequestException as e:
+                self.recorder.record(endpoint, (time.perf_counter() - start) * 1000, type(e).__name__, True)
+                time.sleep(delay * random.uniform(0.5, 1.5))
+                delay *= 2
+                continue
+            latency = (time.perf_counter() - start) * 1000
+            self.recorder.record(endpoint, latency, response.status_code, response.status_code not in ok)
+            if response.status_code < 500:
+                return response
+            # Server busy or failing: honour Retry-After, else back off exponentially
+            retry_after = response.headers.get("Retry-After")
+            wait = float(retry_after) if retry_after and retry_after.isdigit() else delay
+            time.sleep(min(wait, 10) * random.uniform(0.8, 1.2))
+            delay *= 2
+        return None
+
+
+class Device:
+    """A simulated ESP32: drifting readings with occasional spikes."""
+
+    def __init__(self, index, zones):
+        self.device_id = f"esp32-{index:03d}"
+        self.zone = zones[index % len(zones)] if zones else None
+        self.dust = random.uniform(80, 400)
+        self.temp = random.uniform(21, 27)
+        self.tvoc = random.uniform(40, 200)
+        self.eco2 = random.uniform(450, 700)
+
+    def reading(self, timestamp=None):
+        self.dust = min(max(self.dust + random.gauss(0, 15), 10), 1500)
+        self.temp = min(max(self.temp + random.gauss(0, 0.1), 15), 45)
+        self.tvoc = min(max(self.tvoc + random.gauss(0, 8), 0), 1000)
+        self.eco2 = min(max(self.eco2 + random.gauss(0, 10), 400), 2000)
+        spike = 3.0 if random.random() < 0.01 else 1.0
+        reading = {
+            "device_id": self.device_id,
+            "dust": round(self.dust * spike, 2),
+            "temp": round(self.temp, 2),
+            "tvoc": int(self.tvoc * spike),
+            "eco2": int(self.eco2),
+        }
+        if self.zone:
+            reading["zone"] = self.zone
+        if timestamp is not None:
+            reading["timestamp"] = round(timestamp, 3)
+        return reading
+
+
+def sleep_until(deadline, seconds):
+    time.sleep(max(0.0, min(seconds, deadline - time.monotonic())))
+
+
+def run_device(device, client, options, deadline):
+    # Devices boot at different times
+    sleep_until(deadline, random.uniform(0, options.interval))
+    while time.monotonic() < deadline:
+        if random.random() < options.burst:
+            # Back online: upload the readings buffered while offline
+            now = time.time()
+            count = random.randint(2, options.burst_size)
+            batch = [device.reading(now - (count - i) * options.interval) for i in range(count)]
+            response = client.request("POST", "/api/data/batch", json={"readings": batch})
+            accepted = response.json().get("accepted", 0) if response is not None and response.ok else 0
+            client.recorder.readings(count, accepted)
+        else:
+            response = client.request("POST", "/api/data", json=device.reading())
+            client.recorder.readings(1, 1 if response is not None and response.ok else 0)
+        sleep_until(deadline, options.interval * random.uniform(1 - options.jitter, 1 + options.jitter))
+
+
+def run_reader(client, options, deadline):
+    zones = options.zones
+    sleep_until(deadline, random.uniform(0, options.reader_interval))
+    while time.monotonic() < deadline:
+        zone = random.choice(zones) if zones and random.random() < 0.5 else None
+        params = {"zone": zone} if zone else {}
+        client.request("GET", "/api/latest-sensor", params=params, ok=(200, 404))
+        client.request("GET", "/api/sensor-data", params=params)
+        client.request("GET", "/api/control/state")
+        sleep_until(deadline, options.reader_interval * random.uniform(0.8, 1.2))
+
+
+def run_operator(client, options, deadline):
+    sleep_until(deadline, random.uniform(0, options.operator_interval))
+    while time.monotonic() < deadline:
+        response = client.request("GET", "/api/control/state")
+        if response is not None and response.ok:
+            state = response.json()
+            versions = state.get("versions", {})
+            if not versions:
+                break
+            device = random.choice(list(versions))
+            client.request("POST", "/api/control/set", ok=(200, 409), json={
+                "device": device,
+                "state": not state.get(device, False),
+                "reason": "Load test operator",
+                "expected_version": versions[device],
+            })
+        sleep_until(deadline, options.operator_interval * random.uniform(0.8, 1.2))
+
+
+def run(options):
+    recorder = Recorder()
+    deadline = time.monotonic() + options.duration
+    threads = []
+    for i in range(options.devices):
+        client = Client(options.url, recorder, options)
+        threads.append(threading.Thread(target=run_device, args=(Device(i, options.zones), client, options, deadline)))
+    for _ in range(options.readers):
+        threads.append(threading.Thread(target=run_reader, args=(Client(options.url, recorder, options), options, deadline)))
+    for _ in range(options.operators):
+        threads.append(threading.Thread(target=run_operator, args=(Client(options.url, recorder, options), options, deadline)))
+
+    started_at = datetime.now().isoformat(timespec="seconds")
+    start = time.monotonic()
+    for thread in threads:
+        thread.daemon = True
+        thread.start()
+    for thread in threads:
+        # In-flight requests may run past the deadline by up to the retry budget
+        thread.join()
+    summary = recorder.summary(time.monotonic() - start)
+    return {"started_at": started_at, "config": {k: v for k, v in vars(options).items() if k not in ("output", "baseline")}, **summary}
+
+
+def print_report(result, baseline=None):
+    print(f"\n{result['config']['devices']} devices, {result['config']['readers']} readers, "
+          f"{result['config']['operators']} operators, {result['elapsed_s']}s")
+    print(f"readings: {result['readings_accepted']}/{result['readings_sent']} accepted "
+          f"({result['readings_per_s']}/s)\n")
+    print(f"{'endpoint':<22} {'req':>7} {'req/s':>8} {'err%':>6} {'retry':>6} "
+          f"{'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8}")
+    for endpoint, stats in result["endpoints"].items():
+        print(f"{endpoint:<22} {stats['requests']:>7} {stats['throughput_rps']:>8.1f} "
+              f"{stats['error_rate'] * 100:>6.2f} {stats['retries']:>6} "
+              f"{stats['p50_ms']:>8.2f} {stats['p95_ms']:>8.2f} {stats['p99_ms']:>8.2f}")
+
+    if baseline:
+        print(f"\nvs baseline ({baseline.get('started_at')}):")
+        for endpoint, stats in result["endpoints"].items():
+            old = baseline.get("endpoints", {}).get(endpoint)
+            if not old:
+                continue
+            changes = []
+            for key in ("throughput_rps", "p50_ms", "p99_ms"):
+                if old.get(key):
+                    changes.append(f"{key} {(stats[key] - old[key]) / old[key] * 100:+.1f}%")
+            changes.append(f"error_rate {(stats['error_rate'] - old['error_rate']) * 100:+.2f}pp")
+            print(f"  {endpoint:<22} " + "  ".join(changes))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Simulate a fleet of ESP32 devices against the backend")
+    parser.add_argument("--url", default="http://127.0.0.1:5000")
+    parser.add_argument("--devices", type=int, default=100)
+    parser.add_argument("--duration", type=float, default=30, help="seconds")
+    parser.add_argument("--interval", type=float, default=2, help="seconds between readings per device")
+    parser.add_argument("--jitter", type=float, default=0.25, help="interval jitter as a fraction")
+    parser.add_argument("--burst", type=float, default=0.02, help="chance that a send is a buffered batch")
+    parser.add_argument("--burst-size", type=int, default=50, help="max readings in a buffered batch")
+    parser.add_argument("--zones", default="A,B,C", help="comma-separated zones ('' for none)")
+    parser.add_argument("--readers", type=int, default=5, help="dashboard users polling the API")
+    parser.add_argument("--reader-interval", type=float, default=2)
+    parser.add_argument("--operators", type=int, default=1, help="users switching control devices")
+    parser.add_argument("--operator-interval", type=float, default=10)
+    parser.add_argument("--retries", type=int, default=3)
+    parser.add_argument("--timeout", type=float, default=10)
+    parser.add_argument("--async", dest="prefer_async", action="store_true",
+                        help="send 'Prefer: respond-async' with every request")
+    parser.add_argument("--output", help="write the results as JSON")
+    parser.add_argument("--baseline", help="earlier JSON results to compare with")
+    options = parser.parse_args()
+    options.zones = [zone for zone in options.zones.split(",") if zone]
+
+    result = run(options)
+    baseline = None
+    if options.baseline:
+        with open(options.baseline) as f:
+            baseline = json.load(f)
+    print_report(result, baseline)
+    if options.output:
+        with open(options.output, "w") as f:
+            json.dump(result, f, indent=2)
+        print(f"\nResults written to {options.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,210 @@
+"""Asynchronous sensor ingest.
+
+In async mode a request handler only validates readings and enqueues them;
+it answers 202 Accepted straight away. Background threads take whatever is
+queued, classify it in one vectorized pass and persist it, so a slow disk
+never holds up a device waiting for its response.
+
+The queue is bounded by the number of readings waiting. When it is full,
+``put`` raises ``queue.Full`` at once and the handler answers 503 with
+``Retry-After`` instead of blocking. Readings are acknowledged before they
+are stored, so ``process`` must wait for a full store queue rather than fail
+(app.py writes with ``block=True``): a slow store then backs up this queue
+and new readings get the 503.
+
+Enqueue-to-persist latency is measured per reading. With ``track_persist``
+the clock stops when ``persisted()`` is called for the reading, i.e. after
+the store write (app.py hooks it to the writer's ``on_write``). Otherwise
+it stops when ``process`` returns.
+"""
+import itertools
+import logging
+import queue
+import threading
+import time
+from collections import OrderedDict, deque
+
+logger = logging.getLogger(__name__)
+
+# Entry key holding a reading's sequence number while its store write is pending
+SEQ_KEY = "_ingest_seq"
+
+
+class IngestQueue:
+    """Bounded queue of readings drained by background processing threads."""
+
+    def __init__(self, process, classify=None, max_pending=10000, batch_size=500,
+                 workers=2, track_persist=False):
+        # process(entries) persists classified readings; classify(entries) -> [(risk, alert), ...]
+        self.process = process
+        self.classify = classify
+        self.max_pending = max_pending
+        self.batch_size = batch_size
+        self.workers = workers
+        self.track_persist = track_persist
+
+        self._items = deque()
+        self._pending = 0
+        self._cond = threading.Condition()
+        self._threads = []
+        self._stopping = False
+
+        self._stats_lock = threading.Lock()
+        # Readings carry a sequence number under this key until the store write lands
+        self._seq = itertools.count(1)
+        self._unpersisted = OrderedDict()   # seq -> enqueue time
+        self._latencies = deque(maxlen=1000)
+        self._waits = deque(maxlen=1000)
+        self._stats = {
+            "accepted": 0,
+            "rejected": 0,
+            "processed": 0,
+            "persisted": 0,
+            "failed": 0,
+        }
+
+    # Lifecycle
+
+    def start(self):
+        with self._cond:
+            self._stopping = False
+            self._threads = [t for t in self._threads if t.is_alive()]
+            while len(self._threads) < self.workers:
+                thread = threading.Thread(target=self._run, name=f"ingest-{len(self._threads)}", daemon=True)
+                thread.start()
+                self._threads.append(thread)
+        return self
+
+    @property
+    def running(self):
+        return any(thread.is_alive() for thread in self._threads)
+
+    def stop(self, timeout=10.0):
+        """Process everything still queued, then stop the threads."""
+        with self._cond:
+            self._stopping = True
+            self._cond.notify_all()
+        deadline = time.monotonic() + timeout
+        for thread in self._threads:
+            thread.join(max(0.0, deadline - time.monotonic()))
+
+    # Producers
+
+    def put(self, entries):
+        """Enqueue validated readings; raises queue.Full when they don't fit."""
+        if not entries:
+            return
+        with self._cond:
+            if self._pending + len(entries) > self.max_pending:
+                with self._stats_lock:
+                    self._stats["rejected"] += len(entries)
+                raise queue.Full
+            self._items.append((time.monotonic(), entries))
+            self._pending += len(entries)
+            self._cond.notify()
+        with self._stats_lock:
+            self._stats["accepted"] += len(entries)
+
+    @property
+    def depth(self):
+        return self._pending
+
+    # Processing threads
+
+    def _take(self):
+        """Up to batch_size queued readings (whole requests), or None once stopped and empty."""
+        with self._cond:
+            self._cond.wait_for(lambda: self._items or self._stopping)
+            if not self._items:
+                return None
+            taken = [self._items.popleft()]
+            count = len(taken[0][1])
+            while self._items and count + len(self._items[0][1]) <= self.batch_size:
+                item = self._items.popleft()
+                taken.append(item)
+                count += len(item[1])
+            self._pending -= count
+            return taken
+
+    def _run(self):
+        while True:
+            taken = self._take()
+            if taken is None:
+                return
+            now = time.monotonic()
+            entries = []
+            with self._stats_lock:
+                for enqueued_at, item_entries in taken:
+                    self._waits.append((now - enqueued_at) * 1000)
+                    entries.extend(item_entries)
+
+            try:
+                if self.classify is not None:
+                    for entry, (risk, alert) in zip(entries, self.classify(entries)):
+                        entry["risk"] = risk
+                        entry["alert"] = alert
+                if self.track_persist:
+                    with self._stats_lock:
+                        for enqueued_at, item_entries in taken:
+                            for entry in item_entries:
+                                entry[SEQ_KEY] = seq = next(self._seq)
+                                self._unpersisted[seq] = enqueued_at
+                        # Writes that never land (failed flushes) must not pin memory
+                        while len(self._unpersisted) > 2 * self.max_pending:
+                            self._unpersisted.popitem(last=False)
+                self.process(entries)
+            except Exception:
+                logger.exception("Async ingest of %d readings failed", len(entries))
+                with self._stats_lock:
+                    self._stats["failed"] += len(entries)
+                    for entry in entries:
+                        self._unpersisted.pop(entry.pop(SEQ_KEY, None), None)
+                continue
+
+            with self._stats_lock:
+                self._stats["processed"] += len(entries)
+            if not self.track_persist:
+                self._record_persisted([(enqueued_at, len(item)) for enqueued_at, item in taken])
+
+    def persisted(self, entries):
+        """Called after readings were written; ends their enqueue-to-persist clock."""
+        with self._stats_lock:
+            times = [self._unpersisted.pop(entry.pop(SEQ_KEY, None), None) for entry in entries]
+        self._record_persisted([(enqueued_at, 1) for enqueued_at in times if enqueued_at is not None])
+
+    def _record_persisted(self, items):
+        now = time.monotonic()
+        with self._stats_lock:
+            for enqueued_at, count in items:
+                self._latencies.append((now - enqueued_at) * 1000)
+                self._stats["persisted"] += count
+
+    # Metrics
+
+    def metrics(self):
+        """Queue depth, counters, queue wait and enqueue-to-persist latency percentiles."""
+        with self._stats_lock:
+            stats = dict(self._stats)
+            latencies = sorted(self._latencies)
+            waits = sorted(self._waits)
+
+        def percentile(values, p):
+            if not values:
+                return None
+            return round(values[min(len(values) - 1, int(p / 100 * len(values)))], 3)
+
+        stats.update({
+            "queue_depth": self._pending,
+            "queue_capacity": self.max_pending,
+            "workers": self.workers,
+            "batch_size": self.batch_size,
+            "latency_until": "store write" if self.track_persist else "hand-off",
+            "queue_wait_ms_p50": percentile(waits, 50),
+            "queue_wait_ms_p99": percentile(waits, 99),
+            "persist_ms_p50": percentile(latencies, 50),
+            "persist_ms_p95": percentile(latencies, 95),
+            "persist_ms_p99": percentile(latencies, 99),
+            "persist_ms_max": round(latencies[-1], 3) if latencies else None,
+            "running": self.running,
+        })
+        return stats
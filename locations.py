@@ -0,0 +1,43 @@
+"""Registry of sites whose outdoor air quality is tracked.
+
+Locations are read from a JSON file (``AIRSIGHT_LOCATIONS_FILE``, default
+``locations.json`` next to this module) mapping an id to
+``{"name", "latitude", "longitude"}``. Without the file only Mumbai is
+registered.
+"""
+import json
+import os
+
+DEFAULT_LOCATION = "mumbai"
+DEFAULT_LOCATIONS = {
+    "mumbai": {"name": "Mumbai", "latitude": 19.0760, "longitude": 72.8777},
+}
+
+
+def load_locations(path=None):
+    """Location id -> {"name", "latitude", "longitude"}."""
+    path = path or os.environ.get("AIRSIGHT_LOCATIONS_FILE") or os.path.join(
+        os.path.dirname(os.path.abspath(__file__)), "locations.json")
+    if not os.path.exists(path):
+        return dict(DEFAULT_LOCATIONS)
+
+    with open(path, encoding="utf-8") as f:
+        raw = json.load(f)
+
+    locations = {}
+    for location_id, spec in raw.items():
+        try:
+            latitude = float(spec["latitude"])
+            longitude = float(spec["longitude"])
+        except (KeyError, TypeError, ValueError):
+            raise ValueError(f"Location '{location_id}' needs numeric latitude and longitude")
+        if not (-90 <= latitude <= 90 and -180 <= longitude <= 180):
+            raise ValueError(f"Location '{location_id}' has out-of-range coordinates")
+        locations[location_id.lower()] = {
+            "name": spec.get("name", location_id),
+            "latitude": latitude,
+            "longitude": longitude,
+        }
+    if not locations:
+        raise ValueError(f"No locations defined in {path}")
+    return locations
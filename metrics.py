@@ -0,0 +1,259 @@
+"""In-process metrics in the Prometheus text exposition format.
+
+Counters, gauges and fixed-bucket histograms with labels, cheap enough to
+record on every request: an observation is a bisect and a few additions
+under a per-metric lock. ``REGISTRY.render()`` produces the text served at
+``/metrics``.
+
+With several worker processes (serve.py) every process records into its
+own registry. ``snapshot()`` turns a registry into plain data; the storage
+process collects the snapshots (``MetricsHub``) and ``render(merge(...))``
+serves their sum, so any worker answers ``/metrics`` for all of them.
+
+``AIRSIGHT_METRICS=0`` turns recording off.
+"""
+import bisect
+import os
+import threading
+import time
+
+# Seconds; covers sub-millisecond handlers up to slow upstream calls
+LATENCY_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05,
+                   0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+class _Metric:
+    kind = None
+
+    def __init__(self, registry, name, documentation, labelnames):
+        self.registry = registry
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        self._values = {}
+
+    def _key(self, labels):
+        return tuple([str(labels[name]) for name in self.labelnames])
+
+    def _samples(self):
+        with self._lock:
+            return {key: self._copy(value) for key, value in self._values.items()}
+
+    def _copy(self, value):
+        return value
+
+    def describe(self):
+        return {"kind": self.kind, "help": self.documentation, "labelnames": self.labelnames}
+
+
+class Counter(_Metric):
+    """Monotonically increasing count (per label set)."""
+
+    kind = "counter"
+
+    def inc(self, amount=1, **labels):
+        if not self.registry.enabled:
+            return
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+
+class Gauge(_Metric):
+    """Current value, set directly or read from ``callback()`` at collection time."""
+
+    kind = "gauge"
+
+    def __init__(self, registry, name, documentation, labelnames=(), callback=None):
+        super().__init__(registry, name, documentation, labelnames)
+        self.callback = callback
+
+    def set(self, value, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+    def _samples(self):
+        if self.callback is None:
+            return super()._samples()
+        try:
+            value = self.callback()
+        except Exception:
+            return {}
+        if isinstance(value, dict):
+            # {label value (or tuple of them): value}
+            return {key if isinstance(key, tuple) else (str(key),): v for key, v in value.items()}
+        return {(): value}
+
+
+class Histogram(_Metric):
+    """Observations counted into cumulative ``le`` buckets, plus their sum and count."""
+
+    kind = "histogram"
+
+    def __init__(self, registry, name, documentation, labelnames=(), buckets=LATENCY_BUCKETS):
+        super().__init__(registry, name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value, **labels):
+        if self.registry.enabled:
+            self._observe(self._key(labels), value)
+
+    def _observe(self, key, value):
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                # Per-bucket counts (last one is +Inf), sum
+                state = self._values[key] = [[0] * (len(self.buckets) + 1), 0.0]
+            state[0][index] += 1
+            state[1] += value
+
+    def time(self, **labels):
+        """Context manager that observes the seconds spent in its block."""
+        return _Timer(self, self._key(labels) if self.registry.enabled else None)
+
+    def _copy(self, value):
+        return [list(value[0]), value[1]]
+
+    def describe(self):
+        return {**super().describe(), "buckets": self.buckets}
+
+
+class _Timer:
+    __slots__ = ("histogram", "key", "start")
+
+    def __init__(self, histogram, key):
+        self.histogram = histogram
+        self.key = key
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        if self.key is not None:
+            self.histogram._observe(self.key, time.perf_counter() - self.start)
+
+
+class Registry:
+    """Named metrics of one process. Creating an existing name returns it."""
+
+    def __init__(self, enabled=True):
+        self.enabled = enabled
+        self._metrics = {}
+        self._lock = threading.Lock()
+
+    def _get_or_create(self, cls, name, *args, **kwargs):
+        with self._lock:
+            metric = self._metrics.get(name)
+            if metric is None:
+                metric = self._metrics[name] = cls(self, name, *args, **kwargs)
+            elif not isinstance(metric, cls):
+                raise ValueError(f"Metric {name} already registered as a {metric.kind}")
+            return metric
+
+    def counter(self, name, documentation, labelnames=()):
+        return self._get_or_create(Counter, name, documentation, labelnames)
+
+    def gauge(self, name, documentation, labelnames=(), callback=None):
+        return self._get_or_create(Gauge, name, documentation, labelnames, callback)
+
+    def histogram(self, name, documentation, labelnames=(), buckets=LATENCY_BUCKETS):
+        return self._get_or_create(Histogram, name, documentation, labelnames, buckets)
+
+    def snapshot(self):
+        """``{name: {kind, help, labelnames[, buckets], samples}}``, plain picklable data."""
+        with self._lock:
+            metrics = list(self._metrics.values())
+        return {metric.name: {**metric.describe(), "samples": metric._samples()} for metric in metrics}
+
+    def render(self):
+        return render(self.snapshot())
+
+
+def merge(snapshots):
+    """Sum snapshots of several processes (gauges are summed too)."""
+    merged = {}
+    for snapshot in snapshots:
+        for name, metric in snapshot.items():
+            target = merged.get(name)
+            if target is None:
+                merged[name] = {**metric, "samples": {}}
+                target = merged[name]
+            samples = target["samples"]
+            for key, value in metric["samples"].items():
+                if metric["kind"] != "histogram":
+                    samples[key] = samples.get(key, 0) + value
+                elif key not in samples:
+                    samples[key] = [list(value[0]), value[1]]
+                else:
+                    current = samples[key]
+                    current[0] = [a + b for a, b in zip(current[0], value[0])]
+                    current[1] += value[1]
+    return merged
+
+
+def _escape(value):
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names, values, extra=None):
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra is not None:
+        pairs.append(f'le="{extra}"')
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _number(value):
+    if value == float("inf"):
+        return "+Inf"
+    if isinstance(value, float) and value.is_integer() and abs(value) < 1e15:
+        return str(int(value))
+    return repr(value) if isinstance(value, float) else str(value)
+
+
+def render(snapshot):
+    """Text exposition format (version 0.0.4) of a snapshot."""
+    lines = []
+    for name in sorted(snapshot):
+        metric = snapshot[name]
+        lines.append(f"# HELP {name} {metric['help']}")
+        lines.append(f"# TYPE {name} {metric['kind']}")
+        names = metric["labelnames"]
+        for key in sorted(metric["samples"]):
+            value = metric["samples"][key]
+            if metric["kind"] != "histogram":
+                lines.append(f"{name}{_labels(names, key)} {_number(value)}")
+                continue
+            counts, total = value
+            cumulative = 0
+            for bound, count in zip(metric["buckets"] + (float("inf"),), counts):
+                cumulative += count
+                lines.append(f"{name}_bucket{_labels(names, key, _number(float(bound)))} {cumulative}")
+            lines.append(f"{name}_sum{_labels(names, key)} {_number(total)}")
+            lines.append(f"{name}_count{_labels(names, key)} {cumulative}")
+    return "\n".join(lines) + "\n"
+
+
+class MetricsHub:
+    """Snapshots pushed by worker processes, merged with this process's own registry."""
+
+    def __init__(self, registry):
+        self.registry = registry
+        self._snapshots = {}
+        self._lock = threading.Lock()
+
+    def publish(self, source, snapshot):
+        # Cumulative values, so the latest snapshot of each process replaces the previous one
+        with self._lock:
+            self._snapshots[source] = snapshot
+
+    def collect(self):
+        with self._lock:
+            snapshots = list(self._snapshots.values())
+        return merge([self.registry.snapshot()] + snapshots)
+
+
+REGISTRY = Registry(enabled=os.environ.get("AIRSIGHT_METRICS", "1") == "1")
@@ -0,0 +1,300 @@
+"""Outbound client for the Open-Meteo air-quality API.
+
+* One pooled ``requests.Session`` with connect/read timeouts.
+* A TTL cache keyed by location and hour. Entries older than ``ttl`` are
+  served stale while a single background refresh runs. Entries up to
+  ``max_stale`` old are also served when the upstream fails. Concurrent
+  misses for one location share a single upstream request.
+* ``refresh_many`` fetches many locations with multi-coordinate requests run
+  concurrently; ``CachePrefetcher`` calls it periodically so request
+  handlers are answered from the cache.
+* A circuit breaker. After ``failure_threshold`` consecutive failures,
+  calls fail fast (or are answered from the cache) for ``reset_timeout``
+  seconds. A single trial request then decides whether to close it again.
+"""
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from datetime import datetime
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from metrics import REGISTRY
+
+DEFAULT_URL = "https://air-quality-api.open-meteo.com/v1/air-quality"
+
+UPSTREAM_SECONDS = REGISTRY.histogram(
+    "airsight_openmeteo_request_seconds", "Open-Meteo upstream request time", ("outcome",))
+CLIENT_EVENTS = REGISTRY.counter(
+    "airsight_openmeteo_events_total", "Cache hits/misses, upstream calls and errors, short circuits", ("event",))
+
+
+class UpstreamUnavailable(Exception):
+    """No usable reading: the upstream failed and nothing cached is recent enough."""
+
+
+class CircuitBreaker:
+    """Consecutive-failure circuit breaker (closed -> open -> half-open)."""
+
+    def __init__(self, failure_threshold=5, reset_timeout=30.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._failures = 0
+        self._opened_at = None
+        self._trial_running = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self):
+        with self._lock:
+            return self._state()
+
+    def _state(self):
+        if self._opened_at is None:
+            return "closed"
+        if time.monotonic() - self._opened_at >= self.reset_timeout:
+            return "half-open"
+        return "open"
+
+    def allow(self):
+        """True if a call may go upstream now."""
+        with self._lock:
+            state = self._state()
+            if state == "closed":
+                return True
+            if state == "half-open" and not self._trial_running:
+                self._trial_running = True
+                return True
+            return False
+
+    def record_success(self):
+        with self._lock:
+            self._failures = 0
+            self._opened_at = None
+            self._trial_running = False
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            self._trial_running = False
+            if self._opened_at is not None or self._failures >= self.failure_threshold:
+                self._opened_at = time.monotonic()
+
+
+class OpenMeteoClient:
+    """Cached, circuit-broken fetcher of the current-hour PM2.5/PM10 reading."""
+
+    def __init__(self, url=DEFAULT_URL, ttl=600.0, max_stale=3 * 3600.0,
+                 connect_timeout=2.0, read_timeout=5.0, pool_size=10,
+                 failure_threshold=5, reset_timeout=30.0, refresh_workers=2,
+                 chunk_size=50, max_concurrency=4):
+        self.url = url
+        self.ttl = ttl
+        self.max_stale = max_stale
+        self.timeout = (connect_timeout, read_timeout)
+        self.chunk_size = chunk_size
+        self.breaker = CircuitBreaker(failure_threshold, reset_timeout)
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=max(pool_size, max_concurrency), max_retries=0)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+        self._cache = {}            # (lat, lon) -> (hour, entry, fetched_at)
+        self._inflight = {}         # (lat, lon) -> Future of the running fetch
+        self._lock = threading.Lock()
+        self._refresher = ThreadPoolExecutor(max_workers=refresh_workers, thread_name_prefix="openmeteo")
+        self._fetch_pool = ThreadPoolExecutor(max_workers=max_concurrency, thread_name_prefix="openmeteo-batch")
+        self._latencies = deque(maxlen=1000)
+        self._stats = {"hits": 0, "stale_hits": 0, "misses": 0, "upstream_calls": 0,
+                       "upstream_errors": 0, "short_circuited": 0}
+
+    def current(self, latitude, longitude):
+        """Current-hour reading ``{"timestamp", "pm2_5", "pm10"}`` for a location."""
+        key = (round(latitude, 4), round(longitude, 4))
+        hour = datetime.now().strftime("%Y-%m-%dT%H:00")
+
+        with self._lock:
+            cached = self._cache.get(key)
+        if cached is not None:
+            cached_hour, entry, fetched_at = cached
+            age = time.monotonic() - fetched_at
+            if cached_hour == hour and age < self.ttl:
+                self._count("hits")
+                return dict(entry)
+            if age < self.max_stale:
+                # Serve stale; refresh unless the circuit is open
+                if self.breaker.state != "open":
+                    self._refresh_in_background(key)
+                self._count("stale_hits")
+                return dict(entry)
+
+        self._count("misses")
+        try:
+            return dict(self._fetch_once(key))
+        except UpstreamUnavailable:
+            if cached is not None and time.monotonic() - cached[2] < self.max_stale:
+                self._count("stale_hits")
+                return dict(cached[1])
+            raise
+
+    def _fetch_once(self, key):
+        """Fetch ``key``, sharing one upstream request among concurrent callers."""
+        with self._lock:
+            future = self._inflight.get(key)
+            owner = future is None
+            if owner:
+                future = self._inflight[key] = Future()
+        if not owner:
+            return future.result()
+
+        try:
+            entry = self._fetch(key)
+            future.set_result(entry)
+            return entry
+        except Exception as e:
+            # Any failure, expected or not, must reach the callers waiting on the future
+            future.set_exception(e)
+            raise
+        finally:
+            with self._lock:
+                del self._inflight[key]
+
+    def _refresh_in_background(self, key):
+        with self._lock:
+            if key in self._inflight:
+                return
+
+        def refresh():
+            try:
+                self._fetch_once(key)
+            except UpstreamUnavailable:
+                pass
+
+        self._refresher.submit(refresh)
+
+    def refresh_many(self, coordinates):
+        """Fetch the current reading for many ``(latitude, longitude)`` pairs.
+
+        Coordinates are grouped into multi-coordinate requests of
+        ``chunk_size`` and the groups are fetched concurrently, at most
+        ``max_concurrency`` at a time. Returns the number of locations
+        refreshed; failed groups keep their cached entries.
+        """
+        keys = list(dict.fromkeys((round(lat, 4), round(lon, 4)) for lat, lon in coordinates))
+        chunks = [keys[i:i + self.chunk_size] for i in range(0, len(keys), self.chunk_size)]
+
+        def fetch(chunk):
+            try:
+                return len(self._fetch_many(chunk))
+            except UpstreamUnavailable:
+                return 0
+
+        return sum(self._fetch_pool.map(fetch, chunks))
+
+    def _fetch(self, key):
+        return self._fetch_many([key])[0]
+
+    def _fetch_many(self, keys):
+        if not self.breaker.allow():
+            self._count("short_circuited")
+            raise UpstreamUnavailable("Open-Meteo circuit is open")
+
+        params = {
+            "latitude": ",".join(str(lat) for lat, _ in keys),
+            "longitude": ",".join(str(lon) for _, lon in keys),
+            "current": "pm2_5,pm10",
+            "timezone": "auto",
+        }
+        self._count("upstream_calls")
+        start = time.perf_counter()
+        try:
+            response = self.session.get(self.url, params=params, timeout=self.timeout)
+            response.raise_for_status()
+            results = response.json()
+            # A single coordinate returns an object, several return a list
+            if isinstance(results, dict):
+                results = [results]
+            if len(results) != len(keys):
+                raise ValueError(f"expected {len(keys)} locations, got {len(results)}")
+            entries = [
+                {
+                    "timestamp": result["current"]["time"],
+                    "pm2_5": result["current"]["pm2_5"],
+                    "pm10": result["current"]["pm10"],
+                }
+                for result in results
+            ]
+        except (requests.RequestException, ValueError, KeyError, TypeError) as e:
+            self.breaker.record_failure()
+            self._count("upstream_errors")
+            UPSTREAM_SECONDS.observe(time.perf_counter() - start, outcome="error")
+            raise UpstreamUnavailable(f"Open-Meteo request failed: {e}") from e
+        finally:
+            self._latencies.append((time.perf_counter() - start) * 1000)
+        UPSTREAM_SECONDS.observe(time.perf_counter() - start, outcome="ok")
+
+        self.breaker.record_success()
+        hour = datetime.now().strftime("%Y-%m-%dT%H:00")
+        now = time.monotonic()
+        with self._lock:
+            for key, entry in zip(keys, entries):
+                self._cache[key] = (hour, entry, now)
+        return entries
+
+    def _count(self, name):
+        with self._lock:
+            self._stats[name] += 1
+        CLIENT_EVENTS.inc(event=name)
+
+    def metrics(self):
+        """Cache hit rate, breaker state and upstream latency percentiles."""
+        with self._lock:
+            stats = dict(self._stats)
+        times = sorted(self._latencies)
+
+        def percentile(p):
+            if not times:
+                return None
+            return round(times[min(len(times) - 1, int(p / 100 * len(times)))], 3)
+
+        requests_served = stats["hits"] + stats["stale_hits"] + stats["misses"]
+        stats.update({
+            "hit_rate": round((stats["hits"] + stats["stale_hits"]) / requests_served, 4) if requests_served else None,
+            "circuit": self.breaker.state,
+            "upstream_ms_p50": percentile(50),
+            "upstream_ms_p99": percentile(99),
+        })
+        return stats
+
+    def close(self):
+        self._refresher.shutdown(wait=False)
+        self._fetch_pool.shutdown(wait=False)
+        self.session.close()
+
+
+class CachePrefetcher:
+    """Keeps the client's cache warm by refreshing all locations periodically."""
+
+    def __init__(self, client, coordinates, interval=300.0):
+        self.client = client
+        self.coordinates = list(coordinates)
+        self.interval = interval
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        if self._thread is None or not self._thread.is_alive():
+            self._thread = threading.Thread(target=self._run, name="openmeteo-prefetch", daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+
+    def _run(self):
+        while not self._stop.is_set():
+            self.client.refresh_many(self.coordinates)
+            self._stop.wait(self.interval)
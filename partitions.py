@@ -0,0 +1,350 @@
+"""Zone-partitioned sensor storage.
+
+Readings carry a ``zone`` and a ``device_id``. Each zone is a partition with
+its own store (``data/zones/<zone>/``), its own write-behind writer, a ring
+buffer of recent readings, a rollup aggregator and a latest-reading cache per
+device. Zones never share a lock, a queue or a database file, so ingest and
+reads for different zones proceed independently.
+
+Readings without a zone go to the ``default`` partition, which is the main
+store in ``data/``; existing logs need no migration.
+
+Zone-scoped reads touch a single partition. Global reads merge partitions
+by timestamp; their pagination cursor holds one position per zone.
+"""
+import base64
+import heapq
+import itertools
+import json
+import os
+import re
+import threading
+from operator import itemgetter
+
+import pandas as pd
+
+from ring_buffer import SensorRingBuffer
+from rollups import RollupAggregator
+from storage import DATA_DIR, SENSOR_COLUMNS, open_store
+
+DEFAULT_ZONE = "default"
+ZONE_PATTERN = re.compile(r"^[A-Za-z0-9_-]{1,32}$")
+
+_by_timestamp = itemgetter("timestamp")
+
+
+def check_zone(zone):
+    """Validated zone id (letters, digits, "_" and "-"; up to 32 characters)."""
+    zone = str(zone)
+    if not ZONE_PATTERN.match(zone):
+        raise ValueError(f"Invalid zone: {zone}")
+    return zone
+
+
+def _encode_positions(positions):
+    return base64.urlsafe_b64encode(json.dumps(positions, separators=(",", ":")).encode("utf-8")).decode("ascii")
+
+
+def _decode_positions(token):
+    try:
+        positions = json.loads(base64.urlsafe_b64decode(token.encode("ascii")))
+    except (ValueError, UnicodeError):
+        raise ValueError("Invalid cursor")
+    if not isinstance(positions, dict):
+        raise ValueError("Invalid cursor")
+    return positions
+
+
+class Partition:
+    """One zone: store, writer, recent readings, rollups and latest reading per device."""
+
+    def __init__(self, zone, store, writer=None, ring_capacity=5000):
+        self.zone = zone
+        self.store = store
+        self.writer = writer
+        self.recent = SensorRingBuffer(ring_capacity)
+        self.rollups = RollupAggregator()
+        self.devices = {}
+        warm = store.recent_sensor(ring_capacity)
+        for entry in warm:
+            entry["zone"] = zone
+            self.devices[entry.get("device_id")] = entry
+        self.recent.extend(warm)
+        self._lock = threading.Lock()
+
+    def append(self, entries, fsync=False, on_write=None, block=False):
+        with self._lock:
+            self.recent.extend(entries)
+            for entry in entries:
+                # A late reading doesn't replace a newer one from the same device
+                current = self.devices.get(entry.get("device_id"))
+                if current is None or current["timestamp"] <= entry["timestamp"]:
+                    self.devices[entry.get("device_id")] = entry
+            rollup_rows = self.rollups.add(entries)
+        if self.writer is not None:
+            self.writer.submit_sensor(entries, block)
+            self.writer.submit_rollups(rollup_rows, block)
+        else:
+            self.store.append_sensor(entries, fsync=fsync)
+            self.store.append_rollups(rollup_rows, fsync=fsync)
+            if on_write is not None:
+                on_write("sensor", entries)
+
+    def latest(self, device_id=None):
+        if device_id is None:
+            return self.recent.latest()
+        return self.devices.get(device_id)
+
+    def series_since(self, start, fields, limit):
+        """Readings since ``start``, from memory when the ring buffer covers it."""
+        oldest = self.recent.oldest()
+        if oldest is None:
+            return []
+        if len(self.recent) < self.recent.capacity or oldest["timestamp"] <= start:
+            return [
+                {field: entry.get(field) for field in fields}
+                for entry in self.recent.last(self.recent.capacity)
+                if entry["timestamp"] >= start
+            ]
+        return [record for record, _ in self.iter_sensor(start=start, fields=fields, limit=limit)]
+
+    def iter_sensor(self, start=None, end=None, cursor=None, fields=None, limit=1000):
+        """The store's ``(record, cursor)`` pairs, with ``zone`` available as a field."""
+        with_zone = fields is None or "zone" in fields
+        if fields is not None:
+            fields = [field for field in fields if field != "zone"]
+        for record, position in self.store.iter_sensor(start, end, cursor, fields, limit):
+            if with_zone:
+                record["zone"] = self.zone
+            yield record, position
+
+    def drain(self, fsync=False):
+        """Persist the still-open rollup buckets."""
+        rows = self.rollups.drain()
+        if self.writer is not None:
+            self.writer.submit_rollups(rows)
+        else:
+            self.store.append_rollups(rows, fsync=fsync)
+
+
+class PartitionedSensorLog:
+    """Routes readings to zone partitions and merges reads across them.
+
+    ``default_store``/``default_writer`` back the default zone. New zones get
+    a store under ``data_dir/zones/<zone>`` and a writer from
+    ``writer_factory(store)`` (None writes inline). ``on_write`` is called
+    after inline writes; writers report their own.
+    """
+
+    def __init__(self, default_store, default_writer=None, data_dir=DATA_DIR, backend=None,
+                 writer_factory=None, ring_capacity=5000, fsync=False, on_write=None):
+        self.zones_dir = os.path.join(os.path.abspath(data_dir), "zones")
+        self.backend = backend
+        self.writer_factory = writer_factory
+        self.ring_capacity = ring_capacity
+        self.fsync = fsync
+        self.on_write = on_write
+        self._lock = threading.Lock()
+        self._partitions = {DEFAULT_ZONE: Partition(DEFAULT_ZONE, default_store, default_writer, ring_capacity)}
+        self.discover()
+
+    def discover(self):
+        """Open zones that have data on disk but no partition yet (e.g. written by another process)."""
+        if not os.path.isdir(self.zones_dir):
+            return
+        for zone in sorted(os.listdir(self.zones_dir)):
+            if ZONE_PATTERN.match(zone) and zone not in self._partitions:
+                self.partition(zone)
+
+    def _open(self, zone):
+        store = open_store(self.backend, data_dir=os.path.join(self.zones_dir, zone))
+        writer = self.writer_factory(store) if self.writer_factory else None
+        return Partition(zone, store, writer, self.ring_capacity)
+
+    def partition(self, zone):
+        """The partition for ``zone``, created on first use."""
+        zone = check_zone(zone)
+        partition = self._partitions.get(zone)
+        if partition is None:
+            with self._lock:
+                partition = self._partitions.get(zone)
+                if partition is None:
+                    partition = self._open(zone)
+                    self._partitions = {**self._partitions, zone: partition}
+        return partition
+
+    def zones(self):
+        return list(self._partitions)
+
+    def _selected(self, zone):
+        """Partitions a read covers: one zone (none if it has no data yet) or all."""
+        if zone is None:
+            return list(self._partitions.values())
+        partition = self._partitions.get(check_zone(zone))
+        return [partition] if partition is not None else []
+
+    # Writes
+
+    def append(self, entries, block=False):
+        """Append readings, each to the partition of its ``zone`` (missing -> default).
+
+        ``block`` waits for room in a full write-behind queue instead of raising queue.Full.
+        """
+        by_zone = {}
+        for entry in entries:
+            by_zone.setdefault(entry.setdefault("zone", DEFAULT_ZONE), []).append(entry)
+        for zone, group in by_zone.items():
+            self.partition(zone).append(group, fsync=self.fsync, on_write=self.on_write, block=block)
+
+    # Versions (for ETags)
+
+    def total(self, zone=None):
+        """Readings ever appended (to ``zone``, or to any zone)."""
+        return sum(partition.recent.total for partition in self._selected(zone))
+
+    def written(self, zone=None):
+        """Records written by the background writers (to ``zone``, or to any zone)."""
+        return sum(p.writer.written for p in self._selected(zone) if p.writer is not None)
+
+    # Reads
+
+    def latest(self, zone=None, device_id=None):
+        """Newest reading of a zone / device, or across all zones."""
+        candidates = [p.latest(device_id) for p in self._selected(zone)]
+        candidates = [entry for entry in candidates if entry is not None]
+        return max(candidates, key=_by_timestamp) if candidates else None
+
+    def last(self, k, zone=None):
+        """Up to ``k`` newest readings, oldest first."""
+        partitions = self._selected(zone)
+        if len(partitions) == 1:
+            return partitions[0].recent.last(k)
+        merged = list(heapq.merge(*(p.recent.last(k) for p in partitions), key=_by_timestamp))
+        return merged[-k:] if k else []
+
+    def devices(self, zone=None):
+        """``{zone: [latest reading of each device, ...]}``."""
+        return {p.zone: list(p.devices.values()) for p in self._selected(zone)}
+
+    def series_since(self, start, fields, zone=None, limit=100000):
+        """Readings since ``start`` with ``fields``, oldest first."""
+        fields = list(fields)
+        if "timestamp" not in fields:
+            fields.append("timestamp")
+        series = [p.series_since(start, fields, limit) for p in self._selected(zone)]
+        # Sorted rather than merged: a CSV log is in arrival order, which late readings
+        # break (already-sorted runs cost Timsort one linear pass)
+        return sorted(itertools.chain.from_iterable(series), key=_by_timestamp)
+
+    def iter_sensor(self, start=None, end=None, cursor=None, fields=None, limit=1000, zone=None):
+        """``(record, cursor)`` pairs in timestamp order; see ``storage`` for the arguments.
+
+        Scoped to one zone this is the partition's own cursor. Across zones
+        the cursor records the last position read in every zone. A CSV log is
+        paged in file order, so a late reading comes where it arrived.
+        """
+        if fields is not None:
+            unknown = [f for f in fields if f not in SENSOR_COLUMNS and f != "zone"]
+            if unknown:
+                raise ValueError(f"Unknown fields: {', '.join(unknown)}")
+        if zone is not None:
+            partitions = self._selected(zone)
+            return partitions[0].iter_sensor(start, end, cursor, fields, limit) if partitions else iter(())
+        return self._iter_merged(start, end, cursor, fields, limit)
+
+    def _iter_merged(self, start, end, cursor, fields, limit):
+        positions = _decode_positions(cursor) if cursor else {}
+        strip_timestamp = fields is not None and "timestamp" not in fields
+        if strip_timestamp:
+            fields = list(fields) + ["timestamp"]
+
+        def tagged(partition):
+            for record, position in partition.iter_sensor(start, end, positions.get(partition.zone), fields, limit):
+                yield record["timestamp"], partition.zone, record, position
+
+        merged = heapq.merge(*(tagged(p) for p in self._partitions.values()), key=itemgetter(0, 1))
+        for count, (_, zone, record, position) in enumerate(merged):
+            if count == limit:
+                return
+            positions[zone] = position
+            if strip_timestamp:
+                del record["timestamp"]
+            yield record, _encode_positions(positions)
+
+    def page(self, start=None, end=None, cursor=None, fields=None, limit=1000, zone=None):
+        """``iter_sensor`` as a list, for callers in another process."""
+        return list(self.iter_sensor(start, end, cursor, fields, limit, zone))
+
+    def query_rollups(self, resolution, start=None, end=None, zone=None):
+        """Stored and still-open rollup rows of a zone or of all zones (partial, unmerged)."""
+        rows = []
+        for partition in self._selected(zone):
+            rows += partition.store.query_rollups(resolution, start, end)
+            rows += [
+                row for row in partition.rollups.open_rows(resolution)
+                if (start is None or row["bucket"] >= start) and (end is None or row["bucket"] <= end)
+            ]
+        return rows
+
+    def read_sensor_frame(self):
+        """Full history of every zone as one DataFrame, ordered by timestamp."""
+        self.discover()
+        frames = [self._zone_frame(p.zone, p.store.read_sensor_frame()) for p in self._partitions.values()]
+        return self._concat(frames)
+
+    def read_sensor_increment(self, cursor=None):
+        """Rows added in any zone since ``cursor``, as ``(frame, cursor, reset)``.
+
+        Works with ``storage.IncrementalSensorFrame``. A reset in one zone
+        (rotated or replaced log) reloads every zone.
+        """
+        self.discover()
+        partitions = list(self._partitions.values())
+        positions = cursor or {}
+        results = [p.store.read_sensor_increment(positions.get(p.zone)) for p in partitions]
+        if cursor is not None and any(reset for p, (_, _, reset) in zip(partitions, results) if p.zone in cursor):
+            return self.read_sensor_increment(None)
+        frames = [self._zone_frame(p.zone, frame) for p, (frame, _, _) in zip(partitions, results)]
+        positions = {p.zone: position for p, (_, position, _) in zip(partitions, results)}
+        return self._concat(frames), positions, cursor is None
+
+    @staticmethod
+    def _zone_frame(zone, frame):
+        if not frame.empty:
+            frame["zone"] = zone
+        return frame
+
+    @staticmethod
+    def _concat(frames):
+        frames = [frame for frame in frames if not frame.empty]
+        if not frames:
+            return pd.DataFrame()
+        if len(frames) == 1:
+            return frames[0].reset_index(drop=True)
+        return pd.concat(frames, ignore_index=True).sort_values("timestamp", kind="stable", ignore_index=True)
+
+    # Lifecycle
+
+    def metrics(self):
+        """Per-zone reading counts, device counts and writer metrics."""
+        return {
+            p.zone: {
+                "recent": len(p.recent),
+                "devices": len(p.devices),
+                **({"writer": p.writer.metrics()} if p.writer is not None else {}),
+            }
+            for p in self._partitions.values()
+        }
+
+    def close(self):
+        """Persist open rollups; stop and close the zone writers and stores.
+
+        The default partition's writer and store belong to the caller.
+        """
+        for partition in self._partitions.values():
+            partition.drain(fsync=self.fsync)
+            if partition.zone == DEFAULT_ZONE:
+                continue
+            if partition.writer is not None:
+                partition.writer.stop()
+            partition.store.close()
@@ -0,0 +1,132 @@
+"""Section timings for the Streamlit dashboard.
+
+The dashboard wraps each part of a rerun (data load, control calls, KPI
+cards, each chart, gauge, diagnostic, report) in ``profiler.section(name)``.
+While profiling is on, the last ``window`` durations of every section are
+kept for rolling percentiles. With a ``log_path`` every timing is also
+appended to a JSON-lines file, so runs can be compared offline:
+
+    python render_profile.py before.jsonl [after.jsonl]
+"""
+import json
+import os
+import sys
+import threading
+import time
+from collections import deque
+from contextlib import nullcontext
+from datetime import datetime
+
+
+def percentile(values, p):
+    if not values:
+        return None
+    values = sorted(values)
+    return values[min(len(values) - 1, int(p / 100 * len(values)))]
+
+
+class _Section:
+    __slots__ = ("profiler", "name", "start")
+
+    def __init__(self, profiler, name):
+        self.profiler = profiler
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.profiler.record(self.name, (time.perf_counter() - self.start) * 1000)
+
+
+class RenderProfiler:
+    """Rolling per-section render times (ms) of one dashboard session."""
+
+    def __init__(self, window=200, log_path=None):
+        self.enabled = False
+        self.window = window
+        self.log_path = log_path
+        self.session = f"{os.getpid()}-{id(self):x}"
+        self._times = {}
+        self._lock = threading.Lock()
+
+    def section(self, name):
+        """Context manager timing its block as ``name`` (does nothing while disabled)."""
+        return _Section(self, name) if self.enabled else nullcontext()
+
+    def record(self, name, ms):
+        with self._lock:
+            times = self._times.get(name)
+            if times is None:
+                times = self._times[name] = deque(maxlen=self.window)
+            times.append(ms)
+        if self.log_path:
+            line = json.dumps({
+                "timestamp": datetime.now().isoformat(timespec="milliseconds"),
+                "session": self.session,
+                "section": name,
+                "ms": round(ms, 3),
+            })
+            with open(self.log_path, "a", encoding="utf-8") as f:
+                f.write(line + "\n")
+
+    def summary(self):
+        """One row per section, in first-seen order: runs, last, p50, p95, max (ms)."""
+        with self._lock:
+            sections = {name: list(times) for name, times in self._times.items()}
+        return [
+            {
+                "section": name,
+                "runs": len(times),
+                "last_ms": round(times[-1], 2),
+                "p50_ms": round(percentile(times, 50), 2),
+                "p95_ms": round(percentile(times, 95), 2),
+                "max_ms": round(max(times), 2),
+            }
+            for name, times in sections.items()
+        ]
+
+    def reset(self):
+        with self._lock:
+            self._times.clear()
+
+
+def load_log(path):
+    """``{section: [ms, ...]}`` from a timings file."""
+    sections = {}
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            if line.strip():
+                record = json.loads(line)
+                sections.setdefault(record["section"], []).append(record["ms"])
+    return sections
+
+
+def main():
+    paths = sys.argv[1:3]
+    if not paths:
+        print("Usage: python render_profile.py timings.jsonl [other.jsonl]")
+        sys.exit(1)
+    logs = [load_log(path) for path in paths]
+    names = list(dict.fromkeys(name for log in logs for name in log))
+
+    header = f"{'section':<22}" + "".join(f"{'p50 ms':>10}{'p95 ms':>10}{'n':>7}" for _ in logs)
+    print(header + (f"{'p50 change':>12}" if len(logs) == 2 else ""))
+    for name in names:
+        row = f"{name:<22}"
+        medians = []
+        for log in logs:
+            times = log.get(name, [])
+            medians.append(percentile(times, 50))
+            if times:
+                row += f"{percentile(times, 50):>10.2f}{percentile(times, 95):>10.2f}{len(times):>7}"
+            else:
+                row += f"{'-':>10}{'-':>10}{0:>7}"
+        if len(logs) == 2 and all(medians):
+            row += f"{(medians[1] / medians[0] - 1) * 100:>+11.0f}%"
+        print(row)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,255 @@
+"""Background PDF report jobs.
+
+Building a PDF report (two charts, the statistics table and the
+recommendations) takes seconds for a 24-hour range: too long to hold a
+request or a dashboard rerun. ``ReportJobs`` builds them in a small process
+pool instead. ``submit`` returns a job id straight away, ``status`` reports
+the job's stage and progress, and ``result`` returns the PDF once it is done.
+
+Finished PDFs are cached by (time range, zone, data version, time bucket).
+The data version is the number of readings ever stored for the zone, so
+asking again before new readings arrive is answered from the cache without
+building anything. Report ranges are relative to now, so the key also holds
+the current time bucket, a fixed share (``WINDOW_SLACK``) of the range: a
+cached PDF's window lags the requested one by at most that share. An
+identical request made while a job is still running joins that job.
+
+app.py owns the service in single-process mode. Under serve.py it lives in
+the storage process, so every worker sees the same jobs and cache.
+
+Pool processes start with forkserver (spawn where unavailable), so they
+re-import the main module: keep its start-up under ``if __name__ ==
+"__main__"`` (storage_server.py does).
+"""
+import logging
+import multiprocessing
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from metrics import REGISTRY
+from reports import REPORT_RANGES, create_pdf_report
+
+logger = logging.getLogger(__name__)
+
+REPORT_SECONDS = REGISTRY.histogram("airsight_report_build_seconds", "Time to load the data for and build one PDF report")
+REPORT_JOBS = REGISTRY.counter(
+    "airsight_report_jobs_total", "Report requests by outcome (built, cached, joined, failed)", ("outcome",))
+
+# Share of a job's progress spent loading its data; building the PDF is the rest
+LOAD_SHARE = 0.1
+
+# How far (as a share of its length) a cached report's window may lag the current one
+WINDOW_SLACK = 0.02
+
+# Set in each pool process by _init_worker
+_progress_queue = None
+
+
+def _init_worker(progress_queue):
+    global _progress_queue
+    _progress_queue = progress_queue
+
+
+def _build_report(job_id, frame, time_range, stats):
+    """Runs in a pool process: the PDF as bytes, reporting progress on the way."""
+    def progress(fraction, stage):
+        _progress_queue.put((job_id, fraction, stage))
+    return create_pdf_report(frame, time_range, progress=progress, stats=stats).getvalue()
+
+
+class ReportJobs:
+    """Report jobs, their progress and the cache of finished PDFs."""
+
+    def __init__(self, load_frame, data_version, workers=1, cache_size=8, cache_ttl=600.0, keep=100):
+        # load_frame(minutes, zone) -> (DataFrame to chart, report_stats summary of the
+        # readings or None to compute it from the frame)
+        # data_version(zone) -> value that changes whenever readings are added to the zone
+        self.load_frame = load_frame
+        self.data_version = data_version
+        self.workers = workers
+        self.cache_size = cache_size
+        self.cache_ttl = cache_ttl
+        self.keep = keep
+
+        self._lock = threading.Lock()
+        self._jobs = OrderedDict()      # job id -> job, oldest first
+        self._running = {}              # cache key -> id of the job building it
+        self._cache = OrderedDict()     # cache key -> (pdf, rows, built at), least recently used first
+        self._stats = {"built": 0, "cached": 0, "joined": 0, "failed": 0}
+        # Loading happens in threads here; only the PDF build goes to the pool
+        self._loaders = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="report-loader")
+        self._pool = None
+        self._progress = None
+
+    # Pool
+
+    def _get_pool(self):
+        with self._lock:
+            if self._pool is None:
+                # Not fork: this process runs threads (writers, ingest, HTTP), and a forked
+                # child can inherit one of their locks held. The fork server preloads the
+                # report code once; spawn where it is unavailable
+                methods = multiprocessing.get_all_start_methods()
+                context = multiprocessing.get_context("forkserver" if "forkserver" in methods else "spawn")
+                if context.get_start_method() == "forkserver":
+                    context.set_forkserver_preload(["report_jobs"])
+                if self._progress is None:
+                    self._progress = context.SimpleQueue()
+                    threading.Thread(target=self._read_progress, name="report-progress", daemon=True).start()
+                self._pool = ProcessPoolExecutor(
+                    self.workers, mp_context=context, initializer=_init_worker, initargs=(self._progress,)
+                )
+            return self._pool
+
+    def _read_progress(self):
+        while True:
+            item = self._progress.get()
+            if item is None:
+                return
+            job_id, fraction, stage = item
+            with self._lock:
+                job = self._jobs.get(job_id)
+                if job is not None and job["status"] == "running":
+                    job["progress"] = round(LOAD_SHARE + (1 - LOAD_SHARE) * fraction, 3)
+                    job["stage"] = stage
+
+    def close(self):
+        self._loaders.shutdown(wait=False, cancel_futures=True)
+        with self._lock:
+            pool, self._pool = self._pool, None
+        if pool is not None:
+            pool.shutdown(wait=True, cancel_futures=True)
+        if self._progress is not None:
+            self._progress.put(None)
+
+    # Jobs
+
+    def submit(self, time_range, zone=None):
+        """Start (or join, or answer from the cache) a report; returns the job's status."""
+        if time_range not in REPORT_RANGES:
+            raise ValueError(f"time_range must be one of: {', '.join(REPORT_RANGES)}")
+        # Read before the data, so a cached PDF never claims newer data than it holds
+        window = REPORT_RANGES[time_range] * 60
+        key = (time_range, zone, self.data_version(zone), int(time.time() // (window * WINDOW_SLACK)))
+        with self._lock:
+            self._expire()
+            running = self._running.get(key)
+            if running is not None:
+                self._stats["joined"] += 1
+                REPORT_JOBS.inc(outcome="joined")
+                return self._public(self._jobs[running])
+
+            job = self._new_job(key)
+            cached = self._cache.get(key)
+            if cached is not None:
+                self._cache.move_to_end(key)
+                pdf, rows, _ = cached
+                job.update(status="done", stage="done", progress=1.0, cached=True, rows=rows,
+                           finished_at=time.time(), size=len(pdf), pdf=pdf)
+                self._stats["cached"] += 1
+                REPORT_JOBS.inc(outcome="cached")
+                return self._public(job)
+
+            self._running[key] = job["id"]
+        self._loaders.submit(self._run, job)
+        return self._public(job)
+
+    def _new_job(self, key):
+        job = {
+            "id": uuid.uuid4().hex,
+            "time_range": key[0],
+            "zone": key[1],
+            "data_version": key[2],
+            "status": "queued",
+            "stage": "queued",
+            "progress": 0.0,
+            "cached": False,
+            "rows": None,
+            "size": None,
+            "error": None,
+            "submitted_at": time.time(),
+            "finished_at": None,
+            "key": key,
+            "pdf": None,
+        }
+        self._jobs[job["id"]] = job
+        # Forget the oldest finished jobs beyond ``keep``
+        finished = [job_id for job_id, j in self._jobs.items() if j["status"] in ("done", "failed")]
+        for job_id in finished[:max(0, len(self._jobs) - self.keep)]:
+            del self._jobs[job_id]
+        return job
+
+    def _run(self, job):
+        started = time.perf_counter()
+        key = job["key"]
+        try:
+            with self._lock:
+                job.update(status="running", stage="loading data", progress=0.0)
+            frame, stats = self.load_frame(REPORT_RANGES[job["time_range"]], job["zone"])
+            with self._lock:
+                job.update(rows=stats["count"] if stats else len(frame), stage="building report", progress=LOAD_SHARE)
+            try:
+                pdf = self._get_pool().submit(_build_report, job["id"], frame, job["time_range"], stats).result()
+            except BrokenProcessPool:
+                # A pool process died (e.g. out of memory); start a fresh pool for the next job
+                with self._lock:
+                    self._pool = None
+                raise RuntimeError("Report process exited unexpectedly")
+        except Exception as e:
+            logger.exception("Report job %s failed", job["id"])
+            with self._lock:
+                job.update(status="failed", stage="failed", error=str(e), finished_at=time.time())
+                self._running.pop(key, None)
+                self._stats["failed"] += 1
+            REPORT_JOBS.inc(outcome="failed")
+            return
+
+        REPORT_SECONDS.observe(time.perf_counter() - started)
+        with self._lock:
+            self._cache[key] = (pdf, job["rows"], time.monotonic())
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+            job.update(status="done", stage="done", progress=1.0, size=len(pdf), pdf=pdf, finished_at=time.time())
+            self._running.pop(key, None)
+            self._stats["built"] += 1
+        REPORT_JOBS.inc(outcome="built")
+
+    def _expire(self):
+        now = time.monotonic()
+        for key in [key for key, (_, _, built_at) in self._cache.items() if now - built_at > self.cache_ttl]:
+            del self._cache[key]
+
+    @staticmethod
+    def _public(job):
+        return {name: value for name, value in job.items() if name not in ("key", "pdf")}
+
+    def status(self, job_id):
+        """The job's status, stage and progress (0-1), or None for an unknown id."""
+        with self._lock:
+            job = self._jobs.get(job_id)
+            return self._public(job) if job is not None else None
+
+    def result(self, job_id):
+        """The finished job's PDF bytes, or None while it is not done."""
+        with self._lock:
+            job = self._jobs.get(job_id)
+            return job["pdf"] if job is not None else None
+
+    def metrics(self):
+        """Jobs by status, outcomes and cache use."""
+        with self._lock:
+            statuses = {}
+            for job in self._jobs.values():
+                statuses[job["status"]] = statuses.get(job["status"], 0) + 1
+            return {
+                "workers": self.workers,
+                "jobs": statuses,
+                **self._stats,
+                "cache_entries": len(self._cache),
+                "cache_bytes": sum(len(pdf) for pdf, _, _ in self._cache.values()),
+                "cache_ttl_s": self.cache_ttl,
+            }
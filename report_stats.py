@@ -0,0 +1,206 @@
+"""Single-pass statistics for reports.
+
+Everything a report says about a metric comes from one aggregation:
+count, mean, min, max, standard deviation, percentiles, and the time and
+readings spent in each threshold band (normal / moderate / high / critical,
+the levels of ``risk_engine.SENSOR_THRESHOLDS``).
+
+``aggregate`` computes this for several time ranges ending now in one scan.
+The rows are split at the range boundaries into disjoint segments. Each
+segment is reduced once to a mergeable partial: count, sum and sum of
+squares, min, max, and two fixed-width histograms (readings and seconds per
+bin). Percentiles and band totals are read off the merged histograms; every
+band bound is a bin edge, so the band totals are exact. Every range is then
+the merge of the segments it covers, so the five report ranges cost the same
+single scan as the longest one.
+
+``aggregate_rollups`` does the same from 1-minute rollup buckets (see
+rollups.py). Use it when the raw data is too large to load. Count, mean,
+min and max stay exact. The standard deviation, percentiles and bands are
+estimated from the bucket means, and the result is marked ``approximate``.
+"""
+from datetime import datetime, timedelta
+
+import numpy as np
+import pandas as pd
+
+from risk_engine import METRICS, SENSOR_THRESHOLDS
+
+# Band i holds the readings at risk_engine level i (above i of the metric's bounds)
+BANDS = ("normal", "moderate", "high", "critical")
+PERCENTILES = (50, 95, 99)
+
+# Histograms: (lowest edge, bins per unit, bins) per metric, covering each sensor's
+# range at display precision. Bins include their upper edge, like the risk levels
+# (a reading on a bound stays below it). Bins per unit are powers of two, so the
+# bounds fall exactly on bin edges. Values outside land in the edge bins
+HISTOGRAMS = {
+    "dust": (0.0, 1, 5000),
+    "temp": (-40.0, 16, 2400),
+    "tvoc": (0.0, 1, 60000),
+    "eco2": (0.0, 1, 60000),
+}
+
+# A reading counts as lasting until the next one, up to this long (longer gaps are no data)
+MAX_GAP_SECONDS = 60
+ROLLUP_BUCKET_SECONDS = 60
+
+# First bin of each band
+_BAND_BINS = {
+    metric: [0] + [int((bound - HISTOGRAMS[metric][0]) * HISTOGRAMS[metric][1]) for bound in spec["bounds"]]
+    for metric, spec in SENSOR_THRESHOLDS.items()
+}
+
+
+def _partial(values, weights, mins, maxs, durations, metric, shift):
+    """Mergeable aggregate of one segment's values (NaNs are skipped; weights None: one reading each)."""
+    valid = ~np.isnan(values)
+    if not valid.all():
+        values, mins, maxs, durations = values[valid], mins[valid], maxs[valid], durations[valid]
+        weights = weights[valid] if weights is not None else None
+    lo, scale, bins = HISTOGRAMS[metric]
+    # Bin k holds (lo + k / scale, lo + (k + 1) / scale]
+    bin_index = np.ceil((values - lo) * scale).astype(np.int64) - 1
+    np.clip(bin_index, 0, bins - 1, out=bin_index)
+    shifted = values - shift
+    weighted = shifted if weights is None else weights * shifted
+    return {
+        "count": float(len(values)) if weights is None else weights.sum(),
+        "sum": weighted.sum(),
+        "sumsq": np.dot(weighted, shifted),
+        "min": mins.min() if len(mins) else np.inf,
+        "max": maxs.max() if len(maxs) else -np.inf,
+        "histogram": np.bincount(bin_index, weights=weights, minlength=bins),
+        "seconds": np.bincount(bin_index, weights=durations, minlength=bins),
+    }
+
+
+def _merge(a, b):
+    if a is None:
+        return dict(b)
+    return {
+        "count": a["count"] + b["count"],
+        "sum": a["sum"] + b["sum"],
+        "sumsq": a["sumsq"] + b["sumsq"],
+        "min": min(a["min"], b["min"]),
+        "max": max(a["max"], b["max"]),
+        "histogram": a["histogram"] + b["histogram"],
+        "seconds": a["seconds"] + b["seconds"],
+    }
+
+
+def _finish(partial, metric, shift):
+    """Statistics of a merged partial."""
+    count = partial["count"]
+    if not count:
+        return None
+    mean = partial["sum"] / count
+    variance = (partial["sumsq"] - partial["sum"] * mean) / (count - 1) if count > 1 else 0.0
+    lo, scale, _ = HISTOGRAMS[metric]
+    cumulative = np.cumsum(partial["histogram"])
+    percentiles = {}
+    for p in PERCENTILES:
+        # Nearest rank, at the middle of its bin, within the exact min/max
+        rank = max(1.0, np.ceil(p / 100 * count))
+        index = int(np.searchsorted(cumulative, rank - 1e-9))
+        value = lo + (index + 0.5) / scale
+        percentiles[f"p{p}"] = float(min(max(value, partial["min"]), partial["max"]))
+    return {
+        "count": int(round(count)),
+        "mean": float(mean + shift),
+        "min": float(partial["min"]),
+        "max": float(partial["max"]),
+        "std": float(np.sqrt(max(variance, 0.0))),
+        **percentiles,
+        "band_readings": {
+            band: int(round(n)) for band, n in zip(BANDS, np.add.reduceat(partial["histogram"], _BAND_BINS[metric]))
+        },
+        "band_seconds": {
+            band: float(s) for band, s in zip(BANDS, np.add.reduceat(partial["seconds"], _BAND_BINS[metric]))
+        },
+    }
+
+
+def _aggregate(times, rows, columns, ranges, now, approximate):
+    """Shared by both entry points.
+
+    ``times``: sorted datetime64 array; ``rows``: readings at each position;
+    ``columns``: metric -> (values, weights, mins, maxs, durations) arrays
+    aligned with ``times``.
+    """
+    if ranges is None:
+        ranges = {"all": None}
+    # Every range starts at one of these positions and runs to the end of the data
+    starts = {
+        name: 0 if minutes is None else int(np.searchsorted(times, np.datetime64(now - timedelta(minutes=minutes))))
+        for name, minutes in ranges.items()
+    }
+    edges = sorted(set(starts.values())) + [len(times)]
+
+    result = {name: {"count": int(rows[start:].sum()), "approximate": approximate, "metrics": {}}
+              for name, start in starts.items()}
+    for metric, arrays in columns.items():
+        # Sums are taken around the first reading, which keeps the variance precise
+        values = arrays[0]
+        first_valid = np.argmax(~np.isnan(values)) if len(values) else 0
+        shift = 0.0 if not len(values) or np.isnan(values[first_valid]) else float(values[first_valid])
+        # One reduction per segment, newest first, merged into the suffix each range covers
+        merged = None
+        suffixes = {}
+        for first, last in reversed(list(zip(edges[:-1], edges[1:]))):
+            merged = _merge(merged, _partial(*(None if a is None else a[first:last] for a in arrays), metric, shift))
+            suffixes[first] = merged
+        for name, start in starts.items():
+            result[name]["metrics"][metric] = _finish(suffixes[start], metric, shift) if start in suffixes else None
+    return result
+
+
+def aggregate(df, ranges=None, now=None):
+    """Statistics of ``df`` for each ``{name: minutes}`` range ending at ``now`` (one scan).
+
+    Without ``ranges`` the whole frame is summarized as ``"all"``. Returns
+    ``{name: {"count", "approximate", "metrics": {metric: stats or None}}}``.
+    """
+    now = now or datetime.now()
+    if df.empty or "timestamp" not in df.columns:
+        return {name: {"count": 0, "approximate": False, "metrics": {}} for name in (ranges or {"all": None})}
+    if not df["timestamp"].is_monotonic_increasing:
+        df = df.sort_values("timestamp", kind="stable")
+    times = df["timestamp"].to_numpy(dtype="datetime64[ns]")
+
+    # Each reading lasts until the next one (capped); the newest one lasts a typical interval
+    gaps = np.diff(times).astype("timedelta64[ms]").astype(np.float64) / 1000
+    typical = float(np.median(gaps)) if len(gaps) else 0.0
+    durations = np.minimum(np.append(gaps, typical), MAX_GAP_SECONDS)
+
+    columns = {}
+    for metric in METRICS:
+        if metric in df.columns:
+            values = df[metric].to_numpy(dtype=np.float64, na_value=np.nan)
+            columns[metric] = (values, None, values, values, durations)
+    return _aggregate(times, np.ones(len(times)), columns, ranges, now, approximate=False)
+
+
+def aggregate_rollups(buckets, ranges=None, now=None):
+    """Like ``aggregate``, from 1-minute rollup buckets (``rollups.to_buckets`` records)."""
+    now = now or datetime.now()
+    if not buckets:
+        return {name: {"count": 0, "approximate": True, "metrics": {}} for name in (ranges or {"all": None})}
+    times = pd.to_datetime([bucket["bucket"] for bucket in buckets]).to_numpy(dtype="datetime64[ns]")
+    rows = np.array([bucket["count"] for bucket in buckets], dtype=np.float64)
+    durations = np.full(len(buckets), float(ROLLUP_BUCKET_SECONDS))
+
+    def column(key):
+        return np.array([np.nan if b.get(key) is None else b[key] for b in buckets], dtype=np.float64)
+
+    # Each bucket stands for its readings at their mean
+    columns = {}
+    for metric in METRICS:
+        if f"{metric}_mean" in buckets[0]:
+            columns[metric] = (column(f"{metric}_mean"), rows, column(f"{metric}_min"), column(f"{metric}_max"), durations)
+    return _aggregate(times, rows, columns, ranges, now, approximate=True)
+
+
+def summarize(df):
+    """Statistics of a whole frame (``aggregate`` with a single range)."""
+    return aggregate(df)["all"]
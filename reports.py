@@ -0,0 +1,482 @@
+"""Air quality reports: AQI, the text report and the PDF export.
+
+Shared by the dashboard and anything else that builds reports (e.g.
+benchmarks/bench_data_path.py); nothing here depends on Streamlit.
+"""
+import io
+from datetime import datetime
+
+import plotly.graph_objects as go
+from reportlab.lib import colors
+from reportlab.lib.enums import TA_CENTER
+from reportlab.lib.pagesizes import letter
+from reportlab.lib.styles import ParagraphStyle, getSampleStyleSheet
+from reportlab.lib.units import inch
+from reportlab.platypus import Image, PageBreak, Paragraph, SimpleDocTemplate, Spacer, Table, TableStyle
+
+from downsample import downsample
+from report_stats import BANDS, summarize
+from risk_engine import SENSOR_THRESHOLDS, bound, metric_levels
+
+# Chart payload limits: at most ~1 point per horizontal pixel per trace;
+# longer raw series are drawn with WebGL lines instead of SVG markers
+MAX_CHART_POINTS = 1000
+WEBGL_THRESHOLD = 1000
+DOWNSAMPLE_MODE = 'lttb'    # 'minmax' keeps every bucket's extremes
+
+# Report periods offered by the dashboard and /api/reports, in minutes
+REPORT_RANGES = {
+    "Last 30 Minutes": 30,
+    "Last 1 Hour": 60,
+    "Last 6 Hours": 360,
+    "Last 12 Hours": 720,
+    "Last 24 Hours": 1440
+}
+
+# AQI full scale: a metric scores 100 at these readings. This is the index's own
+# scale (unchanged since the first dashboard), not the risk_engine alert bounds
+AQI_FULL_SCALE = {'dust': 1500, 'tvoc': 1000, 'eco2': 2000}
+
+# Report names of the metrics; units and bands come from risk_engine.SENSOR_THRESHOLDS
+METRIC_LABELS = {'dust': 'PM2.5 Dust', 'temp': 'Temperature', 'tvoc': 'TVOC', 'eco2': 'eCO2'}
+
+# Text report marker for each band (see report_stats.BANDS)
+BAND_EMOJI = {'normal': '🟢', 'moderate': '🟠', 'high': '🟡', 'critical': '🔴'}
+
+
+def make_trace(x, y, mode='lines+markers', webgl=True, **kwargs):
+    # Downsample long series and switch them to Scattergl without markers
+    n = len(y)
+    if n > MAX_CHART_POINTS:
+        x, y = downsample(x, y, MAX_CHART_POINTS, DOWNSAMPLE_MODE)
+    if webgl and n > WEBGL_THRESHOLD:
+        kwargs.pop('marker', None)
+        return go.Scattergl(x=x, y=y, mode='lines', **kwargs)
+    return go.Scatter(x=x, y=y, mode=mode, **kwargs)
+
+
+def band(value, metric):
+    """Band name (report_stats.BANDS) of one value, by the risk engine's bounds."""
+    return BANDS[metric_levels([value], metric)[0]]
+
+
+def calculate_aqi(df):
+    if df.empty:
+        return 0, 'safe'
+    
+    latest = df.iloc[-1]
+    
+    # Normalized scoring (0-100 scale)
+    scores = []
+    
+    for metric, max_threshold in AQI_FULL_SCALE.items():
+        value = latest.get(metric, 0)
+        score = min((value / max_threshold) * 100, 100)
+        scores.append(score)
+    
+    aqi = sum(scores) / len(scores)
+    
+    if aqi < 30:
+        return aqi, 'safe'
+    elif aqi < 60:
+        return aqi, 'warning'
+    else:
+        return aqi, 'hazard'
+
+
+def _no_progress(fraction, stage):
+    pass
+
+
+def create_pdf_report(df_filtered, time_range_str, progress=None, stats=None):
+    # progress(fraction, stage), if given, is called as each part of the report is done.
+    # stats (report_stats.summarize of the readings) is computed here when not given;
+    # the charts are drawn from df_filtered, everything else comes from stats
+    progress = progress or _no_progress
+    stats = stats or summarize(df_filtered)
+
+    buffer = io.BytesIO()
+    
+    # Create PDF with ReportLab
+    pdf = SimpleDocTemplate(
+        buffer,
+        pagesize=letter,
+        rightMargin=0.75*inch,
+        leftMargin=0.75*inch,
+        topMargin=0.75*inch,
+        bottomMargin=0.75*inch
+    )
+    
+    # Container for PDF elements
+    elements = []
+    
+    # Define styles
+    styles = getSampleStyleSheet()
+    title_style = ParagraphStyle(
+        'CustomTitle',
+        parent=styles['Heading1'],
+        fontSize=24,
+        textColor=colors.HexColor('#1A1F29'),
+        spaceAfter=30,
+        alignment=TA_CENTER,
+        fontName='Helvetica-Bold'
+    )
+    
+    heading_style = ParagraphStyle(
+        'CustomHeading',
+        parent=styles['Heading2'],
+        fontSize=14,
+        textColor=colors.HexColor('#2C3E50'),
+        spaceAfter=12,
+        spaceBefore=12,
+        fontName='Helvetica-Bold'
+    )
+    
+    body_style = ParagraphStyle(
+        'CustomBody',
+        parent=styles['BodyText'],
+        fontSize=10,
+        textColor=colors.HexColor('#34495E'),
+        spaceAfter=6,
+        fontName='Helvetica'
+    )
+    
+    # Title
+    elements.append(Paragraph("AIRSIGHT SYSTEMS", title_style))
+    elements.append(Paragraph("Industrial Air Quality Monitoring Report", styles['Heading2']))
+    elements.append(Spacer(1, 0.3*inch))
+    
+    # Report metadata
+    metadata = [
+        ['Report Generated:', datetime.now().strftime('%Y-%m-%d %H:%M:%S')],
+        ['Monitoring Period:', time_range_str],
+        ['Total Data Points:', f"{stats['count']}" + (" (from 1-minute rollups)" if stats['approximate'] else "")],
+        ['System Status:', 'Operational']
+    ]
+    
+    metadata_table = Table(metadata, colWidths=[2*inch, 4*inch])
+    metadata_table.setStyle(TableStyle([
+        ('BACKGROUND', (0, 0), (0, -1), colors.HexColor('#E8E8E8')),
+        ('TEXTCOLOR', (0, 0), (-1, -1), colors.black),
+        ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
+        ('FONTNAME', (0, 0), (0, -1), 'Helvetica-Bold'),
+        ('FONTNAME', (1, 0), (1, -1), 'Helvetica'),
+        ('FONTSIZE', (0, 0), (-1, -1), 10),
+        ('BOTTOMPADDING', (0, 0), (-1, -1), 8),
+        ('GRID', (0, 0), (-1, -1), 0.5, colors.grey)
+    ]))
+    
+    elements.append(metadata_table)
+    elements.append(Spacer(1, 0.3*inch))
+    
+    # Export charts as images
+    if not df_filtered.empty:
+        progress(0.05, "emissions chart")
+        # Chart 1: Emissions Trend
+        fig1 = go.Figure()
+        fig1.add_trace(make_trace(
+            df_filtered['timestamp'],
+            df_filtered['dust'],
+            mode=None,
+            webgl=False,
+            name='PM2.5 Dust',
+            line=dict(color='#FF6B6B', width=2)
+        ))
+        fig1.add_trace(make_trace(
+            df_filtered['timestamp'],
+            df_filtered['tvoc'],
+            mode=None,
+            webgl=False,
+            name='TVOC',
+            line=dict(color='#4ECDC4', width=2),
+            yaxis='y2'
+        ))
+        fig1.update_layout(
+            title='Emissions Trend Over Time',
+            xaxis_title='Time',
+            yaxis_title='PM2.5 (µg/m³)',
+            yaxis2=dict(title='TVOC (ppb)', overlaying='y', side='right'),
+            height=300,
+            showlegend=True
+        )
+        
+        img1_bytes = fig1.to_image(format="png", width=700, height=300)
+        img1 = Image(io.BytesIO(img1_bytes), width=6.5*inch, height=2.5*inch)
+        elements.append(img1)
+        elements.append(Spacer(1, 0.2*inch))
+        progress(0.35, "thermal chart")
+        
+        # Chart 2: Temperature
+        fig2 = go.Figure()
+        fig2.add_trace(make_trace(
+            df_filtered['timestamp'],
+            df_filtered['temp'],
+            mode=None,
+            webgl=False,
+            fill='tozeroy',
+            fillcolor='rgba(255, 107, 107, 0.3)',
+            line=dict(color='#FF6B6B', width=2),
+            name='Temperature'
+        ))
+        fig2.add_hline(y=bound('temp', 'moderate'), line_dash="dash", line_color="orange", annotation_text="Warning Threshold")
+        fig2.update_layout(
+            title='Thermal Conditions',
+            xaxis_title='Time',
+            yaxis_title='Temperature (°C)',
+            height=250,
+            showlegend=False
+        )
+        
+        img2_bytes = fig2.to_image(format="png", width=700, height=250)
+        img2 = Image(io.BytesIO(img2_bytes), width=6.5*inch, height=2*inch)
+        elements.append(img2)
+        elements.append(Spacer(1, 0.2*inch))
+    
+    # Statistical Summary Table
+    progress(0.6, "statistics")
+    elements.append(Paragraph("Statistical Summary", heading_style))
+    
+    if stats['count']:
+        stats_data = [['Parameter', 'Average', 'Std Dev', 'P95', 'Maximum', 'Minimum', 'Status']]
+        
+        for col, param_name in METRIC_LABELS.items():
+            metric = stats['metrics'].get(col)
+            if metric:
+                stats_data.append([
+                    f"{param_name} ({SENSOR_THRESHOLDS[col]['unit']})",
+                    f"{metric['mean']:.2f}",
+                    f"{metric['std']:.2f}",
+                    f"{metric['p95']:.2f}",
+                    f"{metric['max']:.2f}",
+                    f"{metric['min']:.2f}",
+                    band(metric['max'], col).upper()
+                ])
+        
+        stats_table = Table(stats_data, colWidths=[1.9*inch] + [0.85*inch] * 6)
+        stats_table.setStyle(TableStyle([
+            ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#2C3E50')),
+            ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
+            ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
+            ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+            ('FONTSIZE', (0, 0), (-1, 0), 11),
+            ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
+            ('BACKGROUND', (0, 1), (-1, -1), colors.beige),
+            ('GRID', (0, 0), (-1, -1), 1, colors.black),
+            ('FONTSIZE', (0, 1), (-1, -1), 9),
+            ('TOPPADDING', (0, 1), (-1, -1), 8),
+            ('BOTTOMPADDING', (0, 1), (-1, -1), 8),
+        ]))
+        
+        elements.append(stats_table)
+        elements.append(Spacer(1, 0.3*inch))
+    
+    # Add page break before recommendations
+    elements.append(PageBreak())
+    
+    # AI Recommendations
+    elements.append(Paragraph("AI-Generated Analysis & Recommendations", heading_style))
+    
+    progress(0.7, "recommendations")
+    comprehensive_report = generate_comprehensive_report(df_filtered, time_range_str, stats)
+    
+    # Convert report to paragraphs
+    for line in comprehensive_report.split('\n'):
+        if line.strip():
+            if '=' * 10 in line:
+                elements.append(Spacer(1, 0.1*inch))
+            elif line.strip().startswith(('EXECUTIVE', 'STATISTICAL', 'AI-GENERATED', 'OVERALL', 'GENERAL')):
+                elements.append(Spacer(1, 0.15*inch))
+                elements.append(Paragraph(f"<b>{line.strip()}</b>", heading_style))
+            elif line.strip().startswith(('🔴', '🟡', '🟠', '🟢', '⚠️', '⚡', 'ℹ️', '✅')):
+                elements.append(Paragraph(f"<b>{line.strip()}</b>", body_style))
+            else:
+                elements.append(Paragraph(line.strip(), body_style))
+    
+    # Build PDF
+    progress(0.85, "rendering PDF")
+    pdf.build(elements)
+    buffer.seek(0)
+    progress(1.0, "done")
+    
+    return buffer
+
+
+def generate_comprehensive_report(df_filtered, time_range, stats=None):
+    # stats: report_stats.summarize(df_filtered), computed here when not given
+    stats = stats or summarize(df_filtered)
+    if not stats['count']:
+        return "No data available for the selected time range."
+    metrics = stats['metrics']
+    
+    report = []
+    
+    # Executive Summary
+    report.append("EXECUTIVE SUMMARY")
+    report.append("=" * 80)
+    report.append(f"Monitoring Period: {time_range}")
+    report.append(f"Total Readings Analyzed: {stats['count']}")
+    report.append(f"Data Collection Interval: Continuous (5-second intervals)")
+    if stats['approximate']:
+        report.append("Statistics: From 1-minute rollups (std dev, percentiles and time in bands are estimates)")
+    report.append("")
+    
+    # Statistical Overview
+    report.append("STATISTICAL OVERVIEW")
+    report.append("=" * 80)
+    
+    for col, param_name in METRIC_LABELS.items():
+        metric = metrics.get(col)
+        if metric:
+            unit = SENSOR_THRESHOLDS[col]['unit']
+            # Status from the worst reading, as in the PDF table
+            status = band(metric['max'], col)
+            
+            report.append(f"{BAND_EMOJI[status]} {param_name}:")
+            report.append(f"   Average: {metric['mean']:.2f} {unit} (std dev {metric['std']:.2f})")
+            report.append(f"   Maximum: {metric['max']:.2f} {unit}")
+            report.append(f"   Minimum: {metric['min']:.2f} {unit}")
+            report.append(f"   95th Percentile: {metric['p95']:.2f} {unit}")
+            total_seconds = sum(metric['band_seconds'].values())
+            if total_seconds:
+                shares = ", ".join(f"{band} {seconds / total_seconds:.1%}" for band, seconds in metric['band_seconds'].items())
+                report.append(f"   Time in Bands: {shares}")
+            report.append(f"   Status: {status.upper()}")
+            report.append("")
+    
+    # AI-Generated Recommendations
+    report.append("AI-GENERATED RECOMMENDATIONS")
+    report.append("=" * 80)
+    
+    # Recommendations follow the band of each average
+    dust_band, temp_band, tvoc_band, eco2_band = bands = [
+        band(metrics[col]['mean'], col) if metrics.get(col) else 'normal' for col in ('dust', 'temp', 'tvoc', 'eco2')
+    ]
+    
+    # Dust Analysis
+    if dust_band == 'critical':
+        report.append("🔴 CRITICAL - PARTICULATE MATTER (PM2.5)")
+        report.append("   • IMMEDIATE ACTION: Activate emergency air filtration systems")
+        report.append("   • Evacuate non-essential personnel from affected areas")
+        report.append("   • Contact environmental compliance officer")
+        report.append("   • Investigate source: Check industrial processes, HVAC systems")
+        report.append("   • Long-term: Install HEPA filtration units, seal dust sources")
+    elif dust_band == 'high':
+        report.append("🟡 HIGH - PARTICULATE MATTER (PM2.5)")
+        report.append("   • Increase ventilation rates by 30-50%")
+        report.append("   • Schedule deep cleaning of air ducts")
+        report.append("   • Monitor outdoor air quality - may be external source")
+        report.append("   • Consider upgrading air filters to MERV 13+")
+    elif dust_band == 'moderate':
+        report.append("🟠 MODERATE - PARTICULATE MATTER (PM2.5)")
+        report.append("   • Maintain current filtration protocols")
+        report.append("   • Regular filter replacement schedule recommended")
+        report.append("   • Monitor trends for any upward patterns")
+    else:
+        report.append("🟢 NORMAL - PARTICULATE MATTER (PM2.5)")
+        report.append("   • Air quality is within safe parameters")
+        report.append("   • Continue standard maintenance procedures")
+    report.append("")
+    
+    # Temperature Analysis
+    if temp_band == 'critical':
+        report.append("🔴 CRITICAL - THERMAL CONDITIONS")
+        report.append("   • IMMEDIATE: Reduce heat-generating processes")
+        report.append("   • Check HVAC system capacity and functionality")
+        report.append("   • Implement worker rotation schedules")
+        report.append("   • Provide cooling stations and hydration")
+    elif temp_band == 'high':
+        report.append("🟡 HIGH - THERMAL CONDITIONS")
+        report.append("   • Optimize HVAC settings for better cooling")
+        report.append("   • Ensure adequate air circulation")
+        report.append("   • Monitor equipment for heat generation")
+    elif temp_band == 'moderate':
+        report.append("🟠 MODERATE - THERMAL CONDITIONS")
+        report.append("   • Temperature approaching upper comfort limits")
+        report.append("   • Preventive: Service HVAC before peak periods")
+    else:
+        report.append("🟢 NORMAL - THERMAL CONDITIONS")
+        report.append("   • Temperature within optimal comfort zone")
+        report.append("   • Energy efficiency is likely optimal")
+    report.append("")
+    
+    # TVOC Analysis
+    if tvoc_band == 'critical':
+        report.append("🔴 CRITICAL - TOTAL VOLATILE ORGANIC COMPOUNDS (TVOC)")
+        report.append("   • IMMEDIATE: Identify VOC source (paints, solvents, chemicals)")
+        report.append("   • Maximize fresh air intake, open windows if safe")
+        report.append("   • Use activated carbon filtration")
+        report.append("   • Review chemical storage and handling procedures")
+    elif tvoc_band == 'high':
+        report.append("🟡 HIGH - TOTAL VOLATILE ORGANIC COMPOUNDS (TVOC)")
+        report.append("   • Increase outdoor air ventilation rates")
+        report.append("   • Audit recent activities: painting, cleaning, manufacturing")
+        report.append("   • Consider VOC-absorbing materials (plants, air purifiers)")
+    elif tvoc_band == 'moderate':
+        report.append("🟠 MODERATE - TOTAL VOLATILE ORGANIC COMPOUNDS (TVOC)")
+        report.append("   • Acceptable levels, but monitor trends")
+        report.append("   • Use low-VOC products when possible")
+    else:
+        report.append("🟢 NORMAL - TOTAL VOLATILE ORGANIC COMPOUNDS (TVOC)")
+        report.append("   • VOC levels are minimal and safe")
+        report.append("   • Current ventilation strategy is effective")
+    report.append("")
+    
+    # eCO2 Analysis
+    if eco2_band == 'critical':
+        report.append("🔴 CRITICAL - EQUIVALENT CO2 (eCO2)")
+        report.append("   • IMMEDIATE: Increase outdoor air exchange rate")
+        report.append("   • High occupancy detected - reduce density or stagger shifts")
+        report.append("   • Check HVAC for recirculation vs. fresh air ratio")
+        report.append("   • Symptoms: Drowsiness, headaches may occur")
+    elif eco2_band == 'high':
+        report.append("🟡 HIGH - EQUIVALENT CO2 (eCO2)")
+        report.append("   • Moderate ventilation improvement needed")
+        report.append("   • Optimize HVAC for better air turnover")
+        report.append("   • Consider occupancy-based ventilation controls")
+    elif eco2_band == 'moderate':
+        report.append("🟠 MODERATE - EQUIVALENT CO2 (eCO2)")
+        report.append("   • Slightly elevated, typical of occupied spaces")
+        report.append("   • Ensure HVAC is functioning per design specifications")
+    else:
+        report.append("🟢 NORMAL - EQUIVALENT CO2 (eCO2)")
+        report.append("   • Excellent ventilation, fresh air circulation optimal")
+        report.append("   • Indoor air quality is superior")
+    report.append("")
+    
+    # Overall System Health
+    report.append("OVERALL SYSTEM HEALTH ASSESSMENT")
+    report.append("=" * 80)
+    
+    critical_count = bands.count('critical')
+    
+    if critical_count > 0:
+        report.append(f"⚠️ SYSTEM STATUS: CRITICAL ({critical_count} parameter(s) in danger zone)")
+        report.append("PRIORITY: IMMEDIATE INTERVENTION REQUIRED")
+    elif 'high' in bands:
+        report.append("⚡ SYSTEM STATUS: WARNING (Proactive measures recommended)")
+        report.append("PRIORITY: SCHEDULE CORRECTIVE ACTIONS WITHIN 24 HOURS")
+    elif 'moderate' in bands:
+        report.append("ℹ️ SYSTEM STATUS: MODERATE (Monitoring advised)")
+        report.append("PRIORITY: ROUTINE MAINTENANCE AND OBSERVATION")
+    else:
+        report.append("✅ SYSTEM STATUS: OPTIMAL (All parameters within safe limits)")
+        report.append("PRIORITY: MAINTAIN CURRENT PROTOCOLS")
+    
+    report.append("")
+    report.append("GENERAL RECOMMENDATIONS FOR AIR QUALITY IMPROVEMENT")
+    report.append("=" * 80)
+    report.append("1. Regular HVAC Maintenance: Clean filters monthly, service systems quarterly")
+    report.append("2. Source Control: Minimize pollutant generation at the source")
+    report.append("3. Ventilation Strategy: Ensure adequate fresh air intake (ASHRAE standards)")
+    report.append("4. Air Purification: Consider HEPA + activated carbon filtration")
+    report.append("5. Monitoring: Continue real-time tracking and trend analysis")
+    report.append("6. Occupant Education: Train staff on air quality impact and best practices")
+    report.append("7. Green Solutions: Introduce air-purifying plants, eco-friendly materials")
+    report.append("8. Building Envelope: Seal leaks, improve insulation to prevent infiltration")
+    report.append("")
+    report.append("=" * 80)
+    report.append(f"Report Generated: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
+    report.append("AirSight Systems - Industrial Emissions Monitoring Platform")
+    report.append("=" * 80)
+    
+    return "\n".join(report)
@@ -0,0 +1,99 @@
+"""Fixed-capacity ring buffer of recent sensor readings.
+
+Backed by a preallocated list of slots: appending overwrites the oldest slot
+in O(1) and reading the newest ``k`` readings is O(k), so the dashboard's
+latest/recent endpoints never touch the disk.
+
+Readings are kept in timestamp order, not arrival order. A late reading (older
+than the newest one held) is inserted at its place, shifting the newer ones
+along; that costs O(log n) plus one slot per newer reading. A late reading
+older than everything in a full buffer is not kept.
+"""
+import threading
+
+
+class SensorRingBuffer:
+    """Thread-safe ring buffer holding the most recent readings."""
+
+    def __init__(self, capacity=5000):
+        if capacity <= 0:
+            raise ValueError("capacity must be positive")
+        self.capacity = capacity
+        self._slots = [None] * capacity
+        self._next = 0      # slot the next reading goes into
+        self._size = 0
+        self.total = 0      # readings ever appended; doubles as a data version
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return self._size
+
+    def append(self, entry):
+        with self._lock:
+            self._append(entry)
+
+    def extend(self, entries):
+        with self._lock:
+            for entry in entries:
+                self._append(entry)
+
+    def _append(self, entry):
+        if self._size and entry["timestamp"] < self._slots[self._next - 1]["timestamp"]:
+            self._insert_late(entry)
+            return
+        self._slots[self._next] = entry
+        self._next = (self._next + 1) % self.capacity
+        if self._size < self.capacity:
+            self._size += 1
+        self.total += 1
+
+    def _insert_late(self, entry):
+        capacity, first = self.capacity, self._next - self._size
+        # Readings up to position ``lo`` are no newer than the entry
+        lo, hi = 0, self._size
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self._slots[(first + mid) % capacity]["timestamp"] <= entry["timestamp"]:
+                lo = mid + 1
+            else:
+                hi = mid
+        self.total += 1
+        if lo == 0 and self._size == capacity:
+            return
+        # Move the newer readings up one slot; when full, the newest takes the oldest's slot
+        for i in range(self._size, lo, -1):
+            self._slots[(first + i) % capacity] = self._slots[(first + i - 1) % capacity]
+        self._slots[(first + lo) % capacity] = entry
+        self._next = (self._next + 1) % capacity
+        if self._size < capacity:
+            self._size += 1
+
+    def oldest(self):
+        """Oldest reading still held, or None when empty."""
+        with self._lock:
+            if self._size == 0:
+                return None
+            return self._slots[(self._next - self._size) % self.capacity]
+
+    def latest(self):
+        """Newest reading, or None when empty."""
+        with self._lock:
+            if self._size == 0:
+                return None
+            return self._slots[self._next - 1]
+
+    def last(self, k):
+        """Up to ``k`` newest readings, oldest first."""
+        with self._lock:
+            k = max(0, min(k, self._size))
+            start = (self._next - k) % self.capacity
+            if start + k <= self.capacity:
+                return self._slots[start:start + k]
+            return self._slots[start:] + self._slots[:self._next]
+
+    def clear(self):
+        with self._lock:
+            self._slots = [None] * self.capacity
+            self._next = 0
+            self._size = 0
+            self.total += 1
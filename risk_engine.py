@@ -0,0 +1,156 @@
+"""Vectorized risk classification shared by the backend and the dashboard.
+
+One declarative table (``SENSOR_THRESHOLDS``) defines, per metric, the
+bounds above which a reading is moderate, high or critical, and the alert
+shown for each level. It is compiled into NumPy arrays once. Whole columns
+of readings are then classified with ``searchsorted`` and table lookups, with
+no Python loop per reading:
+
+* per-metric level 0-3 (0 = within limits)
+* risk score = sum of levels -> "Low" / "Moderate" / "High" / "Critical"
+* alert text, looked up from the combination of levels
+
+The dashboard's safe / warning / hazard status is derived from the same
+levels (0 -> safe, 1-2 -> warning, 3 -> hazard).
+
+Re-score a stored log with:
+    python risk_engine.py --rescore [output.csv]
+"""
+import sys
+from itertools import product
+
+import numpy as np
+
+SENSOR_THRESHOLDS = {
+    "dust": {
+        "unit": "µg/m³",
+        "bounds": (200, 500, 1000),
+        "alerts": ("🟡 Moderate dust levels",
+                   "🟠 High dust levels detected",
+                   "⚠️ CRITICAL: Very high dust concentration!"),
+    },
+    "temp": {
+        "unit": "°C",
+        "bounds": (30, 35, 40),
+        "alerts": ("🟡 Elevated temperature",
+                   "🟠 High temperature detected",
+                   "⚠️ CRITICAL: Temperature too high!"),
+    },
+    "tvoc": {
+        "unit": "ppb",
+        "bounds": (100, 250, 500),
+        "alerts": ("🟡 Moderate TVOC levels",
+                   "🟠 High TVOC detected",
+                   "⚠️ CRITICAL: Very high TVOC levels!"),
+    },
+    "eco2": {
+        "unit": "ppm",
+        "bounds": (600, 800, 1000),
+        "alerts": ("🟡 Moderate CO2 levels",
+                   "🟠 High CO2 detected",
+                   "⚠️ CRITICAL: Very high CO2 levels!"),
+    },
+}
+
+# Minimum total score for each risk level after "Low"
+RISK_LEVELS = ["Low", "Moderate", "High", "Critical"]
+RISK_SCORE_CUTOFFS = (2, 5, 8)
+LOW_RISK_ALERT = "✅ Air quality is good"
+
+# Dashboard status per metric level
+STATUS_BY_LEVEL = np.array(["safe", "warning", "warning", "hazard"])
+
+METRICS = list(SENSOR_THRESHOLDS)
+_BOUNDS = {metric: np.asarray(spec["bounds"], dtype=np.float64) for metric, spec in SENSOR_THRESHOLDS.items()}
+_RISK_NAMES = np.array(RISK_LEVELS, dtype=object)
+_CUTOFFS = np.asarray(RISK_SCORE_CUTOFFS)
+
+
+def _compile_alerts():
+    """Alert text for every combination of metric levels (4 ** len(METRICS) entries)."""
+    table = np.empty(4 ** len(METRICS), dtype=object)
+    for levels in product(range(4), repeat=len(METRICS)):
+        code = sum(level * 4 ** i for i, level in enumerate(levels))
+        score = sum(levels)
+        if score < RISK_SCORE_CUTOFFS[0]:
+            table[code] = LOW_RISK_ALERT
+            continue
+        table[code] = " | ".join(
+            SENSOR_THRESHOLDS[metric]["alerts"][level - 1]
+            for metric, level in zip(METRICS, levels) if level
+        )
+    return table
+
+
+_ALERTS = _compile_alerts()
+
+
+def metric_levels(values, metric):
+    """Level 0-3 of every value for one metric (missing values count as 0)."""
+    values = np.asarray(values, dtype=np.float64)
+    levels = np.searchsorted(_BOUNDS[metric], values, side="left")
+    return np.where(np.isnan(values), 0, levels).astype(np.int8)
+
+
+def classify_arrays(dust, temp, tvoc, eco2):
+    """Classify columns of readings; returns ``(risk, alert, score)`` arrays."""
+    levels = [metric_levels(v, m) for v, m in zip((dust, temp, tvoc, eco2), METRICS)]
+    score = np.zeros(len(levels[0]), dtype=np.int8)
+    code = np.zeros(len(levels[0]), dtype=np.int16)
+    for i, level in enumerate(levels):
+        score += level
+        code += level.astype(np.int16) * 4 ** i
+    risk = _RISK_NAMES[np.searchsorted(_CUTOFFS, score, side="right")]
+    return risk, _ALERTS[code], score
+
+
+def classify_entries(entries):
+    """``[(risk, alert), ...]`` for a list of reading dicts."""
+    if not entries:
+        return []
+    columns = [[entry[metric] for entry in entries] for metric in METRICS]
+    risk, alert, _ = classify_arrays(*columns)
+    return list(zip(risk.tolist(), alert.tolist()))
+
+
+def classify_frame(df):
+    """Copy of ``df`` with ``risk`` and ``alert`` recomputed from its metric columns."""
+    df = df.copy()
+    if df.empty:
+        df["risk"] = []
+        df["alert"] = []
+        return df
+    risk, alert, _ = classify_arrays(*(df[metric].to_numpy(dtype=np.float64, na_value=np.nan) for metric in METRICS))
+    df["risk"] = risk
+    df["alert"] = alert
+    return df
+
+
+def safety_status(values, metric):
+    """Dashboard status ("safe" / "warning" / "hazard") for one or many values."""
+    if np.ndim(values) == 0:
+        return str(STATUS_BY_LEVEL[metric_levels([values], metric)[0]])
+    return STATUS_BY_LEVEL[metric_levels(values, metric)]
+
+
+def bound(metric, level):
+    """Lower bound of a metric level ("moderate", "high" or "critical")."""
+    return SENSOR_THRESHOLDS[metric]["bounds"][("moderate", "high", "critical").index(level)]
+
+
+if __name__ == "__main__":
+    if "--rescore" in sys.argv:
+        from storage import open_store
+        args = [arg for arg in sys.argv[1:] if arg != "--rescore"]
+        store = open_store()
+        frame = store.read_sensor_frame()
+        rescored = classify_frame(frame)
+        changed = int((rescored["risk"] != frame.get("risk")).sum()) if "risk" in frame else len(frame)
+        print(f"{len(frame)} readings re-scored, {changed} with a different risk level")
+        print(rescored["risk"].value_counts().to_string())
+        if args:
+            rescored.to_csv(args[0], index=False)
+            print(f"Written to {args[0]}")
+        store.close()
+    else:
+        print(__doc__)
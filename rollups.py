@@ -0,0 +1,193 @@
+"""Incrementally maintained rollups of sensor metrics.
+
+For every resolution (1 minute, 1 hour, 1 day) and metric (dust, temp, tvoc,
+eco2) the aggregator keeps count, sum, min, max and last value per time
+bucket. Rollup rows are *partials*: the same bucket may be written more than
+once (late readings, periodic flushes, restarts) and partials are merged when
+stored (SQLite upsert) or when read (CSV).
+
+Rebuild the rollups of every zone from the raw logs with:
+    python rollups.py --rebuild
+"""
+import math
+import sys
+import threading
+
+RESOLUTIONS = {"1m": 60, "1h": 3600, "1d": 86400}
+METRICS = ["dust", "temp", "tvoc", "eco2"]
+ROLLUP_COLUMNS = ["resolution", "bucket", "metric", "count", "sum", "min", "max", "last", "last_ts"]
+
+
+def bucket_start(timestamp, resolution):
+    """Bucket key for a "%Y-%m-%d %H:%M:%S" timestamp (fixed-width slicing)."""
+    if resolution == "1m":
+        return timestamp[:16] + ":00"
+    if resolution == "1h":
+        return timestamp[:13] + ":00:00"
+    if resolution == "1d":
+        return timestamp[:10] + " 00:00:00"
+    raise ValueError(f"Unknown resolution: {resolution}")
+
+
+def merge_partials(rows):
+    """Merge partial rollup rows that share (resolution, bucket, metric)."""
+    merged = {}
+    for row in rows:
+        key = (row["resolution"], row["bucket"], row["metric"])
+        current = merged.get(key)
+        if current is None:
+            merged[key] = dict(row)
+            continue
+        current["count"] += row["count"]
+        current["sum"] += row["sum"]
+        current["min"] = min(current["min"], row["min"])
+        current["max"] = max(current["max"], row["max"])
+        if row["last_ts"] >= current["last_ts"]:
+            current["last"] = row["last"]
+            current["last_ts"] = row["last_ts"]
+    return list(merged.values())
+
+
+def to_buckets(rows, metrics=None):
+    """Pivot merged rollup rows into one flat record per bucket.
+
+    Each record has ``bucket``, ``count`` and ``<metric>_mean/_min/_max/_last``
+    (plus ``<metric>_sum`` for re-aggregation), ordered by bucket.
+    """
+    metrics = metrics or METRICS
+    buckets = {}
+    for row in merge_partials(rows):
+        if row["metric"] not in metrics:
+            continue
+        record = buckets.setdefault(row["bucket"], {"bucket": row["bucket"], "count": 0})
+        metric = row["metric"]
+        record["count"] = max(record["count"], row["count"])
+        record[f"{metric}_mean"] = row["sum"] / row["count"] if row["count"] else None
+        record[f"{metric}_sum"] = row["sum"]
+        record[f"{metric}_min"] = row["min"]
+        record[f"{metric}_max"] = row["max"]
+        record[f"{metric}_last"] = row["last"]
+    return [buckets[key] for key in sorted(buckets)]
+
+
+class RollupAggregator:
+    """Accumulates readings into open buckets and emits partial rows.
+
+    Only the newest bucket of each resolution stays open. Whenever a new
+    minute starts, every open bucket is emitted as a partial and reset, so at
+    most one minute of aggregates lives only in memory.
+    """
+
+    def __init__(self, resolutions=None, metrics=None):
+        self.resolutions = list(resolutions or RESOLUTIONS)
+        self.metrics = list(metrics or METRICS)
+        self._open = {res: {} for res in self.resolutions}
+        self._current_minute = None
+        self._lock = threading.Lock()
+
+    def add(self, entries):
+        """Fold readings into the open buckets; returns partial rows to persist."""
+        emitted = []
+        with self._lock:
+            for entry in entries:
+                timestamp = entry["timestamp"]
+                minute = timestamp[:16]
+                if self._current_minute is None or minute > self._current_minute:
+                    if self._current_minute is not None:
+                        emitted.extend(self._drain())
+                    self._current_minute = minute
+
+                for res in self.resolutions:
+                    bucket = self._open[res].setdefault(bucket_start(timestamp, res), {})
+                    for metric in self.metrics:
+                        value = entry.get(metric)
+                        # A NaN would poison the bucket's sum (and SQLite stores it as NULL)
+                        if value is None or not math.isfinite(value):
+                            continue
+                        stats = bucket.get(metric)
+                        if stats is None:
+                            bucket[metric] = [1, value, value, value, value, timestamp]
+                            continue
+                        stats[0] += 1
+                        stats[1] += value
+                        if value < stats[2]:
+                            stats[2] = value
+                        if value > stats[3]:
+                            stats[3] = value
+                        if timestamp >= stats[5]:
+                            stats[4] = value
+                            stats[5] = timestamp
+
+            # Late readings for older minutes are emitted straight away
+            for res in self.resolutions:
+                current = bucket_start(self._current_minute + ":00", res) if self._current_minute else None
+                for bucket in [b for b in self._open[res] if b != current]:
+                    emitted.extend(self._rows(res, bucket, self._open[res].pop(bucket)))
+        return emitted
+
+    def drain(self):
+        """Emit and reset every open bucket (shutdown / periodic flush)."""
+        with self._lock:
+            return self._drain()
+
+    def open_rows(self, resolution):
+        """Partial rows of the still-open buckets, for merging into queries."""
+        with self._lock:
+            rows = []
+            for bucket, metrics in self._open.get(resolution, {}).items():
+                rows.extend(self._rows(resolution, bucket, metrics))
+            return rows
+
+    def _drain(self):
+        rows = []
+        for res in self.resolutions:
+            for bucket, metrics in self._open[res].items():
+                rows.extend(self._rows(res, bucket, metrics))
+            self._open[res] = {}
+        return rows
+
+    @staticmethod
+    def _rows(resolution, bucket, metrics):
+        return [
+            {
+                "resolution": resolution,
+                "bucket": bucket,
+                "metric": metric,
+                "count": stats[0],
+                "sum": stats[1],
+                "min": stats[2],
+                "max": stats[3],
+                "last": stats[4],
+                "last_ts": stats[5],
+            }
+            for metric, stats in metrics.items()
+        ]
+
+
+def rebuild(store, chunk_size=50000):
+    """Recompute all rollups from the raw sensor log."""
+    store.clear_rollups()
+    aggregator = RollupAggregator()
+    batch = []
+    for record, _ in store.iter_sensor(fields=["timestamp"] + METRICS, limit=sys.maxsize):
+        batch.append(record)
+        if len(batch) >= chunk_size:
+            store.append_rollups(aggregator.add(batch))
+            batch = []
+    store.append_rollups(aggregator.add(batch) + aggregator.drain())
+
+
+if __name__ == "__main__":
+    if "--rebuild" in sys.argv:
+        from partitions import PartitionedSensorLog
+        from storage import open_store
+        store = open_store()
+        # The default store and every zone store under data/zones/
+        sensor_log = PartitionedSensorLog(store, ring_capacity=1)
+        for zone in sensor_log.zones():
+            rebuild(sensor_log.partition(zone).store)
+            print(f"Rollups rebuilt: {zone}")
+        sensor_log.close()
+        store.close()
+    else:
+        print(__doc__)
@@ -0,0 +1,75 @@
+"""Production entry point: several worker processes behind one port.
+
+    python serve.py [--bind 0.0.0.0:5000] [--workers N] [--threads N]
+
+Starts the storage process (storage_server.py) first, then gunicorn workers
+that import app.py with ``AIRSIGHT_STORAGE_SERVER`` pointing at it. Only the
+storage process writes to the stores and holds the ring buffers, rollups,
+control state and event history, so every worker answers with the same
+data. Workers use threads so /api/stream clients don't pin whole processes.
+
+``python app.py`` remains the single-process development server.
+Requires gunicorn (POSIX only).
+"""
+import argparse
+import multiprocessing
+import os
+
+from gunicorn.app.base import BaseApplication
+
+import storage_server
+
+
+class AirSightServer(BaseApplication):
+    """gunicorn application that owns the storage process."""
+
+    def __init__(self, options):
+        self.options = options
+        self.storage = None
+        super().__init__()
+
+    def load_config(self):
+        for key, value in self.options.items():
+            self.cfg.set(key, value)
+        self.cfg.set("on_starting", self.start_storage)
+        self.cfg.set("on_exit", self.stop_storage)
+
+    def load(self):
+        # Runs in each worker after the fork, once the storage process is up
+        from app import app
+        return app
+
+    def start_storage(self, arbiter):
+        authkey = os.urandom(16).hex()
+        address = os.environ.get("AIRSIGHT_STORAGE_ADDRESS", "127.0.0.1:0")
+        self.storage, listening = storage_server.start(address, authkey)
+        os.environ["AIRSIGHT_STORAGE_SERVER"] = listening
+        os.environ["AIRSIGHT_STORAGE_AUTHKEY"] = authkey
+        arbiter.log.info("Storage process %s listening on %s", self.storage.pid, listening)
+
+    def stop_storage(self, arbiter):
+        if self.storage is not None:
+            # Workers are gone; the storage process flushes and closes the stores on SIGTERM
+            self.storage.terminate()
+            self.storage.wait(timeout=30)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run the AirSight backend with several workers")
+    parser.add_argument("--bind", default=os.environ.get("AIRSIGHT_BIND", "0.0.0.0:5000"))
+    parser.add_argument("--workers", type=int,
+                        default=int(os.environ.get("AIRSIGHT_WORKERS", multiprocessing.cpu_count())))
+    parser.add_argument("--threads", type=int, default=int(os.environ.get("AIRSIGHT_THREADS", "8")))
+    args = parser.parse_args()
+
+    AirSightServer({
+        "bind": args.bind,
+        "workers": args.workers,
+        "threads": args.threads,
+        "worker_class": "gthread",
+        "accesslog": None,
+    }).run()
+
+
+if __name__ == "__main__":
+    main()
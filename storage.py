@@ -0,0 +1,829 @@
+"""Storage backends for sensor readings, control actions and outdoor data.
+
+Two interchangeable backends are provided:
+
+* ``SqliteStore`` (default) - a single SQLite database in WAL mode with
+  indexed timestamp/device columns. Latest and last-N queries walk the index
+  from the end, so their cost does not grow with the size of the log.
+* ``CsvStore`` - the original append-only CSV files in ``data/``. Tail reads
+  seek from the end of the file instead of parsing the whole log; range
+  reads use a per-file index of block key ranges (``BlockIndex``).
+
+Select the backend with the ``AIRSIGHT_STORAGE`` environment variable
+(``sqlite`` or ``csv``).
+"""
+import base64
+import bisect
+import csv
+import io
+import os
+import sqlite3
+import threading
+
+import pandas as pd
+
+from metrics import REGISTRY
+from rollups import ROLLUP_COLUMNS, merge_partials
+
+DATA_DIR = os.environ.get("AIRSIGHT_DATA_DIR", "data")
+STORAGE_BACKEND = os.environ.get("AIRSIGHT_STORAGE", "sqlite")
+
+SENSOR_COLUMNS = ["timestamp", "device_id", "dust", "temp", "tvoc", "eco2", "risk", "alert"]
+CONTROL_COLUMNS = ["timestamp", "device", "state", "reason"]
+OUTDOOR_COLUMNS = ["timestamp", "location", "pm2_5", "pm10", "risk", "alert"]
+
+WRITE_SECONDS = REGISTRY.histogram(
+    "airsight_storage_write_seconds", "Time to write one group of records", ("backend", "kind"))
+BYTES_WRITTEN = REGISTRY.counter(
+    "airsight_storage_bytes_written_total",
+    "Bytes written to the store (CSV: file bytes, SQLite: row payload bytes)", ("backend", "kind"))
+RECORDS_WRITTEN = REGISTRY.counter(
+    "airsight_storage_records_written_total", "Records written to the store", ("backend", "kind"))
+READ_SECONDS = REGISTRY.histogram(
+    "airsight_storage_read_seconds", "Time to load sensor history into a DataFrame", ("backend", "op"))
+
+
+def open_store(backend=None, data_dir=None):
+    """Create the configured storage backend."""
+    backend = backend or STORAGE_BACKEND
+    data_dir = data_dir or DATA_DIR
+    os.makedirs(data_dir, exist_ok=True)
+
+    if backend == "sqlite":
+        return SqliteStore(os.path.join(data_dir, "airsight.db"), data_dir=data_dir)
+    if backend == "csv":
+        return CsvStore(data_dir)
+    raise ValueError(f"Unknown storage backend: {backend}")
+
+
+def encode_cursor(value):
+    """Opaque pagination cursor for a backend-specific position."""
+    return base64.urlsafe_b64encode(str(value).encode("utf-8")).decode("ascii")
+
+
+def decode_cursor(token):
+    try:
+        return base64.urlsafe_b64decode(token.encode("ascii")).decode("utf-8")
+    except (ValueError, UnicodeError):
+        raise ValueError("Invalid cursor")
+
+
+def _check_fields(fields):
+    fields = list(fields or SENSOR_COLUMNS)
+    unknown = [f for f in fields if f not in SENSOR_COLUMNS]
+    if unknown:
+        raise ValueError(f"Unknown fields: {', '.join(unknown)}")
+    return fields
+
+
+def _clean_records(df):
+    """Convert a frame to JSON-friendly records (NaN -> None)."""
+    df = df.astype(object).where(pd.notna(df), None)
+    return df.to_dict(orient="records")
+
+
+# CSV BACKEND
+
+class CsvStore:
+    """Append-only CSV logs, one file per record type."""
+
+    name = "csv"
+
+    def __init__(self, data_dir=DATA_DIR):
+        # Absolute, so a later chdir can't redirect writes (e.g. flushes at exit)
+        data_dir = os.path.abspath(data_dir)
+        self.data_dir = data_dir
+        self.sensor_path = os.path.join(data_dir, "sensor_log.csv")
+        self.control_path = os.path.join(data_dir, "control_log.csv")
+        self.outdoor_path = os.path.join(data_dir, "realtime_log.csv")
+        self._lock = threading.Lock()
+        self._headers = {}      # path -> ((st_dev, st_ino), columns) of the file last appended to
+        self._indexes = {}      # path -> BlockIndex of the file last read
+        self._index_lock = threading.Lock()
+
+    def _rollup_path(self, resolution):
+        return os.path.join(self.data_dir, f"rollup_{resolution}.csv")
+
+    # Writes
+
+    def append_sensor(self, entries, fsync=False):
+        return self._append("sensor", self.sensor_path, entries, SENSOR_COLUMNS, fsync)
+
+    def append_control(self, actions, fsync=False):
+        return self._append("control", self.control_path, actions, CONTROL_COLUMNS, fsync)
+
+    def append_outdoor(self, entries, fsync=False):
+        return self._append("outdoor", self.outdoor_path, entries, OUTDOOR_COLUMNS, fsync)
+
+    def append_rollups(self, rows, fsync=False):
+        """Append partial rollup rows, one file per resolution."""
+        by_resolution = {}
+        for row in rows:
+            by_resolution.setdefault(row["resolution"], []).append(row)
+        for resolution, group in by_resolution.items():
+            self._append("rollup", self._rollup_path(resolution), group, ROLLUP_COLUMNS, fsync)
+        return len(rows)
+
+    def clear_rollups(self):
+        with self._lock:
+            for name in os.listdir(self.data_dir):
+                if name.startswith("rollup_") and name.endswith(".csv"):
+                    os.remove(os.path.join(self.data_dir, name))
+                    self._headers.pop(os.path.join(self.data_dir, name), None)
+        with self._index_lock:
+            for path in [path for path in self._indexes if path != self.sensor_path]:
+                del self._indexes[path]
+
+    def _append(self, kind, file_path, rows, columns, fsync):
+        if not rows:
+            return 0
+
+        with self._lock, WRITE_SECONDS.time(backend=self.name, kind=kind), open(file_path, "ab") as f:
+            # Keep the column layout of an existing file (older logs have no device_id)
+            existing = self._header(file_path, os.fstat(f.fileno()))
+            buffer = io.StringIO()
+            out = csv.writer(buffer, lineterminator="\n")
+            if existing is None:
+                out.writerow(columns)
+            out.writerows([_csv_value(row.get(col)) for col in existing or columns] for row in rows)
+            payload = buffer.getvalue().encode("utf-8")
+
+            f.write(payload)
+            if fsync:
+                f.flush()
+                os.fsync(f.fileno())
+            if existing is None:
+                self._headers[file_path] = (_file_id(os.fstat(f.fileno())), columns)
+        BYTES_WRITTEN.inc(len(payload), backend=self.name, kind=kind)
+        RECORDS_WRITTEN.inc(len(rows), backend=self.name, kind=kind)
+        return len(rows)
+
+    def _header(self, file_path, stat):
+        """Columns of the file being appended to (None while it is empty), cached per file."""
+        if stat.st_size == 0:
+            return None
+        cached = self._headers.get(file_path)
+        if cached is not None and cached[0] == _file_id(stat):
+            return cached[1]
+        # First append, or the file was replaced (e.g. rotated) since
+        columns = _read_header(file_path)
+        self._headers[file_path] = (_file_id(stat), columns)
+        return columns
+
+    # Reads
+
+    def latest_sensor(self):
+        records = self.recent_sensor(1)
+        return records[-1] if records else None
+
+    def recent_sensor(self, n=100):
+        return _clean_records(_read_csv_tail(self.sensor_path, n))
+
+    def recent_control(self, n=50):
+        return _clean_records(_read_csv_tail(self.control_path, n))
+
+    def iter_sensor(self, start=None, end=None, cursor=None, fields=None, limit=1000):
+        """Yield ``(record, cursor)`` for readings in ``[start, end]``, in file order.
+
+        Device timestamps are kept, so a buffered batch lands after newer
+        rows; only the blocks of the file's ``BlockIndex`` whose timestamp
+        range overlaps ``[start, end]`` are read. The cursor is the offset of
+        the next line.
+        """
+        fields = _check_fields(fields)
+        if not os.path.exists(self.sensor_path):
+            return
+
+        with open(self.sensor_path, "rb") as f:
+            index = self._index(self.sensor_path, f, "timestamp")
+            if index is None:
+                return
+            if cursor is not None:
+                offset = int(decode_cursor(cursor))
+                if not index.data_start <= offset <= index.indexed_end:
+                    raise ValueError("Invalid cursor")
+            else:
+                offset = index.data_start
+
+            count = 0
+            for row, offset in _scan_blocks(f, index, start, end, offset):
+                if count == limit:
+                    break
+                values = dict(zip(index.columns, row))
+                yield {field: _convert(field, values.get(field)) for field in fields}, encode_cursor(offset)
+                count += 1
+
+    def query_rollups(self, resolution, start=None, end=None):
+        """Merged rollup rows for buckets in ``[start, end]``.
+
+        Late partials for a bucket are appended after newer ones; the block
+        index keeps track of where they are, so every block that holds a
+        bucket in range is read.
+        """
+        file_path = self._rollup_path(resolution)
+        if not os.path.exists(file_path):
+            return []
+
+        rows = []
+        with open(file_path, "rb") as f:
+            index = self._index(file_path, f, "bucket")
+            if index is None:
+                return []
+            for row, _ in _scan_blocks(f, index, start, end, index.data_start):
+                record = dict(zip(index.columns, row))
+                record["count"] = int(record["count"])
+                for key in ("sum", "min", "max", "last"):
+                    record[key] = float(record[key])
+                rows.append(record)
+        return sorted(merge_partials(rows), key=lambda r: (r["bucket"], r["metric"]))
+
+    def _index(self, file_path, f, key):
+        """The file's ``BlockIndex`` on ``key``, brought up to date with what has been appended."""
+        with self._index_lock:
+            index = self._indexes.get(file_path)
+            if index is None or not index.valid_for(f):
+                index = BlockIndex.open(f, key)
+                if index is None:
+                    self._indexes.pop(file_path, None)
+                    return None
+                self._indexes[file_path] = index
+            index.extend(f)
+            return index
+
+    def read_sensor_frame(self):
+        """Full sensor history as a DataFrame (dashboard/report use)."""
+        if not os.path.exists(self.sensor_path):
+            return pd.DataFrame()
+        with READ_SECONDS.time(backend=self.name, op="frame"):
+            return pd.read_csv(self.sensor_path)
+
+    def read_sensor_increment(self, cursor=None):
+        """Rows appended since ``cursor`` as ``(frame, cursor, reset)``.
+
+        The cursor records the file identity, header and byte offset of the
+        last complete line read. A different inode, a different header or a
+        file shorter than the offset (rotation/truncation) resets to a full read.
+        """
+        if not os.path.exists(self.sensor_path):
+            return pd.DataFrame(), None, True
+
+        stat = os.stat(self.sensor_path)
+        identity = (stat.st_dev, stat.st_ino)
+        with open(self.sensor_path, "rb") as f:
+            header = f.readline()
+            reset = (
+                cursor is None
+                or cursor[0] != identity
+                or cursor[1] != header
+                or stat.st_size < cursor[2]
+            )
+            offset = f.tell() if reset else cursor[2]
+            f.seek(offset)
+            data = f.read(max(0, stat.st_size - offset))
+
+        # A partially written last line is picked up on the next call
+        data = data[:data.rfind(b"\n") + 1]
+        with READ_SECONDS.time(backend=self.name, op="increment"):
+            frame = pd.read_csv(io.BytesIO(header + data)) if header else pd.DataFrame()
+        return frame, (identity, header, offset + len(data)), reset
+
+    def close(self):
+        pass
+
+
+def _file_id(stat):
+    return stat.st_dev, stat.st_ino
+
+
+def _csv_value(value):
+    # Missing and NaN values are empty cells
+    if value is None or (isinstance(value, float) and value != value):
+        return ""
+    return value
+
+
+def _read_header(file_path):
+    """Return the column names of an existing CSV file, or None."""
+    if not os.path.exists(file_path) or os.path.getsize(file_path) == 0:
+        return None
+    with open(file_path, "r", encoding="utf-8") as f:
+        return f.readline().rstrip("\r\n").split(",")
+
+
+_CONVERTERS = {"dust": float, "temp": float, "tvoc": int, "eco2": int}
+
+
+def _convert(field, value):
+    if value is None or value == "":
+        return None
+    convert = _CONVERTERS.get(field)
+    if convert is None:
+        return value
+    try:
+        return convert(value)
+    except ValueError:
+        return float(value)
+
+
+class BlockIndex:
+    """Key range of every block of ``BLOCK_LINES`` lines of a CSV file.
+
+    CSV logs are appended in arrival order, which is not key order: devices
+    upload buffered readings late and late rollup partials follow newer ones.
+    The index records each block's byte offset and smallest and largest key,
+    so a range read skips the blocks outside the range without assuming the
+    file is sorted. A late row only widens the range of the block it lands
+    in. The index is built by one pass over the file and then extended with
+    what has been appended since.
+    """
+
+    BLOCK_LINES = 1024
+    READ_SIZE = 1 << 20
+
+    def __init__(self, file_id, header, columns, key_index):
+        self.file_id = file_id
+        self.header = header
+        self.columns = columns
+        self.key_index = key_index
+        self.data_start = len(header)
+        self.indexed_end = self.data_start     # end of the last complete line indexed
+        self.offsets = []                       # start of each block
+        self.lows = []
+        self.highs = []
+        self._lines = 0                         # lines in the last block
+
+    @classmethod
+    def open(cls, f, key):
+        """A new, empty index of the file ``f`` on column ``key`` (None without a header)."""
+        f.seek(0)
+        header = f.readline()
+        if not header.endswith(b"\n"):
+            return None
+        columns = header.decode("utf-8").rstrip("\r\n").split(",")
+        if key not in columns:
+            return None
+        return cls(_file_id(os.fstat(f.fileno())), header, columns, columns.index(key))
+
+    def valid_for(self, f):
+        """False once the file was replaced, truncated or rewritten with another header."""
+        stat = os.fstat(f.fileno())
+        if _file_id(stat) != self.file_id or stat.st_size < self.indexed_end:
+            return False
+        f.seek(0)
+        return f.readline() == self.header
+
+    def extend(self, f):
+        """Index the complete lines appended since the last call."""
+        f.seek(self.indexed_end)
+        key_index = self.key_index
+        rest = b""
+        while True:
+            chunk = f.read(self.READ_SIZE)
+            if not chunk:
+                break
+            lines = (rest + chunk).split(b"\n")
+            # A partially written last line is picked up next time
+            rest = lines.pop()
+            for line in lines:
+                if self._lines == 0 or self._lines == self.BLOCK_LINES:
+                    self.offsets.append(self.indexed_end)
+                    self.lows.append(None)
+                    self.highs.append(None)
+                    self._lines = 0
+                self._lines += 1
+                self.indexed_end += len(line) + 1
+                fields = line.split(b",", key_index + 1)
+                if len(fields) <= key_index:
+                    continue
+                value = fields[key_index].decode("utf-8")
+                if self.lows[-1] is None or value < self.lows[-1]:
+                    self.lows[-1] = value
+                if self.highs[-1] is None or value > self.highs[-1]:
+                    self.highs[-1] = value
+
+    def blocks(self, start=None, end=None, offset=0):
+        """``(from, to)`` byte ranges at or after ``offset`` of the blocks that may hold keys in ``[start, end]``."""
+        first = max(bisect.bisect_right(self.offsets, offset) - 1, 0)
+        for i in range(first, len(self.offsets)):
+            low, high = self.lows[i], self.highs[i]
+            if low is None or (start is not None and high < start) or (end is not None and low > end):
+                continue
+            block_end = self.offsets[i + 1] if i + 1 < len(self.offsets) else self.indexed_end
+            if block_end > offset:
+                yield max(self.offsets[i], offset), block_end
+
+
+def _scan_blocks(f, index, start, end, offset):
+    """Yield ``(row, next offset)`` for the rows in ``[start, end]`` from ``offset`` on, in file order."""
+    key_index = index.key_index
+    width = len(index.columns)
+    for block_start, block_end in index.blocks(start, end, offset):
+        f.seek(block_start)
+        position = block_start
+        # Blocks end on a line break, so the last piece is empty
+        for line in f.read(block_end - block_start).split(b"\n")[:-1]:
+            position += len(line) + 1
+            # Compare the key before parsing the line
+            fields = line.split(b",", key_index + 1)
+            if len(fields) <= key_index:
+                continue
+            key = fields[key_index].decode("utf-8")
+            if (start is not None and key < start) or (end is not None and key > end):
+                continue
+            row = next(csv.reader([line.decode("utf-8")]))
+            if len(row) == width:
+                yield row, position
+
+
+def _read_csv_tail(file_path, n, block_size=64 * 1024):
+    """Parse only the header and the last ``n`` rows of a CSV file."""
+    if n <= 0 or not os.path.exists(file_path):
+        return pd.DataFrame()
+
+    with open(file_path, "rb") as f:
+        header = f.readline()
+        data_start = f.tell()
+        f.seek(0, os.SEEK_END)
+        end = f.tell()
+
+        # Walk backwards block by block until we have n complete lines
+        pos = end
+        chunk = b""
+        while pos > data_start and chunk.count(b"\n") <= n:
+            read_size = min(block_size, pos - data_start)
+            pos -= read_size
+            f.seek(pos)
+            chunk = f.read(read_size) + chunk
+
+    lines = chunk.splitlines(keepends=True)
+    if pos > data_start:
+        # The first line is only partially read
+        lines = lines[1:]
+    tail = b"".join(lines[-n:])
+
+    if not tail.strip():
+        return pd.DataFrame()
+    return pd.read_csv(io.BytesIO(header + tail))
+
+
+class IncrementalSensorFrame:
+    """Cached sensor history that only parses newly appended rows.
+
+    Shared between dashboard sessions: ``refresh()`` asks the store for the
+    rows added since the last call, converts just those timestamps and
+    appends them to the cached frame. When nothing was added the cached
+    frame is returned as is. Callers must not modify the returned frame.
+
+    The frame is kept in timestamp order. Rows come back in insertion order
+    (CSV) or sorted per increment (SQLite), so late readings are older than
+    rows already cached; only then is the merged frame re-sorted.
+    """
+
+    def __init__(self, store):
+        self.store = store
+        self._frame = pd.DataFrame()
+        self._cursor = None
+        self._lock = threading.Lock()
+
+    def refresh(self):
+        with self._lock:
+            new, cursor, reset = self.store.read_sensor_increment(self._cursor)
+            self._cursor = cursor
+            if "timestamp" in new.columns:
+                new["timestamp"] = pd.to_datetime(new["timestamp"])
+
+            if reset:
+                frame = new.reset_index(drop=True)
+                late = "timestamp" in frame.columns and not frame["timestamp"].is_monotonic_increasing
+            elif new.empty:
+                return self._frame
+            else:
+                late = not new["timestamp"].is_monotonic_increasing or (
+                    not self._frame.empty and new["timestamp"].iloc[0] < self._frame["timestamp"].iloc[-1]
+                )
+                frame = pd.concat([self._frame, new], ignore_index=True)
+            if late:
+                frame = frame.sort_values("timestamp", kind="stable", ignore_index=True)
+            self._frame = frame
+            return self._frame
+
+
+# SQLITE BACKEND
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS sensor_readings (
+    id INTEGER PRIMARY KEY,
+    timestamp TEXT NOT NULL,
+    device_id TEXT,
+    dust REAL,
+    temp REAL,
+    tvoc INTEGER,
+    eco2 INTEGER,
+    risk TEXT,
+    alert TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_sensor_timestamp ON sensor_readings (timestamp);
+CREATE INDEX IF NOT EXISTS idx_sensor_device_timestamp ON sensor_readings (device_id, timestamp);
+
+CREATE TABLE IF NOT EXISTS control_actions (
+    id INTEGER PRIMARY KEY,
+    timestamp TEXT NOT NULL,
+    device TEXT,
+    state TEXT,
+    reason TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_control_timestamp ON control_actions (timestamp);
+
+CREATE TABLE IF NOT EXISTS outdoor_readings (
+    id INTEGER PRIMARY KEY,
+    timestamp TEXT NOT NULL,
+    location TEXT,
+    pm2_5 REAL,
+    pm10 REAL,
+    risk TEXT,
+    alert TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_outdoor_timestamp ON outdoor_readings (timestamp);
+
+CREATE TABLE IF NOT EXISTS sensor_rollups (
+    resolution TEXT NOT NULL,
+    bucket TEXT NOT NULL,
+    metric TEXT NOT NULL,
+    count INTEGER NOT NULL,
+    sum REAL NOT NULL,
+    min REAL,
+    max REAL,
+    last REAL,
+    last_ts TEXT,
+    PRIMARY KEY (resolution, bucket, metric)
+) WITHOUT ROWID;
+
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT
+);
+"""
+
+# Columns added after the first release: (table, column, type)
+COLUMN_MIGRATIONS = [
+    ("outdoor_readings", "location", "TEXT"),
+]
+
+INSERT_SENSOR = (
+    "INSERT INTO sensor_readings (timestamp, device_id, dust, temp, tvoc, eco2, risk, alert) "
+    "VALUES (:timestamp, :device_id, :dust, :temp, :tvoc, :eco2, :risk, :alert)"
+)
+INSERT_CONTROL = (
+    "INSERT INTO control_actions (timestamp, device, state, reason) "
+    "VALUES (:timestamp, :device, :state, :reason)"
+)
+INSERT_OUTDOOR = (
+    "INSERT INTO outdoor_readings (timestamp, location, pm2_5, pm10, risk, alert) "
+    "VALUES (:timestamp, :location, :pm2_5, :pm10, :risk, :alert)"
+)
+UPSERT_ROLLUP = (
+    "INSERT INTO sensor_rollups (resolution, bucket, metric, count, sum, min, max, last, last_ts) "
+    "VALUES (:resolution, :bucket, :metric, :count, :sum, :min, :max, :last, :last_ts) "
+    "ON CONFLICT (resolution, bucket, metric) DO UPDATE SET "
+    "count = count + excluded.count, "
+    "sum = sum + excluded.sum, "
+    "min = MIN(min, excluded.min), "
+    "max = MAX(max, excluded.max), "
+    "last = CASE WHEN excluded.last_ts >= last_ts THEN excluded.last ELSE last END, "
+    "last_ts = MAX(last_ts, excluded.last_ts)"
+)
+SELECT_ROLLUPS = (
+    "SELECT resolution, bucket, metric, count, sum, min, max, last, last_ts FROM sensor_rollups "
+    "WHERE resolution = :resolution AND bucket >= :start AND bucket <= :end "
+    "ORDER BY bucket, metric"
+)
+SELECT_RECENT_SENSOR = (
+    "SELECT timestamp, device_id, dust, temp, tvoc, eco2, risk, alert FROM sensor_readings "
+    "ORDER BY timestamp DESC, id DESC LIMIT ?"
+)
+SELECT_RECENT_CONTROL = (
+    "SELECT timestamp, device, state, reason FROM control_actions "
+    "ORDER BY timestamp DESC, id DESC LIMIT ?"
+)
+
+
+def _payload_size(rows):
+    """Approximate stored size of the values in ``rows``: text length, 8 bytes per number."""
+    size = 0
+    for row in rows:
+        for value in row.values():
+            if isinstance(value, str):
+                size += len(value)
+            elif value is not None:
+                size += 8
+    return size
+
+
+class SqliteStore:
+    """SQLite database in WAL mode.
+
+    Writes go through one shared connection (serialised by a lock) and are
+    grouped into a single transaction per call. Reads use one connection per
+    thread so they never block on the writer.
+    """
+
+    name = "sqlite"
+
+    def __init__(self, db_path, data_dir=None):
+        # Reader connections are opened later, per thread; resolve the path now
+        self.db_path = os.path.abspath(db_path)
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._synchronous = None
+
+        self._writer = self._connect()
+        self._writer.executescript(SCHEMA)
+        self._migrate()
+        self._set_synchronous(False)
+
+        if data_dir:
+            self.import_csv_logs(data_dir)
+
+    def _migrate(self):
+        for table, column, column_type in COLUMN_MIGRATIONS:
+            existing = {row["name"] for row in self._writer.execute(f"PRAGMA table_info({table})")}
+            if column not in existing:
+                self._writer.execute(f"ALTER TABLE {table} ADD COLUMN {column} {column_type}")
+
+    def _connect(self):
+        conn = sqlite3.connect(self.db_path, check_same_thread=False, cached_statements=64)
+        conn.row_factory = sqlite3.Row
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA busy_timeout=5000")
+        return conn
+
+    def _reader(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = self._connect()
+            self._local.conn = conn
+        return conn
+
+    def _set_synchronous(self, fsync):
+        # NORMAL only syncs at checkpoints in WAL mode; FULL syncs every commit
+        mode = "FULL" if fsync else "NORMAL"
+        if mode != self._synchronous:
+            self._writer.execute(f"PRAGMA synchronous={mode}")
+            self._synchronous = mode
+
+    # Writes
+
+    def append_sensor(self, entries, fsync=False):
+        rows = [{col: entry.get(col) for col in SENSOR_COLUMNS} for entry in entries]
+        return self._insert("sensor", INSERT_SENSOR, rows, fsync)
+
+    def append_control(self, actions, fsync=False):
+        return self._insert("control", INSERT_CONTROL, actions, fsync)
+
+    def append_outdoor(self, entries, fsync=False):
+        rows = [{col: entry.get(col) for col in OUTDOOR_COLUMNS} for entry in entries]
+        return self._insert("outdoor", INSERT_OUTDOOR, rows, fsync)
+
+    def append_rollups(self, rows, fsync=False):
+        """Merge partial rollup rows into their buckets (upsert)."""
+        return self._insert("rollup", UPSERT_ROLLUP, rows, fsync)
+
+    def clear_rollups(self):
+        with self._lock:
+            with self._writer:
+                self._writer.execute("DELETE FROM sensor_rollups")
+
+    def _insert(self, kind, sql, rows, fsync):
+        if not rows:
+            return 0
+        with self._lock, WRITE_SECONDS.time(backend=self.name, kind=kind):
+            self._set_synchronous(fsync)
+            with self._writer:
+                self._writer.executemany(sql, rows)
+        if REGISTRY.enabled:
+            BYTES_WRITTEN.inc(_payload_size(rows), backend=self.name, kind=kind)
+            RECORDS_WRITTEN.inc(len(rows), backend=self.name, kind=kind)
+        return len(rows)
+
+    # Reads
+
+    def latest_sensor(self):
+        records = self.recent_sensor(1)
+        return records[-1] if records else None
+
+    def recent_sensor(self, n=100):
+        rows = self._reader().execute(SELECT_RECENT_SENSOR, (n,)).fetchall()
+        return [dict(row) for row in reversed(rows)]
+
+    def recent_control(self, n=50):
+        rows = self._reader().execute(SELECT_RECENT_CONTROL, (n,)).fetchall()
+        return [dict(row) for row in reversed(rows)]
+
+    def iter_sensor(self, start=None, end=None, cursor=None, fields=None, limit=1000):
+        """Yield ``(record, cursor)`` for readings in ``[start, end]``.
+
+        Keyset pagination on the (timestamp, id) index: each page is an index
+        seek plus a short range scan, independent of the table size.
+        """
+        fields = _check_fields(fields)
+        where = []
+        params = {"limit": limit}
+        if cursor is not None:
+            cursor_ts, _, cursor_id = decode_cursor(cursor).rpartition("|")
+            if not cursor_ts or not cursor_id.isdigit():
+                raise ValueError("Invalid cursor")
+            where.append("(timestamp, id) > (:cursor_ts, :cursor_id)")
+            params.update(cursor_ts=cursor_ts, cursor_id=int(cursor_id))
+        if start is not None:
+            where.append("timestamp >= :start")
+            params["start"] = start
+        if end is not None:
+            where.append("timestamp <= :end")
+            params["end"] = end
+
+        sql = (
+            f"SELECT id, timestamp AS _ts, {', '.join(fields)} FROM sensor_readings "
+            f"{'WHERE ' + ' AND '.join(where) if where else ''} "
+            "ORDER BY timestamp, id LIMIT :limit"
+        )
+        for row in self._reader().execute(sql, params):
+            record = {field: row[field] for field in fields}
+            yield record, encode_cursor(f"{row['_ts']}|{row['id']}")
+
+    def query_rollups(self, resolution, start=None, end=None):
+        """Rollup rows for buckets in ``[start, end]`` (primary-key range scan)."""
+        params = {"resolution": resolution, "start": start or "", "end": end or "9999"}
+        return [dict(row) for row in self._reader().execute(SELECT_ROLLUPS, params)]
+
+    def read_sensor_frame(self):
+        """Full sensor history as a DataFrame (dashboard/report use)."""
+        with READ_SECONDS.time(backend=self.name, op="frame"):
+            return pd.read_sql_query(
+                "SELECT timestamp, device_id, dust, temp, tvoc, eco2, risk, alert "
+                "FROM sensor_readings ORDER BY timestamp, id",
+                self._reader()
+            )
+
+    def read_sensor_increment(self, cursor=None):
+        """Rows inserted since ``cursor`` as ``(frame, cursor, reset)``.
+
+        The cursor is the database file identity plus the last row id seen;
+        a replaced database or a shrinking id sequence resets to a full read.
+        """
+        stat = os.stat(self.db_path)
+        identity = (stat.st_dev, stat.st_ino)
+        conn = self._reader()
+        max_id = conn.execute("SELECT MAX(id) FROM sensor_readings").fetchone()[0] or 0
+        reset = cursor is None or cursor[0] != identity or max_id < cursor[1]
+        last_id = 0 if reset else cursor[1]
+
+        with READ_SECONDS.time(backend=self.name, op="increment"):
+            frame = pd.read_sql_query(
+                "SELECT id, timestamp, device_id, dust, temp, tvoc, eco2, risk, alert "
+                "FROM sensor_readings WHERE id > ? ORDER BY timestamp, id",
+                conn,
+                params=(last_id,)
+            )
+        if not frame.empty:
+            last_id = int(frame["id"].max())
+        return frame.drop(columns="id"), (identity, last_id), reset
+
+    # Maintenance
+
+    def import_csv_logs(self, data_dir, chunk_size=50000):
+        """One-off import of existing CSV logs into the database.
+
+        Runs in a single IMMEDIATE transaction guarded by a marker row, so
+        the backend and dashboard opening the database together cannot both
+        import the same files.
+        """
+        sources = [
+            (os.path.join(data_dir, "sensor_log.csv"), INSERT_SENSOR, SENSOR_COLUMNS),
+            (os.path.join(data_dir, "control_log.csv"), INSERT_CONTROL, CONTROL_COLUMNS),
+            (os.path.join(data_dir, "realtime_log.csv"), INSERT_OUTDOOR, OUTDOOR_COLUMNS),
+        ]
+        with self._lock:
+            conn = self._writer
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                if conn.execute("SELECT 1 FROM meta WHERE key = 'csv_imported'").fetchone():
+                    conn.rollback()
+                    return
+                for file_path, sql, columns in sources:
+                    if not os.path.exists(file_path):
+                        continue
+                    for chunk in pd.read_csv(file_path, chunksize=chunk_size):
+                        chunk = chunk.reindex(columns=columns)
+                        conn.executemany(sql, _clean_records(chunk))
+                conn.execute("INSERT INTO meta (key, value) VALUES ('csv_imported', datetime('now'))")
+                conn.commit()
+            except Exception:
+                conn.rollback()
+                raise
+
+    def close(self):
+        self._writer.close()
+        conn = getattr(self._local, "conn", None)
+        if conn is not None:
+            conn.close()
+            self._local.conn = None
@@ -0,0 +1,155 @@
+"""Single storage-writer process for multi-worker serving (see serve.py).
+
+With several worker processes only one process may own the stores: SQLite
+and the CSV logs take one writer, and the ring buffers, rollups, control
+state and event history must be the same for every worker. This process
+imports app.py in single-process mode and serves its write-behind writer,
+zone-partitioned sensor log, control store, recent control actions, event
+broker, metrics hub, report jobs and Open-Meteo client over a local socket
+(``multiprocessing.managers``). Workers get proxies with the same methods;
+app.py switches to them when ``AIRSIGHT_STORAGE_SERVER`` is set.
+
+Addresses are ``host:port`` or, on POSIX, a Unix socket path.
+"""
+import os
+import signal
+import subprocess
+import sys
+from multiprocessing.managers import BaseManager, MakeProxyType
+
+
+def parse_address(value):
+    """``"host:port"`` -> ``(host, port)``; anything else is a socket path."""
+    host, sep, port = value.rpartition(":")
+    if sep and port.isdigit():
+        return host, int(port)
+    return value
+
+
+def format_address(address):
+    return f"{address[0]}:{address[1]}" if isinstance(address, tuple) else address
+
+
+# Server side: the objects app.py builds in single-process mode
+
+def _backend():
+    import app
+    return app
+
+
+def _sensor_log():
+    return _backend().sensor_log
+
+
+def _control():
+    return _backend().control
+
+
+def _writer():
+    return _backend().writer
+
+
+def _recent_actions():
+    return _backend().recent_actions
+
+
+def _events():
+    return _backend().events
+
+
+def _metrics_hub():
+    return _backend().metrics_hub
+
+
+def _report_jobs():
+    return _backend().report_jobs
+
+
+def _outdoor():
+    return _backend().open_meteo
+
+
+def _initialize():
+    os.environ.pop("AIRSIGHT_STORAGE_SERVER", None)
+    backend = _backend()
+    # Workers hand control and outdoor records to the writer whatever AIRSIGHT_WRITE_BEHIND says
+    backend.writer.start()
+    # One Open-Meteo client and cache for all workers, kept warm here
+    backend.start_outdoor_prefetch()
+
+
+# Client side
+
+_SensorLogProxyBase = MakeProxyType("_SensorLogProxyBase", (
+    "append", "total", "written", "latest", "last", "devices", "zones",
+    "series_since", "page", "query_rollups", "metrics",
+))
+
+
+class SensorLogProxy(_SensorLogProxyBase):
+    """PartitionedSensorLog in the storage process."""
+
+    def iter_sensor(self, start=None, end=None, cursor=None, fields=None, limit=1000, zone=None):
+        return iter(self.page(start, end, cursor, fields, limit, zone))
+
+
+_ActionLogProxyBase = MakeProxyType("_ActionLogProxyBase", ("append", "copy"))
+
+
+class ActionLogProxy(_ActionLogProxyBase):
+    """Recent control actions (a deque) in the storage process."""
+
+    def __iter__(self):
+        return iter(self.copy())
+
+
+class StorageManager(BaseManager):
+    """Serves the storage process's shared objects to the workers."""
+
+
+StorageManager.register("sensor_log", _sensor_log, SensorLogProxy)
+StorageManager.register("control", _control)
+StorageManager.register("writer", _writer)
+StorageManager.register("recent_actions", _recent_actions, ActionLogProxy)
+StorageManager.register("events", _events)
+StorageManager.register("metrics", _metrics_hub)
+StorageManager.register("reports", _report_jobs)
+StorageManager.register("outdoor", _outdoor)
+
+
+def start(address="127.0.0.1:0", authkey=""):
+    """Launch the storage process; returns ``(process, address)`` once it is listening.
+
+    Stop it with SIGTERM: it flushes queued records and open rollups and
+    closes the stores on exit (app.py's atexit handlers).
+    """
+    env = dict(os.environ, AIRSIGHT_STORAGE_AUTHKEY=authkey)
+    process = subprocess.Popen(
+        [sys.executable, os.path.abspath(__file__), address],
+        stdout=subprocess.PIPE, env=env, text=True
+    )
+    listening = process.stdout.readline().strip()
+    if not listening:
+        raise RuntimeError(f"Storage process exited with code {process.wait()}")
+    return process, listening
+
+
+def connect(address, authkey):
+    """Connect a worker to a running storage process."""
+    manager = StorageManager(parse_address(address), authkey)
+    manager.connect()
+    return manager
+
+
+def main():
+    address = parse_address(sys.argv[1] if len(sys.argv) > 1 else "127.0.0.1:0")
+    server = StorageManager(address, os.environ.get("AIRSIGHT_STORAGE_AUTHKEY", "").encode()).get_server()
+    _initialize()
+    # SIGTERM ends serve_forever like Ctrl+C, so atexit handlers flush and close the stores
+    signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
+    print(format_address(server.address), flush=True)
+    server.serve_forever()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,28 @@
+"""Shared fixtures: the Flask backend on a throwaway data folder.
+
+The environment is set before app.py is imported, so the stores, control
+state and logs of a test run never touch the repository's ``data/``.
+"""
+import os
+import sys
+import tempfile
+
+import pytest
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_ROOT)
+
+os.environ.setdefault("AIRSIGHT_DATA_DIR", tempfile.mkdtemp(prefix="airsight-tests-"))
+os.environ.setdefault("AIRSIGHT_OUTDOOR_REFRESH", "0")
+os.environ.setdefault("AIRSIGHT_DURABILITY", "none")
+
+
+@pytest.fixture(scope="session")
+def backend():
+    import app
+    return app
+
+
+@pytest.fixture
+def client(backend):
+    return backend.app.test_client()
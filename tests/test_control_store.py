@@ -0,0 +1,63 @@
+"""Versioned control state: compare-and-set, recovery and file placement."""
+import json
+import os
+
+import pytest
+
+from control_store import ControlStore, VersionConflict
+
+
+def test_compare_and_set(tmp_path):
+    control = ControlStore(str(tmp_path), fsync=False)
+    state, version = control.set("exhaust_fan", True, "test", expected_version=0)
+    assert (state, version) == (True, 1)
+    with pytest.raises(VersionConflict) as conflict:
+        control.set("exhaust_fan", False, "stale", expected_version=0)
+    assert conflict.value.current == 1
+    assert control.state()["exhaust_fan"] is True
+    control.close()
+
+
+def test_recovers_from_snapshot_and_log(tmp_path):
+    control = ControlStore(str(tmp_path), snapshot_every=3, fsync=False)
+    for i in range(5):
+        control.set("ventilation", i % 2 == 0, f"change {i}")
+    expected = control.state()
+    # Simulate a crash: no close(), so two events exist only in the log
+    control._wal.close()
+
+    recovered = ControlStore(str(tmp_path), snapshot_every=3, fsync=False)
+    assert recovered.replayed == 2
+    assert recovered.state() == expected
+    recovered.close()
+
+
+def test_torn_log_line_is_ignored(tmp_path):
+    control = ControlStore(str(tmp_path), fsync=False)
+    control.set("filtration_unit", True)
+    control._wal.close()
+    with open(tmp_path / "control_wal.jsonl", "a", encoding="utf-8") as f:
+        f.write('{"seq": 2, "device": "filt')
+
+    recovered = ControlStore(str(tmp_path), fsync=False)
+    assert recovered.state()["filtration_unit"] is True
+    assert recovered.state()["seq"] == 1
+    recovered.set("filtration_unit", False)
+    recovered.close()
+    with open(tmp_path / "control_snapshot.json", encoding="utf-8") as f:
+        assert json.load(f)["seq"] == 2
+
+
+def test_files_stay_put_after_chdir(tmp_path, monkeypatch):
+    data_dir = tmp_path / "data"
+    data_dir.mkdir()
+    monkeypatch.chdir(tmp_path)
+    control = ControlStore("data", fsync=False)
+    control.set("exhaust_fan", True)
+
+    elsewhere = tmp_path / "elsewhere"
+    (elsewhere / "data").mkdir(parents=True)
+    monkeypatch.chdir(elsewhere)
+    control.close()
+    assert os.path.exists(data_dir / "control_snapshot.json")
+    assert not os.listdir(elsewhere / "data")
@@ -0,0 +1,92 @@
+"""CSV appends (cached header, legacy layouts, rotated files), range reads and incremental frames."""
+import os
+
+from storage import SENSOR_COLUMNS, BlockIndex, CsvStore, IncrementalSensorFrame, open_store
+
+
+def reading(second):
+    return {"timestamp": f"2025-01-01 00:00:{second:02d}", "device_id": "d1", "dust": 1.5,
+            "temp": 20.0, "tvoc": 10, "eco2": 400, "risk": "Low", "alert": "ok, fine"}
+
+
+def test_appends_keep_the_file_layout(tmp_path):
+    store = CsvStore(str(tmp_path))
+    # An older log without device_id keeps its columns
+    with open(store.sensor_path, "w") as f:
+        f.write("timestamp,dust,temp,tvoc,eco2,risk,alert\n")
+    store.append_sensor([reading(1)])
+    store.append_sensor([reading(2)])
+    with open(store.sensor_path) as f:
+        lines = f.read().splitlines()
+    assert lines[1:] == ['2025-01-01 00:00:01,1.5,20.0,10,400,Low,"ok, fine"',
+                         '2025-01-01 00:00:02,1.5,20.0,10,400,Low,"ok, fine"']
+
+
+def test_rotated_file_gets_a_new_header(tmp_path):
+    store = CsvStore(str(tmp_path))
+    store.append_sensor([reading(1)])
+    os.replace(store.sensor_path, store.sensor_path + ".1")
+    store.append_sensor([reading(2)])
+    with open(store.sensor_path) as f:
+        lines = f.read().splitlines()
+    assert lines[0] == ",".join(SENSOR_COLUMNS)
+    assert [r["timestamp"] for r in store.recent_sensor(5)] == ["2025-01-01 00:00:02"]
+
+
+def test_incremental_frame_stays_in_timestamp_order(tmp_path):
+    for backend in ("csv", "sqlite"):
+        store = open_store(backend, str(tmp_path / backend))
+        frame = IncrementalSensorFrame(store)
+        store.append_sensor([reading(10), reading(30)])
+        assert list(frame.refresh()["timestamp"].dt.second) == [10, 30]
+        # Late rows land among the cached ones
+        store.append_sensor([reading(20), reading(40), reading(5)])
+        assert list(frame.refresh()["timestamp"].dt.second) == [5, 10, 20, 30, 40]
+        store.close()
+
+
+def test_late_batch_is_found_by_range_reads(tmp_path, monkeypatch):
+    monkeypatch.setattr(BlockIndex, "BLOCK_LINES", 2)
+    store = CsvStore(str(tmp_path))
+    # d2 uploads two buffered readings after d1's newer one
+    store.append_sensor([reading(0), reading(5)])
+    store.append_sensor([{**reading(1), "device_id": "d2"}, {**reading(2), "device_id": "d2"}])
+    store.append_sensor([reading(6)])
+
+    def seconds(start=None, end=None):
+        return sorted(int(r["timestamp"][-2:]) for r, _ in store.iter_sensor(start, end))
+
+    assert seconds("2025-01-01 00:00:00", "2025-01-01 00:00:03") == [0, 1, 2]
+    assert seconds("2025-01-01 00:00:04") == [5, 6]
+
+    # Pages in file order reach every reading once
+    records, cursor = [], None
+    while True:
+        page = list(store.iter_sensor(cursor=cursor, limit=2))
+        if not page:
+            break
+        records += [r["timestamp"] for r, _ in page]
+        cursor = page[-1][1]
+    assert sorted(int(ts[-2:]) for ts in records) == [0, 1, 2, 5, 6]
+
+    # Appends after the index was built are picked up
+    store.append_sensor([{**reading(3), "device_id": "d3"}])
+    assert seconds("2025-01-01 00:00:03", "2025-01-01 00:00:04") == [3]
+
+
+def test_late_rollup_partials_are_merged(tmp_path, monkeypatch):
+    monkeypatch.setattr(BlockIndex, "BLOCK_LINES", 2)
+    store = CsvStore(str(tmp_path))
+
+    def partial(minute, value):
+        return {"resolution": "1m", "bucket": f"2025-01-01 10:{minute:02d}:00", "metric": "dust", "count": 1,
+                "sum": value, "min": value, "max": value, "last": value, "last_ts": f"2025-01-01 10:{minute:02d}:30"}
+
+    store.append_rollups([partial(0, 1.0), partial(5, 2.0)])
+    store.append_rollups([partial(1, 3.0), partial(5, 4.0)])    # late partials
+    store.append_rollups([partial(6, 5.0)])
+
+    rows = store.query_rollups("1m", start="2025-01-01 10:04:00")
+    assert [(r["bucket"][11:16], r["count"], r["sum"]) for r in rows] == [("10:05", 2, 6.0), ("10:06", 1, 5.0)]
+    rows = store.query_rollups("1m", end="2025-01-01 10:01:00")
+    assert [r["bucket"][11:16] for r in rows] == ["10:00", "10:01"]
@@ -0,0 +1,73 @@
+"""Async ingest: 202/503 responses and backpressure from a full write queue."""
+import queue
+import time
+
+import pytest
+
+from ingest_queue import SEQ_KEY, IngestQueue
+from write_behind import WriteBehindLogger
+
+ASYNC = {"Prefer": "respond-async"}
+
+
+class MemoryStore:
+    def __init__(self):
+        self.sensor = []
+
+    def append_sensor(self, entries, fsync=False):
+        self.sensor.extend(entries)
+        return len(entries)
+
+    append_control = append_outdoor = append_rollups = lambda self, records, fsync=False: len(records)
+
+
+def wait_for(condition, timeout=5):
+    deadline = time.monotonic() + timeout
+    while not condition() and time.monotonic() < deadline:
+        time.sleep(0.01)
+    return condition()
+
+
+def reading(**overrides):
+    return {"dust": 120, "temp": 24.5, "tvoc": 80, "eco2": 500, "zone": "async", **overrides}
+
+
+def test_async_reading_is_accepted_then_stored(client, backend):
+    persisted = backend.ingest_queue.metrics()["persisted"]
+    response = client.post("/api/data", json=reading(dust=321), headers=ASYNC)
+    assert response.status_code == 202
+    assert response.headers["Preference-Applied"] == "respond-async"
+
+    assert wait_for(lambda: backend.ingest_queue.metrics()["persisted"] > persisted)
+    latest = client.get("/api/latest-sensor?zone=async").get_json()
+    assert latest["dust"] == 321
+    assert SEQ_KEY not in latest
+
+
+def test_full_ingest_queue_answers_503(client, backend, monkeypatch):
+    monkeypatch.setattr(backend.ingest_queue, "max_pending", 0)
+    response = client.post("/api/data/batch", json=[reading(), reading()], headers=ASYNC)
+    assert response.status_code == 503
+    assert response.headers["Retry-After"] == str(backend.INGEST_RETRY_AFTER)
+
+
+def test_full_write_queue_backs_up_instead_of_dropping():
+    store = MemoryStore()
+    writer = WriteBehindLogger(store, max_queue=2, flush_interval=0.01, durability="none", put_timeout=0.01)
+    ingest = IngestQueue(lambda entries: writer.submit_sensor(entries, block=True),
+                         max_pending=2, batch_size=1, workers=1).start()
+
+    # The writer isn't draining: one batch fills its queue, the next blocks an ingest thread
+    accepted = 0
+    with pytest.raises(queue.Full):
+        for i in range(10):
+            ingest.put([{"n": i}])
+            accepted += 1
+            time.sleep(0.05)
+    assert ingest.metrics()["failed"] == 0
+
+    writer.start()
+    assert wait_for(lambda: len(store.sensor) == accepted)
+    ingest.stop()
+    writer.stop()
+    assert sorted(entry["n"] for entry in store.sensor) == list(range(accepted))
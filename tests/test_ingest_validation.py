@@ -0,0 +1,59 @@
+"""Validation of /api/data and /api/data/batch readings."""
+import json
+
+VALID = {"device_id": "esp32-01", "zone": "validation", "dust": 120.5, "temp": 24.0, "tvoc": 80, "eco2": 600}
+
+
+def reject_constant(name):
+    raise ValueError(f"{name} is not valid JSON")
+
+
+def post_raw(client, url, body):
+    # Raw JSON text, so non-standard literals (NaN, 1e400) reach the server as sent
+    return client.post(url, data=body, content_type="application/json")
+
+
+def test_batch_rejects_overflowing_timestamp_per_item(client):
+    response = client.post("/api/data/batch", json=[VALID, {**VALID, "timestamp": 1e20}])
+    assert response.status_code == 200
+    body = response.get_json()
+    assert body["accepted"] == 1 and body["rejected"] == 1
+    assert body["results"][1]["status"] == "error"
+    assert "timestamp" in body["results"][1]["error"]
+
+
+def test_batch_rejects_infinite_value_per_item(client):
+    body = "[" + json.dumps(VALID) + ', {"dust": 1, "temp": 20, "tvoc": 1e400, "eco2": 600}]'
+    response = post_raw(client, "/api/data/batch", body)
+    assert response.status_code == 200
+    results = response.get_json()["results"]
+    assert [r["status"] for r in results] == ["success", "error"]
+    assert "tvoc" in results[1]["error"]
+
+
+def test_batch_rejects_nan_per_item(client):
+    body = "[" + json.dumps(VALID) + ', {"dust": NaN, "temp": 20, "tvoc": 10, "eco2": 600}]'
+    response = post_raw(client, "/api/data/batch", body)
+    assert response.status_code == 200
+    results = response.get_json()["results"]
+    assert [r["status"] for r in results] == ["success", "error"]
+    assert "dust" in results[1]["error"]
+
+
+def test_single_reading_rejects_nan(client):
+    response = post_raw(client, "/api/data", '{"zone": "nan-check", "dust": NaN, "temp": 20, "tvoc": 10, "eco2": 600}')
+    assert response.status_code == 400
+    assert client.get("/api/latest-sensor?zone=nan-check").status_code == 404
+
+
+def test_single_reading_rejects_overflowing_timestamp(client):
+    response = client.post("/api/data", json={**VALID, "timestamp": -1e20})
+    assert response.status_code == 400
+
+
+def test_served_readings_stay_valid_json(client):
+    client.post("/api/data", json=VALID)
+    response = client.get("/api/latest-sensor?zone=validation")
+    assert response.status_code == 200
+    # Strict parse: NaN/Infinity literals are not JSON
+    json.loads(response.data, parse_constant=reject_constant)
@@ -0,0 +1,165 @@
+"""Open-Meteo client against a local fake upstream: TTL, stale-while-revalidate, breaker, sharing."""
+import json
+import os
+import subprocess
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from openmeteo import OpenMeteoClient, UpstreamUnavailable
+
+LOCATION = (28.6139, 77.209)
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+class FakeUpstream:
+    """Answers like the air-quality API; pm2_5 counts the requests served."""
+
+    def __init__(self):
+        self.calls = 0
+        self.failing = False
+        upstream = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                upstream.calls += 1
+                if upstream.failing:
+                    self.send_response(500)
+                    self.end_headers()
+                    return
+                body = json.dumps({"current": {"time": "2025-01-01T12:00", "pm2_5": upstream.calls, "pm10": 1.0}})
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.end_headers()
+                self.wfile.write(body.encode())
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.url = f"http://127.0.0.1:{self.server.server_port}/v1/air-quality"
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def close(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+@pytest.fixture
+def upstream():
+    server = FakeUpstream()
+    yield server
+    server.close()
+
+
+def wait_for(condition, timeout=5):
+    deadline = time.monotonic() + timeout
+    while not condition() and time.monotonic() < deadline:
+        time.sleep(0.01)
+    return condition()
+
+
+def test_fresh_entries_are_served_from_cache(upstream):
+    client = OpenMeteoClient(upstream.url, ttl=600)
+    assert client.current(*LOCATION)["pm2_5"] == 1
+    assert client.current(*LOCATION)["pm2_5"] == 1
+    assert upstream.calls == 1
+    assert client.metrics()["hits"] == 1
+    client.close()
+
+
+def test_stale_entry_is_served_while_one_refresh_runs(upstream):
+    client = OpenMeteoClient(upstream.url, ttl=0)
+    assert client.current(*LOCATION)["pm2_5"] == 1
+    # Expired: answered from the cache at once, refreshed in the background
+    assert client.current(*LOCATION)["pm2_5"] == 1
+    assert wait_for(lambda: upstream.calls == 2)
+    assert wait_for(lambda: client.current(*LOCATION)["pm2_5"] == 2)
+    assert client.metrics()["stale_hits"] >= 2
+    client.close()
+
+
+def test_breaker_opens_then_a_trial_closes_it(upstream):
+    client = OpenMeteoClient(upstream.url, failure_threshold=2, reset_timeout=0.2)
+    upstream.failing = True
+    for _ in range(2):
+        with pytest.raises(UpstreamUnavailable):
+            client.current(*LOCATION)
+    assert client.breaker.state == "open"
+
+    # Open: fails fast without calling upstream
+    with pytest.raises(UpstreamUnavailable):
+        client.current(*LOCATION)
+    assert upstream.calls == 2
+    assert client.metrics()["short_circuited"] == 1
+
+    upstream.failing = False
+    time.sleep(0.25)
+    assert client.breaker.state == "half-open"
+    assert client.current(*LOCATION)["pm2_5"] == 3
+    assert client.breaker.state == "closed"
+    client.close()
+
+
+def test_unexpected_error_reaches_coalesced_callers(upstream, monkeypatch):
+    client = OpenMeteoClient(upstream.url)
+    release = threading.Event()
+
+    def broken_fetch(key):
+        release.wait(5)
+        raise RuntimeError("bad payload")
+
+    monkeypatch.setattr(client, "_fetch", broken_fetch)
+    errors = []
+
+    def call():
+        try:
+            client.current(*LOCATION)
+        except RuntimeError as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=call) for _ in range(3)]
+    for thread in threads:
+        thread.start()
+    time.sleep(0.1)
+    release.set()
+    for thread in threads:
+        thread.join(5)
+    assert not any(thread.is_alive() for thread in threads)
+    assert len(errors) == 3
+    client.close()
+
+
+def test_workers_share_the_storage_process_cache(upstream, tmp_path, monkeypatch):
+    import storage_server
+
+    locations = tmp_path / "locations.json"
+    locations.write_text(json.dumps({"delhi": {"latitude": LOCATION[0], "longitude": LOCATION[1]}}))
+    monkeypatch.setenv("AIRSIGHT_DATA_DIR", str(tmp_path / "data"))
+    monkeypatch.setenv("AIRSIGHT_LOCATIONS_FILE", str(locations))
+    monkeypatch.setenv("AIRSIGHT_OPENMETEO_URL", upstream.url)
+    monkeypatch.setenv("AIRSIGHT_OUTDOOR_REFRESH", "300")
+    process, address = storage_server.start(authkey="test")
+    try:
+        # The storage process prefetches; a worker's lookups are answered from that cache
+        assert wait_for(lambda: upstream.calls == 1)
+        outdoor = storage_server.connect(address, b"test").outdoor()
+        assert outdoor.current(*LOCATION)["pm2_5"] == 1
+        assert outdoor.current(*LOCATION)["pm2_5"] == 1
+        assert upstream.calls == 1
+    finally:
+        process.terminate()
+        process.wait(timeout=30)
+
+
+def test_importing_the_backend_fetches_nothing(upstream, tmp_path):
+    env = dict(os.environ, AIRSIGHT_DATA_DIR=str(tmp_path), AIRSIGHT_OPENMETEO_URL=upstream.url,
+               AIRSIGHT_OUTDOOR_REFRESH="300")
+    script = "import time, app; time.sleep(0.5); print(app.outdoor_prefetcher._thread)"
+    result = subprocess.run([sys.executable, "-c", script], cwd=REPO_ROOT, env=env,
+                            capture_output=True, text=True, timeout=60)
+    assert result.stdout.strip() == "None", result.stderr
+    assert upstream.calls == 0
@@ -0,0 +1,66 @@
+"""Report statistics against pandas and the risk engine's levels, and the AQI scale."""
+from datetime import datetime, timedelta
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from report_stats import BANDS, HISTOGRAMS, aggregate
+from reports import calculate_aqi
+from risk_engine import METRICS, SENSOR_THRESHOLDS, metric_levels
+
+NOW = datetime(2025, 1, 1, 12, 0)
+
+
+@pytest.fixture
+def frame():
+    rng = np.random.default_rng(7)
+    n = 2000
+    df = pd.DataFrame({
+        "timestamp": [NOW - timedelta(seconds=5 * i) for i in range(n)][::-1],
+        "dust": rng.integers(0, 1500, n).astype(float),
+        "temp": np.round(rng.normal(32, 5, n), 1),
+        "tvoc": rng.integers(0, 800, n).astype(float),
+        "eco2": rng.integers(400, 1400, n).astype(float),
+    })
+    # Readings exactly on a bound belong to the level below it
+    for metric in METRICS:
+        df.loc[: len(SENSOR_THRESHOLDS[metric]["bounds"]) - 1, metric] = SENSOR_THRESHOLDS[metric]["bounds"]
+    df.loc[10, "dust"] = np.nan
+    return df
+
+
+def test_aggregate_matches_pandas(frame):
+    ranges = {"30m": 30, "1h": 60, "all": None}
+    result = aggregate(frame, ranges, now=NOW)
+    for name, minutes in ranges.items():
+        rows = frame if minutes is None else frame[frame["timestamp"] >= NOW - timedelta(minutes=minutes)]
+        assert result[name]["count"] == len(rows)
+        for metric in METRICS:
+            values = rows[metric].dropna()
+            stats = result[name]["metrics"][metric]
+            assert stats["count"] == len(values)
+            assert stats["mean"] == pytest.approx(values.mean())
+            assert stats["std"] == pytest.approx(values.std())
+            assert stats["min"] == values.min() and stats["max"] == values.max()
+            bin_width = 1 / HISTOGRAMS[metric][1]
+            for p in (50, 95, 99):
+                expected = np.percentile(values, p, method="inverted_cdf")
+                assert abs(stats[f"p{p}"] - expected) <= bin_width
+
+
+def test_bands_follow_risk_engine_levels(frame):
+    stats = aggregate(frame, now=NOW)["all"]["metrics"]
+    for metric in METRICS:
+        values = frame[metric].dropna()
+        levels = metric_levels(values, metric)
+        expected = {band: int((levels == i).sum()) for i, band in enumerate(BANDS)}
+        assert stats[metric]["band_readings"] == expected
+
+
+def test_aqi_keeps_its_own_scale():
+    # Half of each full-scale reading, though the risk engine already rates them high
+    df = pd.DataFrame([{"dust": 750.0, "tvoc": 500.0, "eco2": 1000.0}])
+    aqi, status = calculate_aqi(df)
+    assert aqi == pytest.approx(50.0)
+    assert status == "warning"
@@ -0,0 +1,54 @@
+"""Ring buffer and partition ordering with late (out-of-order) readings."""
+from partitions import Partition, PartitionedSensorLog
+from ring_buffer import SensorRingBuffer
+from storage import open_store
+
+
+def reading(second, **fields):
+    return {"timestamp": f"2025-01-01 00:00:{second:02d}", **fields}
+
+
+def test_late_reading_is_inserted_in_timestamp_order():
+    buffer = SensorRingBuffer(4)
+    buffer.extend([reading(10), reading(20), reading(30)])
+    buffer.append(reading(15))
+    assert [r["timestamp"][-2:] for r in buffer.last(4)] == ["10", "15", "20", "30"]
+    assert buffer.latest()["timestamp"].endswith("30")
+
+    # Full: the oldest is evicted, and a reading older than everything held is not kept
+    buffer.append(reading(25))
+    buffer.append(reading(5))
+    assert [r["timestamp"][-2:] for r in buffer.last(4)] == ["15", "20", "25", "30"]
+    assert buffer.oldest()["timestamp"].endswith("15")
+    assert buffer.total == 6
+
+
+class EmptyStore:
+    def recent_sensor(self, n):
+        return []
+
+    def append_sensor(self, entries, fsync=False):
+        return len(entries)
+
+    def append_rollups(self, rows, fsync=False):
+        return len(rows)
+
+
+def test_partition_keeps_newest_reading_per_device():
+    partition = Partition("default", EmptyStore())
+    partition.append([reading(30, device_id="a", dust=1), reading(40, device_id="b", dust=2)])
+    partition.append([reading(20, device_id="a", dust=3)])
+    assert partition.latest("a")["dust"] == 1
+    assert partition.latest()["dust"] == 2
+    since = partition.series_since("2025-01-01 00:00:25", ["timestamp", "dust"], limit=10)
+    assert [r["dust"] for r in since] == [1, 2]
+
+
+def test_series_across_zones_is_in_timestamp_order(tmp_path):
+    # Ring buffers of 2 readings: the series comes from the CSV logs (arrival order)
+    log = PartitionedSensorLog(open_store("csv", str(tmp_path)), data_dir=str(tmp_path), backend="csv", ring_capacity=2)
+    log.append([reading(10, zone="a", dust=1), reading(30, zone="a", dust=3), reading(20, zone="b", dust=2)])
+    log.append([reading(15, zone="a", dust=15), reading(40, zone="b", dust=4)])
+    series = log.series_since("2025-01-01 00:00:00", ["dust"])
+    assert [r["dust"] for r in series] == [1, 15, 2, 3, 4]
+    assert [r["dust"] for r in log.last(4)] == [15, 2, 3, 4]
@@ -0,0 +1,38 @@
+"""Rebuilding rollups from the raw logs of every zone."""
+import os
+import subprocess
+import sys
+
+from partitions import PartitionedSensorLog
+from storage import open_store
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def reading(zone, minute):
+    return {"timestamp": f"2025-01-01 10:{minute:02d}:00", "zone": zone, "device_id": "d1", "dust": 10.0,
+            "temp": 20.0, "tvoc": 1, "eco2": 400, "risk": "Low", "alert": ""}
+
+
+def test_rebuild_covers_every_zone(tmp_path):
+    data_dir = str(tmp_path)
+    store = open_store("csv", data_dir)
+    sensor_log = PartitionedSensorLog(store, data_dir=data_dir, backend="csv", ring_capacity=1)
+    sensor_log.append([reading("default", 1), reading("north", 2), reading("north", 3)])
+    sensor_log.close()
+    store.close()
+    for zone_dir in (tmp_path, tmp_path / "zones" / "north"):
+        for name in os.listdir(zone_dir):
+            if name.startswith("rollup_"):
+                os.remove(zone_dir / name)
+
+    env = dict(os.environ, AIRSIGHT_DATA_DIR=data_dir, AIRSIGHT_STORAGE="csv")
+    subprocess.run([sys.executable, "rollups.py", "--rebuild"], cwd=REPO_ROOT, env=env, check=True,
+                   capture_output=True, timeout=60)
+
+    def dust_buckets(path):
+        return [(row["bucket"][11:16], row["count"])
+                for row in open_store("csv", str(path)).query_rollups("1m") if row["metric"] == "dust"]
+
+    assert dust_buckets(tmp_path) == [("10:01", 1)]
+    assert dust_buckets(tmp_path / "zones" / "north") == [("10:02", 1), ("10:03", 1)]
@@ -0,0 +1,59 @@
+"""/api/dashboard/snapshot: one conditional GET per dashboard refresh."""
+from datetime import datetime
+
+import pytest
+
+NOW = datetime(2025, 1, 1, 12, 0, 30)
+URL = "/api/dashboard/snapshot?minutes=5&zone=snapshot"
+
+
+class FrozenDatetime(datetime):
+    @classmethod
+    def now(cls, tz=None):
+        return NOW
+
+
+@pytest.fixture
+def frozen(backend, monkeypatch):
+    # The tag includes the current minute; keep it still
+    monkeypatch.setattr(backend, "datetime", FrozenDatetime)
+
+
+def reading(dust):
+    return {"timestamp": "2025-01-01 12:00:10", "zone": "snapshot", "dust": dust, "temp": 24.0,
+            "tvoc": 80, "eco2": 500}
+
+
+def test_unchanged_snapshot_is_a_304(client, frozen):
+    assert client.post("/api/data", json=reading(150)).status_code == 200
+    first = client.get(URL)
+    assert first.status_code == 200
+    etag = first.headers["ETag"]
+    assert first.get_json()["latest"]["dust"] == 150
+
+    again = client.get(URL, headers={"If-None-Match": etag})
+    assert again.status_code == 304
+    assert again.headers["ETag"] == etag
+    assert again.data == b""
+
+
+def test_new_reading_or_control_change_changes_the_tag(client, frozen):
+    client.post("/api/data", json=reading(150))
+    etag = client.get(URL).headers["ETag"]
+
+    client.post("/api/data", json=reading(175))
+    response = client.get(URL, headers={"If-None-Match": etag})
+    assert response.status_code == 200
+    assert [point["dust"] for point in response.get_json()["series"]][-2:] == [150, 175]
+
+    etag = response.headers["ETag"]
+    state = client.get("/api/control/state").get_json()
+    client.post("/api/control/set", json={"device": "ventilation", "state": not state["ventilation"],
+                                          "reason": "test"})
+    response = client.get(URL, headers={"If-None-Match": etag})
+    assert response.status_code == 200
+    assert response.get_json()["control"]["ventilation"] == (not state["ventilation"])
+
+
+def test_window_is_validated(client):
+    assert client.get("/api/dashboard/snapshot?minutes=0").status_code == 400
@@ -0,0 +1,112 @@
+"""The same queries against CsvStore and SqliteStore, and the one-off CSV import."""
+import pytest
+
+from storage import BlockIndex, CsvStore, SqliteStore, open_store
+
+BACKENDS = ("csv", "sqlite")
+
+
+def reading(device, minute, **overrides):
+    return {"timestamp": f"2025-01-01 10:{minute:02d}:00", "device_id": device, "dust": 100.5 + minute,
+            "temp": 21.5, "tvoc": 40 + minute, "eco2": 450, "risk": "Low", "alert": "ok, fine", **overrides}
+
+
+def partial(minute, value):
+    return {"resolution": "1m", "bucket": f"2025-01-01 10:{minute:02d}:00", "metric": "dust", "count": 1,
+            "sum": value, "min": value, "max": value, "last": value, "last_ts": f"2025-01-01 10:{minute:02d}:30"}
+
+
+@pytest.fixture(params=BACKENDS)
+def store(request, tmp_path, monkeypatch):
+    # Small blocks, so the CSV block index is exercised
+    monkeypatch.setattr(BlockIndex, "BLOCK_LINES", 2)
+    store = open_store(request.param, str(tmp_path))
+    # d2 uploads buffered readings after d1's newer ones
+    store.append_sensor([reading("d1", 0), reading("d1", 5)])
+    store.append_sensor([reading("d2", 1), reading("d2", 2, dust=None)])
+    store.append_sensor([reading("d1", 6)])
+    yield store
+    store.close()
+
+
+def minutes(records):
+    return sorted(int(r["timestamp"][14:16]) for r in records)
+
+
+def at(minute):
+    return None if minute is None else f"2025-01-01 10:{minute:02d}:00"
+
+
+def test_time_range(store):
+    def query(start=None, end=None):
+        return minutes(record for record, _ in store.iter_sensor(at(start), at(end)))
+
+    assert query(0, 3) == [0, 1, 2]
+    assert query(4) == [5, 6]
+    assert query(end=1) == [0, 1]
+    assert query(2, 2) == [2]
+    assert query(7) == []
+
+
+def test_pages_cover_every_reading_once(store):
+    seen, cursor = [], None
+    while True:
+        page = list(store.iter_sensor(start=at(1), cursor=cursor, limit=2))
+        assert len(page) <= 2
+        if not page:
+            break
+        seen += [record for record, _ in page]
+        cursor = page[-1][1]
+    assert minutes(seen) == [1, 2, 5, 6]
+
+
+def test_fields_and_types(store):
+    records = {r["timestamp"][14:16]: r for r, _ in store.iter_sensor(fields=["timestamp", "dust", "tvoc", "alert"])}
+    assert set(records["01"]) == {"timestamp", "dust", "tvoc", "alert"}
+    assert records["01"]["dust"] == 101.5 and isinstance(records["01"]["dust"], float)
+    assert records["01"]["tvoc"] == 41 and isinstance(records["01"]["tvoc"], int)
+    assert records["01"]["alert"] == "ok, fine"
+    assert records["02"]["dust"] is None
+
+
+def test_bad_arguments(store):
+    with pytest.raises(ValueError):
+        list(store.iter_sensor(fields=["timestamp", "nope"]))
+    with pytest.raises(ValueError):
+        list(store.iter_sensor(cursor="not a cursor"))
+
+
+def test_recent_and_control(store):
+    assert store.latest_sensor()["timestamp"] == "2025-01-01 10:06:00"
+    store.append_control([{"timestamp": "2025-01-01 10:07:00", "device": "exhaust_fan", "state": "ON",
+                           "reason": "Manual"}])
+    assert [(a["device"], a["state"]) for a in store.recent_control(5)] == [("exhaust_fan", "ON")]
+
+
+def test_rollups_merge_late_partials(store):
+    store.append_rollups([partial(0, 1.0), partial(5, 2.0)])
+    store.append_rollups([partial(1, 3.0), partial(5, 4.0)])
+    store.append_rollups([partial(6, 5.0)])
+    rows = store.query_rollups("1m", start=at(4))
+    assert [(r["bucket"][11:16], r["count"], r["sum"], r["min"], r["max"]) for r in rows] == [
+        ("10:05", 2, 6.0, 2.0, 4.0), ("10:06", 1, 5.0, 5.0, 5.0)]
+    assert [r["bucket"][11:16] for r in store.query_rollups("1m", end=at(1))] == ["10:00", "10:01"]
+
+
+def test_sqlite_imports_csv_logs_once(tmp_path):
+    csv_store = CsvStore(str(tmp_path))
+    csv_store.append_sensor([reading("d1", 0), reading("d1", 1)])
+    csv_store.append_control([{"timestamp": "2025-01-01 10:00:00", "device": "ventilation", "state": "ON",
+                               "reason": "Manual"}])
+
+    db_path = str(tmp_path / "airsight.db")
+    store = SqliteStore(db_path, data_dir=str(tmp_path))
+    assert minutes(record for record, _ in store.iter_sensor()) == [0, 1]
+    assert len(store.recent_control(5)) == 1
+    store.close()
+
+    # The marker row stops a second import, even of readings added to the CSV since
+    csv_store.append_sensor([reading("d1", 2)])
+    store = SqliteStore(db_path, data_dir=str(tmp_path))
+    assert minutes(record for record, _ in store.iter_sensor()) == [0, 1]
+    store.close()
@@ -0,0 +1,71 @@
+"""Rollups and the write-behind writer: rejected records and a full queue."""
+import math
+import queue
+
+import pytest
+
+from rollups import RollupAggregator
+from write_behind import WriteBehindLogger
+
+
+def test_rollups_skip_non_finite_values():
+    aggregator = RollupAggregator(resolutions=["1m"])
+    aggregator.add([
+        {"timestamp": "2025-01-01 00:00:01", "dust": 10.0, "temp": 20.0},
+        {"timestamp": "2025-01-01 00:00:02", "dust": float("nan"), "temp": float("inf")},
+        {"timestamp": "2025-01-01 00:00:03", "dust": 30.0, "temp": 22.0},
+    ])
+    rows = {row["metric"]: row for row in aggregator.drain()}
+    assert rows["dust"]["count"] == 2 and rows["dust"]["sum"] == 40.0
+    assert rows["temp"]["max"] == 22.0
+    assert all(math.isfinite(row["sum"]) for row in rows.values())
+
+
+class RejectingStore:
+    """Fails any group containing a record marked bad, like an SQLite constraint."""
+
+    def __init__(self):
+        self.rollups = []
+
+    def append_rollups(self, rows, fsync=False):
+        if any(row.get("bad") for row in rows):
+            raise ValueError("NOT NULL constraint failed")
+        self.rollups.extend(rows)
+        return len(rows)
+
+    def append_sensor(self, entries, fsync=False):
+        return len(entries)
+
+    append_control = append_outdoor = append_sensor
+
+
+def test_writer_drops_only_the_rejected_record():
+    store = RejectingStore()
+    written = []
+    writer = WriteBehindLogger(store, flush_interval=0.01, durability="none", max_retries=2,
+                               on_write=lambda kind, records: written.extend(records)).start()
+    rows = [{"bucket": i} for i in range(5)]
+    rows[2]["bad"] = True
+    writer.submit_rollups(rows)
+    writer.flush(timeout=5)
+    writer.stop()
+
+    assert [row["bucket"] for row in store.rollups] == [0, 1, 3, 4]
+    assert [row["bucket"] for row in written] == [0, 1, 3, 4]
+    stats = writer.metrics()
+    assert stats["written"] == 4 and stats["failed"] == 1
+
+
+def test_batch_that_does_not_fit_is_rejected_whole():
+    store = RejectingStore()
+    writer = WriteBehindLogger(store, max_queue=5, flush_interval=0.01, durability="none", put_timeout=0.01)
+    writer.submit_rollups([{"bucket": i} for i in range(3)])
+    with pytest.raises(queue.Full):
+        writer.submit_rollups([{"bucket": i} for i in range(3, 6)])
+    stats = writer.metrics()
+    assert stats["queue_depth"] == 3 and stats["rejected"] == 3
+
+    writer.start()
+    writer.flush(timeout=5)
+    writer.stop()
+    assert [row["bucket"] for row in store.rollups] == [0, 1, 2]
@@ -0,0 +1,273 @@
+"""Write-behind group-commit logger.
+
+Request handlers enqueue records and return immediately; a single background
+thread drains the bounded queue and writes records to the store in groups,
+either when ``batch_size`` records are waiting or ``flush_interval`` seconds
+after the first record of a group arrived, whichever comes first.
+
+The queue holds each submitted batch as one item and is bounded by the number
+of records waiting, so a batch is either enqueued whole or rejected whole.
+
+Durability modes:
+    "fsync" - each group is fsync'd before it is acknowledged as written
+    "none"  - leave syncing to the OS / SQLite checkpoints
+"""
+import logging
+import queue
+import threading
+import time
+from collections import deque
+
+from metrics import REGISTRY
+
+logger = logging.getLogger(__name__)
+
+DURABILITY_MODES = ("fsync", "none")
+
+# Marker telling the writer thread to exit after draining the queue
+_STOP = object()
+
+FLUSH_SECONDS = REGISTRY.histogram("airsight_write_flush_seconds", "Time to write one group of queued records")
+REJECTED = REGISTRY.counter("airsight_write_rejected_total", "Records rejected because the write queue was full")
+
+
+class WriteBehindLogger:
+    """Background writer that batches sensor, control, outdoor and rollup records."""
+
+    def __init__(self, store, max_queue=10000, batch_size=500, flush_interval=0.25,
+                 durability="fsync", put_timeout=1.0, max_retries=3, on_write=None):
+        if durability not in DURABILITY_MODES:
+            raise ValueError(f"Unknown durability mode: {durability}")
+
+        self.store = store
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.durability = durability
+        self.put_timeout = put_timeout
+        self.max_retries = max_retries
+        # Called as on_write(kind, records) once a group is durably written
+        self.on_write = on_write
+
+        self.max_queue = max_queue
+        # Submitted batches; capacity is enforced in records by _submit
+        self._queue = queue.Queue()
+        self._pending = 0
+        self._space = threading.Condition()
+        self._thread = None
+        self._stats_lock = threading.Lock()
+        self._flush_times = deque(maxlen=1000)
+        self._stats = {
+            "enqueued": 0,
+            "written": 0,
+            "failed": 0,
+            "rejected": 0,
+            "batches": 0,
+        }
+
+    # Lifecycle
+
+    def start(self):
+        if self._thread is None or not self._thread.is_alive():
+            self._thread = threading.Thread(target=self._run, name="write-behind", daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self, timeout=10.0):
+        """Flush everything still queued and stop the writer thread."""
+        if self._thread is None or not self._thread.is_alive():
+            return
+        self._queue.put(_STOP)
+        self._thread.join(timeout)
+
+    def flush(self, timeout=None):
+        """Block until every record enqueued so far has been written."""
+        if self._thread is None or not self._thread.is_alive():
+            return
+        if timeout is None:
+            self._queue.join()
+            return
+        deadline = time.monotonic() + timeout
+        while self._queue.unfinished_tasks and time.monotonic() < deadline:
+            time.sleep(0.005)
+
+    # Producers
+
+    def submit_sensor(self, entries, block=False):
+        self._submit("sensor", entries, block)
+
+    def submit_control(self, actions):
+        self._submit("control", actions)
+
+    def submit_outdoor(self, entries):
+        self._submit("outdoor", entries)
+
+    def submit_rollups(self, rows, block=False):
+        self._submit("rollup", rows, block)
+
+    def _submit(self, kind, records, block=False):
+        """Enqueue all records or none; raises queue.Full if they don't fit within put_timeout.
+
+        With ``block`` it waits for room instead (for callers that already
+        acknowledged the records, like the async ingest threads).
+        """
+        records = list(records)
+        if not records:
+            return
+        with self._space:
+            # A batch larger than the whole queue still goes through once the queue is empty
+            fits = lambda: not self._pending or self._pending + len(records) <= self.max_queue
+            if not self._space.wait_for(fits, None if block else self.put_timeout):
+                with self._stats_lock:
+                    self._stats["rejected"] += len(records)
+                REJECTED.inc(len(records))
+                raise queue.Full
+            self._pending += len(records)
+        self._queue.put((kind, records))
+        with self._stats_lock:
+            self._stats["enqueued"] += len(records)
+
+    # Writer thread
+
+    def _run(self):
+        stopping = False
+        while not stopping:
+            item = self._queue.get()
+            if item is _STOP:
+                self._queue.task_done()
+                break
+
+            batch = [item]
+            count = len(item[1])
+            deadline = time.monotonic() + self.flush_interval
+            while count < self.batch_size:
+                remaining = deadline - time.monotonic()
+                try:
+                    # Once stopping, drain without waiting
+                    item = self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                if item is _STOP:
+                    self._queue.task_done()
+                    stopping = True
+                    deadline = 0
+                    continue
+                batch.append(item)
+                count += len(item[1])
+
+            self._write_batch(batch)
+            self._done(batch)
+
+        # Anything enqueued after the stop marker
+        leftover = []
+        while True:
+            try:
+                leftover.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+        if leftover:
+            self._write_batch(leftover)
+            self._done(leftover)
+
+    def _done(self, batch):
+        with self._space:
+            self._pending -= sum(len(records) for _, records in batch)
+            self._space.notify_all()
+        for _ in batch:
+            self._queue.task_done()
+
+    def _write_batch(self, batch):
+        groups = {"sensor": [], "control": [], "outdoor": [], "rollup": []}
+        for kind, records in batch:
+            groups[kind].extend(records)
+
+        fsync = self.durability == "fsync"
+        writers = {
+            "sensor": self.store.append_sensor,
+            "control": self.store.append_control,
+            "outdoor": self.store.append_outdoor,
+            "rollup": self.store.append_rollups,
+        }
+
+        start = time.perf_counter()
+        total = 0
+        for kind, records in groups.items():
+            total += len(records)
+            if not records:
+                continue
+            for attempt in range(self.max_retries):
+                try:
+                    self._write_group(writers[kind], kind, records, fsync)
+                    break
+                except Exception:
+                    logger.exception("Write-behind flush of %d %s records failed", len(records), kind)
+                    time.sleep(0.05 * (2 ** attempt))
+            else:
+                self._isolate(writers[kind], kind, records, fsync)
+        elapsed_ms = (time.perf_counter() - start) * 1000
+        FLUSH_SECONDS.observe(elapsed_ms / 1000)
+
+        with self._stats_lock:
+            self._stats["batches"] += 1
+            self._flush_times.append((elapsed_ms, total))
+
+    def _write_group(self, write, kind, records, fsync):
+        write(records, fsync=fsync)
+        with self._stats_lock:
+            self._stats["written"] += len(records)
+        if self.on_write is not None:
+            self._notify(kind, records)
+
+    def _notify(self, kind, records):
+        # A failing listener must not count as a failed write (the records are stored)
+        try:
+            self.on_write(kind, records)
+        except Exception:
+            logger.exception("Write-behind on_write callback failed for %d %s records", len(records), kind)
+
+    def _isolate(self, write, kind, records, fsync):
+        """The group keeps failing: write its records one by one, dropping only those that fail."""
+        failed = 0
+        for record in records:
+            try:
+                self._write_group(write, kind, [record], fsync)
+            except Exception:
+                logger.error("Dropping %s record the store rejects: %r", kind, record)
+                failed += 1
+        with self._stats_lock:
+            self._stats["failed"] += failed
+
+    # Metrics
+
+    @property
+    def written(self):
+        """Records written so far (changes whenever a flush lands)."""
+        with self._stats_lock:
+            return self._stats["written"]
+
+    def metrics(self):
+        """Queue depth, throughput counters and flush latency percentiles."""
+        with self._stats_lock:
+            stats = dict(self._stats)
+            flushes = list(self._flush_times)
+
+        times = sorted(ms for ms, _ in flushes)
+
+        def percentile(p):
+            if not times:
+                return None
+            return round(times[min(len(times) - 1, int(p / 100 * len(times)))], 3)
+
+        stats.update({
+            "queue_depth": self._pending,
+            "queue_capacity": self.max_queue,
+            "durability": self.durability,
+            "batch_size": self.batch_size,
+            "flush_interval_s": self.flush_interval,
+            "avg_batch_records": round(sum(n for _, n in flushes) / len(flushes), 1) if flushes else None,
+            "flush_ms_p50": percentile(50),
+            "flush_ms_p95": percentile(95),
+            "flush_ms_p99": percentile(99),
+            "flush_ms_max": round(times[-1], 3) if times else None,
+            "running": self._thread is not None and self._thread.is_alive(),
+        })
+        return stats